@@ -0,0 +1,140 @@
+"""
+Text analyzers for the search index.
+
+An analyzer turns text into index terms: Unicode-aware tokenization (NFKC,
+case folding, ``\\w+`` runs), stopword removal and an optional light English
+suffix stemmer. Titles and bodies share one inverted index, so one analyzer
+serves both and the queries matched against them; analyzed queries are cached,
+since the same queries repeat.
+
+The configuration is recorded in the index (see search.py) so that changing it
+triggers a reindex instead of silently mixing incompatible terms. Override the
+defaults with MCP_ANALYZERS, a JSON object of settings, e.g.
+``{"stemmer": "none", "stopwords": "minimal"}``.
+"""
+from __future__ import annotations
+import json
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Any, Callable, Dict, List
+
+# Bump when tokenization or stemming output changes for the same settings.
+ANALYZER_VERSION = 1
+
+STOPWORDS = {
+    "none": frozenset(),
+    # The original hard-coded list.
+    "minimal": frozenset({"the", "and", "a", "to", "of", "in", "it", "is", "that", "on", "for", "as", "with", "this", "be"}),
+    "english": frozenset(
+        """a about above after again against all am an and any are as at be because been before being below
+        between both but by can did do does doing down during each few for from further had has have having he
+        her here hers herself him himself his how i if in into is it its itself just me more most my myself no
+        nor not now of off on once only or other our ours ourselves out over own same she should so some such
+        than that the their theirs them themselves then there these they this those through to too under until
+        up very was we were what when where which while who whom why will with you your yours yourself
+        yourselves""".split()
+    ),
+}
+
+DEFAULT_CONFIG = {"stopwords": "english", "stemmer": "light", "min_length": 1}
+
+_TOKEN_RE = re.compile(r"\w+")
+_VOWEL_RE = re.compile(r"[aeiouy]")
+
+
+def light_stem(word: str) -> str:
+    """
+    Strip common English inflectional suffixes (plurals, -ed, -ing, -ly).
+
+    Deliberately conservative: it only needs to map inflections of a word to
+    the same term, not to produce dictionary stems.
+    """
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("sses", "xes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        word = word[:-1]
+    for suffix in ("ingly", "edly", "ing", "ed", "ly"):
+        if word.endswith(suffix):
+            stem = word[: -len(suffix)]
+            if len(stem) >= 3 and _VOWEL_RE.search(stem):
+                if len(stem) > 3 and stem[-1] == stem[-2] and stem[-1] not in "lsz":
+                    stem = stem[:-1]  # running -> runn -> run
+                return stem
+            break
+    return word
+
+
+STEMMERS: Dict[str, Callable[[str], str]] = {"none": lambda w: w, "light": light_stem}
+
+
+def _load_config() -> Dict[str, Any]:
+    overrides = json.loads(os.environ.get("MCP_ANALYZERS", "") or "{}")
+    unknown = set(overrides) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown analyzer settings {sorted(unknown)}. Allowed: {sorted(DEFAULT_CONFIG)}")
+    settings = {**DEFAULT_CONFIG, **overrides}
+    if settings["stopwords"] not in STOPWORDS:
+        raise ValueError(f"Unknown stopword list '{settings['stopwords']}'. Allowed: {sorted(STOPWORDS)}")
+    if settings["stemmer"] not in STEMMERS:
+        raise ValueError(f"Unknown stemmer '{settings['stemmer']}'. Allowed: {sorted(STEMMERS)}")
+    return settings
+
+
+CONFIG = _load_config()
+
+
+def config_signature() -> Dict[str, Any]:
+    """The analyzer settings an index was built with, as stored in its metadata."""
+    return {"version": ANALYZER_VERSION, "settings": CONFIG}
+
+
+def build_analyzer(settings: Dict[str, Any]) -> Callable[[str], List[str]]:
+    """
+    Compile an analyzer: the stopword set, stemmer and minimum length are bound
+    once, and each distinct word is stemmed only once per process.
+    """
+    stop = STOPWORDS[settings["stopwords"]]
+    stem = STEMMERS[settings["stemmer"]]
+    min_length = settings["min_length"]
+    findall, normalize = _TOKEN_RE.findall, unicodedata.normalize
+    memo: Dict[str, str] = {}
+
+    def analyze(text: str) -> List[str]:
+        if not text:
+            return []
+        terms = []
+        for word in findall(normalize("NFKC", text).casefold()):
+            if word in stop or len(word) < min_length:
+                continue
+            term = memo.get(word)
+            if term is None:
+                if len(memo) > 200_000:
+                    memo.clear()
+                term = memo[word] = stem(word)
+            terms.append(term)
+        return terms
+
+    return analyze
+
+
+ANALYZER = build_analyzer(CONFIG)
+
+
+def analyze_document(node: Dict[str, Any]) -> List[str]:
+    """Index terms of a content node: its analyzed title followed by its analyzed body."""
+    return ANALYZER(node.get("title") or "") + ANALYZER(node.get("content") or "")
+
+
+@lru_cache(maxsize=4096)
+def _analyze_query(text: str) -> tuple:
+    return tuple(ANALYZER(text))
+
+
+def analyze_query(text: str) -> List[str]:
+    return list(_analyze_query(text or ""))
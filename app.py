@@ -1,10 +1,14 @@
 import os
 from datetime import datetime
 from starlette.middleware.cors import CORSMiddleware
-from starlette.responses import HTMLResponse, JSONResponse
+from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from starlette.routing import Route
+import metrics
+import replica
+import startup
+from search import index_stats
 from server import mcp
-from storage import get_all_content_count
+from storage import generation, get_all_content_count, counters, queue_depth, wal_stats
 
 # Use the MCP-provided Starlette app directly so its lifespan handlers run and
 # the StreamableHTTP session manager is initialized on startup.
@@ -316,22 +320,47 @@ async def homepage(request):
 
 
 async def health_check(request):
-    """Health check endpoint for monitoring."""
+    """Health check endpoint for monitoring; answered from in-memory counters."""
     try:
         content_count = get_all_content_count()
     except:
         content_count = 0
     
-    return JSONResponse({
+    body = {
         "status": "healthy",
         "service": "mcp-content-library",
         "timestamp": datetime.utcnow().isoformat(),
         "mcp_endpoint": f"{get_public_url()}/mcp",
         "tools_available": len(mcp._tools) if hasattr(mcp, '_tools') else 23,
-        "content_items": content_count
+        "content_items": content_count,
+        "index_generation": generation(),  # shared by all workers, unlike index_stats()
+        "queue_depth": queue_depth(),
+    }
+    replication = replica.status()
+    if replication is not None:
+        body["replication"] = replication
+    return JSONResponse(body)
+
+
+async def stats(request):
+    """Library and index statistics; answered from memory without touching the filesystem."""
+    return JSONResponse({
+        "timestamp": datetime.utcnow().isoformat(),
+        "counters": counters(),
+        "index": index_stats(),
+        "queue_depth": queue_depth(),
+        "wal": wal_stats(),
+        "startup_ms": startup.PHASES,
     })
 
 
+async def metrics_endpoint(request):
+    """Prometheus scrape endpoint: per-tool call/error counts and latency histograms."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # Add custom routes to the app
 app.add_route("/", homepage, methods=["GET"])
 app.add_route("/health", health_check, methods=["GET"])
+app.add_route("/stats", stats, methods=["GET"])
+app.add_route("/metrics", metrics_endpoint, methods=["GET"])
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+"""Benchmark harness for the MCP Content Library.
+
+Generates a synthetic library into a temporary MCP_SNIPPETS_ROOT (or --root),
+then measures throughput and p50/p99 latency for ingestion, search (one case
+per filter type and sort order), rebuild_index, get_node and every
+content_tools extractor.
+
+    python bench.py --nodes 10000 --json bench.json
+    python bench.py --nodes 10000 --compare bench.json
+
+The library is written straight to the node and edge files (as a bulk import
+would) so generating 1M nodes does not go through add_content; ingestion cost
+is measured separately by the add_content benchmark.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+STYLES = ["chapter", "blog", "post", "snippet", "tweet"]
+STYLE_WEIGHTS = [1, 3, 4, 12, 10]
+STYLE_WORDS = {"chapter": 2000, "blog": 800, "post": 300, "snippet": 60, "tweet": 30}
+
+
+def _vocabulary(rnd: random.Random, size: int) -> List[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rnd.choice(letters) for _ in range(rnd.randint(3, 9))) for _ in range(size)]
+
+
+def _zipf_weights(n: int, s: float) -> List[float]:
+    return [1.0 / (i + 1) ** s for i in range(n)]
+
+
+def generate_library(args, rnd: random.Random) -> List[str]:
+    """Write a synthetic library to disk and return the content IDs."""
+    from storage import NODE_DIRS, EDGE_DIR, ensure_dirs
+
+    ensure_dirs()
+    vocab = _vocabulary(rnd, args.vocab)
+    vocab_weights = _zipf_weights(len(vocab), 1.1)
+    tags = [f"tag-{i}" for i in range(args.tags)]
+    tag_weights = _zipf_weights(len(tags), args.tag_skew)
+    authors = [f"author-{i}" for i in range(args.authors)]
+    author_weights = _zipf_weights(len(authors), args.author_skew)
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+    for kind, names in (("tag", tags), ("author", authors)):
+        for name in names:
+            (NODE_DIRS[kind] / f"{name}.json").write_text(json.dumps({"id": name, "type": kind, "name": name}))
+
+    ids: List[str] = []
+    with (EDGE_DIR / "tags.jsonl").open("a") as tag_edges, (EDGE_DIR / "authors.jsonl").open("a") as author_edges:
+        for _ in range(args.nodes):
+            cid = str(uuid.uuid4())
+            style = rnd.choices(STYLES, STYLE_WEIGHTS)[0]
+            words = rnd.choices(vocab, vocab_weights, k=max(5, int(rnd.gauss(STYLE_WORDS[style], STYLE_WORDS[style] / 4))))
+            paragraphs = [" ".join(words[i : i + 60]) + "." for i in range(0, len(words), 60)]
+            node_tags = sorted(set(rnd.choices(tags, tag_weights, k=rnd.randint(1, 4))))
+            node_authors = sorted(set(rnd.choices(authors, author_weights, k=rnd.randint(1, 2))))
+            date = (start + timedelta(seconds=rnd.randint(0, 5 * 365 * 86400))).isoformat()
+            node = {
+                "id": cid,
+                "type": "content",
+                "title": " ".join(rnd.choices(vocab, vocab_weights, k=5)).title(),
+                "date": date,
+                "style": [style],
+                "tags": node_tags,
+                "authors": node_authors,
+                "relates": [],
+                "content": "\n\n".join(paragraphs),
+            }
+            (NODE_DIRS["content"] / f"{cid}.json").write_text(json.dumps(node))
+            for t in node_tags:
+                tag_edges.write(json.dumps({"content": cid, "type": "is_tagged", "tag": t, "date": date}) + "\n")
+            for a in node_authors:
+                author_edges.write(json.dumps({"content": cid, "type": "authored", "author": a, "date": date}) + "\n")
+            ids.append(cid)
+
+    with (EDGE_DIR / "relates.jsonl").open("a") as rel_edges:
+        for _ in range(int(args.nodes * args.edge_density)):
+            src, dst = rnd.choice(ids), rnd.choice(ids)
+            rel = rnd.choice(["snippet_of", "related_to"])
+            rel_edges.write(json.dumps({"src": src, "type": rel, "dst": dst, "date": start.isoformat()}) + "\n")
+    return ids
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[idx]
+
+
+def measure(name: str, fn: Callable[[int], Any], ops: int, results: Dict[str, Any]):
+    latencies = []
+    t_start = time.perf_counter()
+    for i in range(ops):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - t_start
+    latencies.sort()
+    results[name] = {
+        "ops": ops,
+        "total_s": round(total, 4),
+        "ops_per_s": round(ops / total, 2) if total else None,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+    }
+    print(f"{name:<32} {ops:>6} ops  {results[name]['ops_per_s'] or 0:>10.1f} ops/s  "
+          f"p50 {results[name]['p50_ms']:>9.3f} ms  p99 {results[name]['p99_ms']:>9.3f} ms")
+
+
+def run(args) -> Dict[str, Any]:
+    rnd = random.Random(args.seed)
+    t0 = time.perf_counter()
+    ids = generate_library(args, rnd)
+    generate_s = time.perf_counter() - t0
+    print(f"Generated {len(ids)} nodes in {generate_s:.2f}s under {os.environ['MCP_SNIPPETS_ROOT']}")
+
+    import content_tools
+    import search
+    import storage
+
+    results: Dict[str, Any] = {}
+    measure("rebuild_index", lambda i: search.rebuild_index(), 1, results)
+
+    sample = [rnd.choice(ids) for _ in range(max(args.ops, args.extract_ops))]
+    meta = search._load_indexes()[2]
+    some = meta[sample[0]]
+    words = (some.title or "x").lower().split()
+
+    searches = {
+        "search.query": (words[0], {}, "relevance"),
+        "search.style": (None, {"style": ["snippet"]}, "relevance"),
+        "search.tag": (None, {"tag": list(some.tags[:1])}, "relevance"),
+        "search.author": (None, {"author": list(some.authors[:1])}, "relevance"),
+        "search.title": (None, {"title": words[-1]}, "relevance"),
+        "search.content": (None, {"content": words[0], "tag": list(some.tags[:1])}, "relevance"),
+        "search.relates": (None, {"relates": sample[:5]}, "relevance"),
+        "search.sort_date": (None, {"tag": list(some.tags[:1])}, "date"),
+        "search.sort_random": (None, {"style": ["snippet"]}, "random"),
+    }
+    for name, (query, filters, sort) in searches.items():
+        measure(name, lambda i, q=query, f=filters, s=sort: search.search(q, f, sort=s, seed=i), args.ops, results)
+
+    measure("get_node", lambda i: storage.get_node(sample[i]), args.ops, results)
+    measure(
+        "add_content",
+        lambda i: storage.add_content(
+            content=f"Benchmark content {i} {uuid.uuid4()}", title=f"Bench {i}", style=["snippet"], tags=["bench"]
+        ),
+        args.ops,
+        results,
+    )
+
+    n = args.extract_ops
+    measure("extract_raw_content", lambda i: content_tools.extract_raw_content(sample[i], max_length=500), n, results)
+    measure("extract_by_paragraph", lambda i: content_tools.extract_by_paragraph(sample[i], min_words=10), n, results)
+    measure(
+        "extract_similar_sections",
+        lambda i: content_tools.extract_similar_sections(sample[i], words[0]),
+        n,
+        results,
+    )
+    measure("extract_for_social_media", lambda i: content_tools.extract_for_social_media(sample[i]), n, results)
+    measure(
+        "combine_related_snippets",
+        lambda i: content_tools.combine_related_snippets(sample[i : i + 10], f"Combined {i}"),
+        n,
+        results,
+    )
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare", "root")},
+        "generate_s": round(generate_s, 3),
+        "python": sys.version.split()[0],
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline_path: str):
+    baseline = json.loads(open(baseline_path, encoding="utf-8").read())["results"]
+    print(f"\nComparison against {baseline_path} (ratio < 1.0 is faster):")
+    for name, cur in current["results"].items():
+        old = baseline.get(name)
+        if not old or not old.get("p50_ms"):
+            continue
+        print(f"{name:<32} p50 x{cur['p50_ms'] / old['p50_ms']:.2f}  p99 x{cur['p99_ms'] / max(old['p99_ms'], 1e-9):.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=1000, help="content nodes to generate (1k-1M)")
+    parser.add_argument("--tags", type=int, default=200, help="distinct tags")
+    parser.add_argument("--tag-skew", type=float, default=1.0, help="Zipf exponent of tag popularity")
+    parser.add_argument("--authors", type=int, default=50, help="distinct authors")
+    parser.add_argument("--author-skew", type=float, default=1.2, help="Zipf exponent of author popularity")
+    parser.add_argument("--edge-density", type=float, default=0.5, help="relates edges per content node")
+    parser.add_argument("--vocab", type=int, default=5000, help="vocabulary size")
+    parser.add_argument("--ops", type=int, default=100, help="operations per search/get/add benchmark")
+    parser.add_argument("--extract-ops", type=int, default=20, help="operations per extractor benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--root", help="library directory (default: a new temporary directory)")
+    parser.add_argument("--json", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="compare against a previous --json result")
+    args = parser.parse_args(argv)
+
+    # storage resolves MCP_SNIPPETS_ROOT at import time, so set it first.
+    os.environ["MCP_SNIPPETS_ROOT"] = args.root or tempfile.mkdtemp(prefix="mcp-bench-")
+    report = run(args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json}")
+    if args.compare:
+        compare(report, args.compare)
+    return report
+
+
+if __name__ == "__main__":
+    main()
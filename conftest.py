@@ -0,0 +1,7 @@
+"""Run the tests against a library of their own, never ~/.mcp_snippets or an earlier run's."""
+
+import os
+import tempfile
+
+# storage reads MCP_SNIPPETS_ROOT at import time, so this must run before the test modules import it.
+os.environ["MCP_SNIPPETS_ROOT"] = tempfile.mkdtemp(prefix="mcp-snippets-test-")
@@ -3,11 +3,20 @@ Content extraction and transformation tools for creating different types of snip
 and social content from longer-form writing.
 """
 from __future__ import annotations
+import io
 import json
 import re
 from typing import List, Dict, Any, Optional
 from pathlib import Path
-from storage import get_node, add_content, link_relates, NODE_DIRS, get_content_links
+from storage import (
+    get_node,
+    add_content,
+    link_relates,
+    link_relates_many,
+    get_content_nodes,
+    NODE_DIRS,
+    get_content_links,
+)
 from dataclasses import dataclass
 
 
@@ -229,52 +238,64 @@ def extract_for_social_media(
 
 
 def combine_related_snippets(
-    content_ids: List[str],
+    content_ids: Optional[List[str]],
     title: str,
     style: Optional[List[str]] = None,
     separator: str = "\n\n---\n\n",
+    query: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    sort: str = "date",
+    limit: int = 100,
 ) -> str:
     """
     Combine multiple snippets into a single longer-form piece.
 
     Args:
-        content_ids: List of content node UUIDs to combine
+        content_ids: List of content node UUIDs to combine, in order. If None,
+            the sources are selected with search (query/filters/sort/limit).
         title: Title for the combined content
         style: Style tags for combined content (e.g., ["blog", "post"])
         separator: Text to insert between combined snippets
+        query: Search query used to select sources when content_ids is None
+        filters: Search filters used to select sources when content_ids is None
+        sort: Search order used to select sources ("relevance", "date", "random")
+        limit: Maximum number of sources selected by search
 
     Returns:
         UUID of newly created combined content node
     """
-    combined_parts = []
+    if content_ids is None:
+        from search import search_ids
+
+        content_ids = search_ids(query, filters or {}, sort=sort, limit=limit)
+
+    # Stream node bodies straight into one buffer; nodes are fetched in
+    # batches and dropped as soon as their body has been written.
+    body = io.StringIO()
+    found_ids = []
     all_tags = set()
     all_authors = set()
 
-    for content_id in content_ids:
-        try:
-            node = get_node(content_id)
-            combined_parts.append(node.get("content", ""))
-            all_tags.update(node.get("tags", []))
-            all_authors.update(node.get("authors", []))
-        except FileNotFoundError:
-            continue
+    for node in get_content_nodes(content_ids):
+        if found_ids:
+            body.write(separator)
+        body.write(node.get("content", ""))
+        all_tags.update(node.get("tags", []))
+        all_authors.update(node.get("authors", []))
+        found_ids.append(node["id"])
 
-    combined_content = separator.join(combined_parts)
     style = style or ["blog", "post"]
 
     combined_id = add_content(
-        content=combined_content,
+        content=body.getvalue(),
         title=title,
         style=style,
-        tags=list(all_tags),
-        authors=list(all_authors),
+        tags=sorted(all_tags),
+        authors=sorted(all_authors),
     )
+    body.close()
 
-    # Link all source snippets as related
-    for source_id in content_ids:
-        try:
-            link_relates(source_id, "related_to", combined_id)
-        except Exception:
-            continue
+    # Link all source snippets as related, in one append
+    link_relates_many((source_id, "related_to", combined_id) for source_id in found_ids)
 
     return combined_id
@@ -0,0 +1,135 @@
+"""
+In-process Prometheus-style metrics.
+
+Counters and histograms live in memory and are rendered in the Prometheus text
+exposition format by render(), which app.py serves at /metrics. instrument()
+wraps MCP tool handlers; timer() records sub-spans such as the phases of
+search.search().
+"""
+from __future__ import annotations
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+TOOL_CALLS = "mcp_tool_calls_total"
+TOOL_ERRORS = "mcp_tool_errors_total"
+TOOL_LATENCY = "mcp_tool_latency_seconds"
+SEARCH_PHASE = "mcp_search_phase_seconds"
+
+HELP = {
+    TOOL_CALLS: "MCP tool invocations.",
+    TOOL_ERRORS: "MCP tool invocations that raised an exception.",
+    TOOL_LATENCY: "MCP tool wall-clock latency in seconds.",
+    SEARCH_PHASE: "Time spent in each phase of search.search() in seconds.",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[LabelKey, float]] = {}
+_histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+
+
+def _key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted(labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels: str):
+    with _lock:
+        series = _counters.setdefault(name, {})
+        key = _key(labels)
+        series[key] = series.get(key, 0.0) + value
+
+
+def observe(name: str, value: float, **labels: str):
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        key = _key(labels)
+        if key not in series:
+            series[key] = Histogram()
+        series[key].observe(value)
+
+
+@contextmanager
+def timer(name: str, **labels: str):
+    """Observe the duration of the enclosed block in the histogram `name`."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0, **labels)
+
+
+def instrument(tool_name: str):
+    """Decorator for async MCP tool handlers recording calls, errors and latency."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                inc(TOOL_ERRORS, tool=tool_name)
+                raise
+            finally:
+                inc(TOOL_CALLS, tool=tool_name)
+                observe(TOOL_LATENCY, time.perf_counter() - t0, tool=tool_name)
+
+        return wrapper
+
+    return decorator
+
+
+def _fmt_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render() -> str:
+    """Render all metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines: List[str] = []
+    with _lock:
+        for name in sorted(_counters):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(_counters[name].items()):
+                lines.append(f"{name}{_fmt_labels(key)} {value:g}")
+        for name in sorted(_histograms):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in sorted(_histograms[name].items()):
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_fmt_labels(key, (('le', f'{bound:g}'),))} {cumulative}")
+                lines.append(f"{name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {hist.count}")
+                lines.append(f"{name}_sum{_fmt_labels(key)} {hist.sum:.6f}")
+                lines.append(f"{name}_count{_fmt_labels(key)} {hist.count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,338 @@
+"""
+Append-only segment files ("packs") holding many small nodes.
+
+With MCP_NODE_STORE=pack, nodes are appended to ``packs/seg-NNNNNN.pack``
+instead of getting a file each. A segment is JSON Lines: every record is a
+compact node, or a ``{"deleted": true, "id", "type"}`` tombstone. The offset
+index ``packs/index.log`` has one line per record (``kind id segment offset
+length``, with a negative length for a tombstone) and is loaded into memory;
+records are read through a memory map of their segment.
+
+Segments are only ever appended to, so updates and deletes leave dead records
+behind. repack() copies the live records into fresh segments and drops the old
+ones. A later (segment, offset) always holds the newer version of a node, also
+while repacking: the repacked data goes to segment numbers reserved below the
+segment taking new writes (recorded in ``packs/active`` for the other
+processes sharing the packs). That makes the index a cache of the segments:
+records appended after its last line (a crash between the two writes) are
+recovered on load, and deleting it rebuilds it from the segments. It also lets
+a repack finish by simply indexing the copies and reloading: whatever was
+written meanwhile, by any process, sits at a later location and wins.
+"""
+from __future__ import annotations
+import contextlib
+import itertools
+import mmap
+import os
+import threading
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple
+import serialization
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # pragma: no cover - not on Windows: only one process may repack
+    fcntl = None
+
+SEGMENT_BYTES = int(float(os.environ.get("MCP_PACK_SEGMENT_MB", "64")) * 1024 * 1024)
+
+Location = Tuple[int, int, int]  # segment number, offset, record length
+Record = Tuple[str, str, Location]  # kind, node ID, location
+
+
+class PackStore:
+    """
+    The pack segments of one library. All methods are thread-safe; lock is the
+    library's write lock, which writers of other processes hold too (repack()
+    takes it to start and to finish).
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        segment_bytes: int = SEGMENT_BYTES,
+        lock: Callable[[], ContextManager] = contextlib.nullcontext,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.index_path = directory / "index.log"
+        self.active_path = directory / "active"
+        self._writer = lock
+        self._lock = threading.RLock()
+        self._entries: Optional[Dict[Tuple[str, str], Location]] = None
+        self._sizes: Dict[int, int] = {}  # segment number -> bytes written
+        self._live = 0  # bytes of live records, newlines included
+        self._active = 0  # segment taking new writes (0: none yet)
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._repacking = False
+
+    def _segment_path(self, seg: int) -> Path:
+        return self.directory / f"seg-{seg:06d}.pack"
+
+    # -- index ----------------------------------------------------------------
+
+    def _load(self) -> Dict[Tuple[str, str], Location]:
+        if self._entries is not None:
+            return self._entries
+        segments = sorted(int(p.stem[4:]) for p in self.directory.glob("seg-*.pack")) if self.directory.exists() else []
+        self._sizes = {seg: self._segment_path(seg).stat().st_size for seg in segments}
+        records: List[Record] = []
+        indexed: Dict[int, int] = {}  # segment -> end of its last indexed record
+        if self.index_path.exists():
+            with self.index_path.open("rb") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) != 5 or not line.endswith(b"\n"):
+                        continue  # torn last line
+                    seg, offset, length = int(parts[2]), int(parts[3]), int(parts[4])
+                    records.append((parts[0].decode(), parts[1].decode(), (seg, offset, length)))
+                    indexed[seg] = max(indexed.get(seg, 0), offset + abs(length) + 1)
+        recovered: List[Record] = []
+        for seg in segments:
+            if indexed.get(seg, 0) < self._sizes[seg]:
+                recovered += self._scan(seg, indexed.get(seg, 0))
+        entries: Dict[Tuple[str, str], Location] = {}
+        # Newer versions sit at later locations; the log is nearly sorted already.
+        for kind, node_id, loc in sorted(records + recovered, key=lambda r: r[2][:2]):
+            if loc[2] > 0:
+                entries[(kind, node_id)] = loc
+            else:
+                entries.pop((kind, node_id), None)
+        self._entries = entries
+        self._live = sum(length + 1 for _, _, length in entries.values())
+        try:
+            reserved = int(self.active_path.read_text())
+        except (FileNotFoundError, ValueError):
+            reserved = 0  # no repack running
+        self._active = max(segments[-1] if segments else 0, reserved)
+        if recovered:
+            self._append_index(recovered)
+        return entries
+
+    def _scan(self, seg: int, start: int) -> List[Record]:
+        """Records of a segment from byte offset start on."""
+        found = []
+        with self._segment_path(seg).open("rb") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn write
+                try:
+                    record = serialization.loads(line)
+                    kind, node_id = record["type"], record["id"]
+                except (ValueError, KeyError, TypeError):
+                    offset += len(line)
+                    continue
+                length = len(line) - 1
+                found.append((kind, node_id, (seg, offset, -length if record.get("deleted") else length)))
+                offset += len(line)
+        return found
+
+    def _append_index(self, records: Iterable[Record]):
+        lines = [f"{kind} {node_id} {seg} {offset} {length}\n" for kind, node_id, (seg, offset, length) in records]
+        with self.index_path.open("a", encoding="utf-8") as f:
+            f.write("".join(lines))
+
+    # -- reads ----------------------------------------------------------------
+
+    def _read(self, loc: Location) -> bytes:
+        seg, offset, length = loc
+        mm = self._maps.get(seg)
+        if mm is None or len(mm) < offset + length:
+            if mm is not None:
+                mm.close()  # the active segment grew since it was mapped
+            with self._segment_path(seg).open("rb") as f:
+                mm = self._maps[seg] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return mm[offset : offset + length]
+
+    def get(self, kind: str, node_id: str) -> Optional[bytes]:
+        """The stored record of a node, or None if it is not packed."""
+        with self._lock:
+            loc = self._load().get((kind, node_id))
+            return self._read(loc) if loc is not None else None
+
+    def location(self, kind: str, node_id: str) -> Optional[Location]:
+        with self._lock:
+            return self._load().get((kind, node_id))
+
+    def ids(self, kind: str) -> List[str]:
+        with self._lock:
+            return [node_id for (k, node_id) in self._load() if k == kind]
+
+    def iter_records(self, kind: str) -> Iterator[Tuple[str, bytes]]:
+        """(id, record) of every packed node of a kind, in storage order."""
+        with self._lock:
+            locs = sorted((loc, node_id) for (k, node_id), loc in self._load().items() if k == kind)
+        for start in range(0, len(locs), 1024):
+            with self._lock:  # a repack may replace segments between batches
+                entries = self._load()
+                batch = [(node_id, entries.get((kind, node_id))) for _, node_id in locs[start : start + 1024]]
+                batch = [(node_id, self._read(loc)) for node_id, loc in batch if loc is not None]
+            yield from batch
+
+    def pin(self) -> Tuple[List[Tuple[Tuple[str, str], Location]], Dict[int, int]]:
+        """
+        The current ((kind, id), location) entries in storage order, with a
+        read-only descriptor per segment they use. The descriptors keep those
+        records readable (os.pread) even after a repack deletes the segments;
+        the caller closes them.
+        """
+        with self._lock:
+            entries = sorted(self._load().items(), key=lambda kv: kv[1])
+            fds = {seg: os.open(self._segment_path(seg), os.O_RDONLY) for seg in {loc[0] for _, loc in entries}}
+            return entries, fds
+
+    # -- writes ---------------------------------------------------------------
+
+    def _append(self, items: List[Tuple[str, str, bytes]], seg: int) -> Tuple[List[Record], int]:
+        """
+        Append (kind, id, data) records to segment seg, moving on to the next
+        segment number when it is full. Returns their locations and the last
+        segment written.
+        """
+        written: List[Record] = []
+        f = None
+        try:
+            for kind, node_id, data in items:
+                size = self._sizes.get(seg, 0)
+                if seg == 0 or (size and size + len(data) + 1 > self.segment_bytes):
+                    seg, size = seg + 1, 0
+                    if f is not None:
+                        f.close()
+                        f = None
+                if f is None:
+                    self.directory.mkdir(parents=True, exist_ok=True)
+                    f = self._segment_path(seg).open("ab")
+                f.write(data + b"\n")
+                self._sizes[seg] = size + len(data) + 1
+                written.append((kind, node_id, (seg, size, len(data))))
+        finally:
+            if f is not None:
+                f.close()
+        return written, seg
+
+    def put(self, kind: str, node_id: str, data: bytes) -> Location:
+        """Append an encoded node (compact JSON without newline) and index it."""
+        with self._lock:
+            entries = self._load()
+            written, self._active = self._append([(kind, node_id, data)], self._active)
+            self._append_index(written)
+            old = entries.get((kind, node_id))
+            loc = entries[(kind, node_id)] = written[0][2]
+            self._live += loc[2] + 1 - (old[2] + 1 if old else 0)
+            return loc
+
+    def put_many(self, items: List[Tuple[str, str, bytes]]):
+        """put() for a batch of (kind, id, data) records, with one write per segment."""
+        with self._lock:
+            entries = self._load()
+            written, self._active = self._append(items, self._active)
+            self._append_index(written)
+            for kind, node_id, loc in written:
+                old = entries.get((kind, node_id))
+                entries[(kind, node_id)] = loc
+                self._live += loc[2] + 1 - (old[2] + 1 if old else 0)
+
+    def delete(self, kind: str, node_id: str) -> bool:
+        """Append a tombstone for a packed node; returns False if it is not packed."""
+        with self._lock:
+            entries = self._load()
+            if (kind, node_id) not in entries:
+                return False
+            tombstone = serialization.dumps({"deleted": True, "id": node_id, "type": kind})
+            written, self._active = self._append([(kind, node_id, tombstone)], self._active)
+            seg, offset, length = written[0][2]
+            self._append_index([(kind, node_id, (seg, offset, -length))])
+            self._live -= entries.pop((kind, node_id))[2] + 1
+            return True
+
+    # -- maintenance ----------------------------------------------------------
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._load()
+            total = sum(self._sizes.values())
+            return {"segments": len(self._sizes), "records": len(entries), "bytes": total, "garbage_bytes": total - self._live}
+
+    def repack(self, extra: Iterable[Tuple[str, str, bytes]] = (), extra_bytes: int = 0) -> Dict[str, int]:
+        """
+        Copy the live records, plus extra (kind, id, data) records such as loose
+        nodes being migrated (about extra_bytes in total), into new segments and
+        delete the old ones.
+
+        Reads and writes continue meanwhile, in this and other processes;
+        records written or deleted during the copy keep their newer state.
+        Returns stats() plus copy counts.
+        """
+        claim = self._claim()
+        try:
+            with self._writer(), self._lock:
+                entries = self._load()
+                live = sorted((loc, key) for key, loc in entries.items())
+                old = sorted(self._sizes)
+                seg = max(old, default=0) + 1  # the copy starts here...
+                reserve = 2 * ((self._live + extra_bytes) // self.segment_bytes + 1)
+                self._active = seg + reserve  # ...and new writes go above its range
+                self.directory.mkdir(parents=True, exist_ok=True)
+                tmp = self.active_path.with_suffix(".tmp")
+                tmp.write_text(str(self._active), encoding="utf-8")
+                tmp.replace(self.active_path)
+            copied: List[Record] = []
+            batch: List[Tuple[str, str, bytes]] = []
+            for kind, node_id, source in itertools.chain(((k, i, loc) for loc, (k, i) in live), extra):
+                if not isinstance(source, bytes):
+                    with self._lock:
+                        source = self._read(source)
+                batch.append((kind, node_id, source))
+                if len(batch) >= 1024:
+                    written, seg = self._append(batch, seg)
+                    copied += written
+                    batch = []
+            written, seg = self._append(batch, seg)
+            copied += written
+            with self._writer(), self._lock:
+                self._append_index(copied)
+                self.close()
+                entries = self._load()
+                used = {loc[0] for loc in entries.values()}
+                removed = [seg_no for seg_no in old if seg_no not in used]
+                lines = (f"{k} {i} {s} {o} {n}\n" for (k, i), (s, o, n) in sorted(entries.items(), key=lambda kv: kv[1]))
+                tmp = self.index_path.with_suffix(".tmp")
+                tmp.write_text("".join(lines), encoding="utf-8")
+                tmp.replace(self.index_path)
+                for seg_no in removed:
+                    self._segment_path(seg_no).unlink(missing_ok=True)
+                    self._sizes.pop(seg_no, None)
+                self.active_path.unlink(missing_ok=True)
+                return {**self.stats(), "copied": len(copied), "removed_segments": len(removed)}
+        finally:
+            self._repacking = False
+            if claim is not None:
+                os.close(claim)
+
+    def _claim(self) -> Optional[int]:
+        """Mark this process as the one repacking; returns the descriptor holding the mark."""
+        with self._lock:
+            if self._repacking:
+                raise RuntimeError("A repack is already running")
+            self._repacking = True
+        if fcntl is None:
+            return None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.directory / "repack.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            self._repacking = False
+            raise RuntimeError("A repack is already running in another process")
+        return fd
+
+    def close(self):
+        """Unmap all segments and forget the index (it is reloaded on next use)."""
+        with self._lock:
+            for mm in self._maps.values():
+                mm.close()
+            self._maps.clear()
+            self._entries = None
@@ -0,0 +1,129 @@
+"""
+The inverted index file, shared read-only by every process serving a library.
+
+``index/inverted.bin`` holds the postings ({doc_id: term frequency}) of every
+term in a layout that is used through a memory map instead of being parsed:
+
+    header     magic, term count T, start of the terms, start of the postings
+    offsets    T + 1 term offsets and T + 1 postings offsets (uint64)
+    terms      the UTF-8 terms, sorted by their bytes
+    postings   one compact JSON object per term, in term order
+
+A lookup is a binary search over the terms and decodes only that term's
+postings, so server workers mapping the same file share one copy of it in the
+page cache. Decoded postings are kept until MCP_POSTINGS_CACHE postings are
+cached; a process that writes the index (see search.py) works on a plain dict.
+
+The file is replaced atomically, never rewritten in place, so existing maps
+keep reading the generation they opened. Offsets use the machine's byte order:
+like the vector files, the index is local to the host that built it.
+"""
+from __future__ import annotations
+import itertools
+import mmap
+import os
+import struct
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+import serialization
+
+MAGIC = b"MCPINV1\n"
+CACHE_POSTINGS = int(os.environ.get("MCP_POSTINGS_CACHE", "1000000"))
+
+_HEADER = struct.Struct("<8sQQQ")  # magic, term count, terms start, postings start
+_MISSING = object()
+
+
+def write(path: Path, inv: Dict[str, Dict[str, int]]):
+    """Write inv to path atomically."""
+    order = sorted(inv)  # code point order is UTF-8 byte order
+    terms = [term.encode("utf-8") for term in order]
+    blobs = [serialization.dumps(inv[term]) for term in order]
+    term_offsets = array("Q", itertools.accumulate(map(len, terms), initial=0))
+    blob_offsets = array("Q", itertools.accumulate(map(len, blobs), initial=0))
+    terms_start = _HEADER.size + 16 * (len(terms) + 1)
+    blobs_start = terms_start + term_offsets[-1]
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(terms), terms_start, blobs_start))
+        f.write(term_offsets.tobytes())
+        f.write(blob_offsets.tobytes())
+        f.write(b"".join(terms))
+        f.write(b"".join(blobs))
+    tmp.replace(path)
+
+
+class MappedPostings:
+    """
+    Read-only mapping of term -> {doc_id: tf} over an inverted.bin file,
+    answering the dict methods the search code reads with (get, in, len,
+    iteration). The returned postings must not be modified.
+    """
+
+    def __init__(self, path: Path):
+        with path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._n, self._terms_start, self._blobs_start = _HEADER.unpack_from(self._mm)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an inverted index file")
+        view = memoryview(self._mm)
+        split = _HEADER.size + 8 * (self._n + 1)
+        self._term_offsets = view[_HEADER.size : split].cast("Q")
+        self._blob_offsets = view[split : self._terms_start].cast("Q")
+        self._cache: Dict[str, Optional[Dict[str, int]]] = {}
+        self._cached = 0  # postings held by _cache
+
+    def _term(self, i: int) -> bytes:
+        start = self._terms_start
+        return self._mm[start + self._term_offsets[i] : start + self._term_offsets[i + 1]]
+
+    def _postings(self, i: int) -> Dict[str, int]:
+        start = self._blobs_start
+        return serialization.loads(self._mm[start + self._blob_offsets[i] : start + self._blob_offsets[i + 1]])
+
+    def _find(self, term: str) -> int:
+        key = term.encode("utf-8")
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self._n and self._term(lo) == key else -1
+
+    def get(self, term: str, default: Any = None) -> Any:
+        postings = self._cache.get(term, _MISSING)
+        if postings is _MISSING:
+            i = self._find(term)
+            postings = self._postings(i) if i >= 0 else None
+            size = len(postings) if postings else 1
+            if self._cached + size > CACHE_POSTINGS:
+                self._cache.clear()
+                self._cached = 0
+            self._cache[term] = postings
+            self._cached += size
+        return default if postings is None else postings
+
+    def __getitem__(self, term: str) -> Dict[str, int]:
+        postings = self.get(term)
+        if postings is None:
+            raise KeyError(term)
+        return postings
+
+    def __contains__(self, term: object) -> bool:
+        return isinstance(term, str) and self.get(term) is not None
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._term(i).decode("utf-8") for i in range(self._n))
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, int]]]:
+        return ((self._term(i).decode("utf-8"), self._postings(i)) for i in range(self._n))
+
+    def to_dict(self) -> Dict[str, Dict[str, int]]:
+        """A private, modifiable copy of the whole index."""
+        return dict(self.items())
@@ -0,0 +1,165 @@
+"""
+Opt-in capture of profiles for slow MCP tool calls.
+
+Set MCP_PROFILE_SLOW_MS to a latency threshold to enable it. Every tool call is
+then profiled and, when it takes at least that long, the profile is written to
+MCP_SNIPPETS_ROOT/profiles with a JSON sidecar describing the call. Only the
+newest MCP_PROFILE_KEEP profiles are kept.
+
+MCP_PROFILE_MODE selects the profiler:
+- "cprofile" (default): deterministic cProfile; writes a .prof file (load it
+  with pstats or snakeviz) and a .txt summary of the top functions.
+- "sampler": a wall-clock stack sampler thread with much lower overhead;
+  writes collapsed stacks (.folded, flamegraph.pl compatible) and a summary.
+"""
+from __future__ import annotations
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+from storage import ROOT
+
+PROFILE_DIR = ROOT / "profiles"
+SLOW_MS = float(os.environ.get("MCP_PROFILE_SLOW_MS", "0") or 0)
+KEEP = int(os.environ.get("MCP_PROFILE_KEEP", "50"))
+MODE = os.environ.get("MCP_PROFILE_MODE", "cprofile")
+SAMPLE_INTERVAL = float(os.environ.get("MCP_PROFILE_SAMPLE_MS", "5")) / 1000
+
+_active = threading.Lock()  # cProfile allows one active profiler per thread
+
+
+class _Sampler:
+    """Samples one thread's Python stack at a fixed wall-clock interval."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def _rotate():
+    sidecars = sorted(PROFILE_DIR.glob("*.json"))
+    for old in sidecars[: max(0, len(sidecars) - KEEP)]:
+        for p in PROFILE_DIR.glob(old.stem + ".*"):
+            p.unlink(missing_ok=True)
+
+
+def _save(tool_name: str, elapsed_ms: float, profiler: Any, kwargs: Dict[str, Any]):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    now = datetime.now(timezone.utc)
+    base = f"{now.strftime('%Y%m%dT%H%M%S%fZ')}-{tool_name}"
+    files = []
+    summary = io.StringIO()
+    if isinstance(profiler, cProfile.Profile):
+        profiler.dump_stats(str(PROFILE_DIR / f"{base}.prof"))
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(40)
+        files.append(f"{base}.prof")
+    else:
+        folded = "\n".join(f"{stack} {count}" for stack, count in profiler.stacks.most_common())
+        (PROFILE_DIR / f"{base}.folded").write_text(folded + "\n", encoding="utf-8")
+        leaf = Counter()
+        for stack, count in profiler.stacks.items():
+            leaf[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaf.values()) or 1
+        summary.write(f"{total} samples every {SAMPLE_INTERVAL * 1000:g} ms\n")
+        for frame, count in leaf.most_common(40):
+            summary.write(f"{count / total:6.1%}  {frame}\n")
+        files.append(f"{base}.folded")
+    (PROFILE_DIR / f"{base}.txt").write_text(summary.getvalue(), encoding="utf-8")
+    files.append(f"{base}.txt")
+    meta = {
+        "name": base,
+        "tool": tool_name,
+        "elapsed_ms": round(elapsed_ms, 2),
+        "threshold_ms": SLOW_MS,
+        "mode": MODE,
+        "date": now.isoformat(),
+        "args": {k: repr(v)[:200] for k, v in kwargs.items()},
+        "files": files,
+    }
+    (PROFILE_DIR / f"{base}.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    _rotate()
+
+
+def profile_slow(tool_name: str):
+    """
+    Decorator for async MCP tool handlers capturing a profile of calls slower
+    than MCP_PROFILE_SLOW_MS. Returns the handler unchanged when disabled.
+    """
+
+    def decorator(fn):
+        if SLOW_MS <= 0:
+            return fn
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if not _active.acquire(blocking=False):
+                return await fn(*args, **kwargs)
+            if MODE == "sampler":
+                profiler: Any = _Sampler(threading.get_ident())
+                profiler.start()
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+            t0 = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                elapsed_ms = (time.perf_counter() - t0) * 1000
+                if MODE == "sampler":
+                    profiler.stop()
+                else:
+                    profiler.disable()
+                _active.release()
+                if elapsed_ms >= SLOW_MS:
+                    try:
+                        _save(tool_name, elapsed_ms, profiler, kwargs)
+                    except Exception:
+                        pass
+
+        return wrapper
+
+    return decorator
+
+
+def list_profiles(limit: int = 20) -> List[Dict[str, Any]]:
+    """Metadata of the most recent slow-call profiles, newest first."""
+    if not PROFILE_DIR.exists():
+        return []
+    items = []
+    for p in sorted(PROFILE_DIR.glob("*.json"), reverse=True)[:limit]:
+        try:
+            meta = json.loads(p.read_text(encoding="utf-8"))
+        except ValueError:
+            continue
+        meta["directory"] = str(PROFILE_DIR)
+        items.append(meta)
+    return items
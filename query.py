@@ -0,0 +1,60 @@
+"""
+Parser for the search query language.
+
+A query mixes free text with fielded clauses:
+
+    title:foo tag:ai -style:tweet author:"jane doe" "exact phrase" -draft
+
+- ``field:value`` restricts results; fields are title, tag, author, style,
+  content, relates and date. Values may be quoted to include spaces. Dates
+  take an inclusive ``FROM..TO`` range with either side optional, where a
+  bound matches every date it prefixes (``date:2024-01..2024-06``).
+- ``"..."`` requires the exact phrase (whole words) in the title or body.
+- A leading ``-`` negates a clause, a phrase or a bare word.
+- Other words are free text: they rank results but do not filter them.
+
+Unknown fields (e.g. ``http://...``) are kept as free text.
+"""
+from __future__ import annotations
+import re
+from typing import List, NamedTuple, Tuple
+
+FIELDS = {"title", "tag", "author", "style", "content", "relates", "date"}
+
+_CLAUSE_RE = re.compile(r'(-?)(?:(\w+):)?(?:"([^"]*)"?|(\S+))')
+
+
+class Clause(NamedTuple):
+    """One restriction: field is a FIELDS name, "phrase" or "term"; values match if any matches."""
+
+    field: str
+    values: Tuple[str, ...]
+    negate: bool = False
+
+
+class ParsedQuery(NamedTuple):
+    text: str  # free text (and phrase words) used for ranking
+    clauses: List[Clause]
+
+
+def parse(query: str) -> ParsedQuery:
+    text: List[str] = []
+    clauses: List[Clause] = []
+    for m in _CLAUSE_RE.finditer(query or ""):
+        neg, field, quoted, bare = m.group(1) == "-", m.group(2), m.group(3), m.group(4)
+        value = quoted if quoted is not None else bare
+        if field is not None and field.lower() in FIELDS:
+            if value:
+                clauses.append(Clause(field.lower(), (value,), neg))
+        elif field is not None:
+            text.append(m.group(0).lstrip("-"))
+        elif quoted is not None:
+            if quoted.strip():
+                clauses.append(Clause("phrase", (quoted,), neg))
+                if not neg:
+                    text.append(quoted)
+        elif neg:
+            clauses.append(Clause("term", (bare,), True))
+        elif bare != "-":
+            text.append(bare)
+    return ParsedQuery(" ".join(text), clauses)
@@ -0,0 +1,268 @@
+"""
+Read replicas: a library kept up to date from another library's write-ahead log.
+
+A replica is a library of its own (MCP_SNIPPETS_ROOT, typically on a local
+disk) started with MCP_REPLICA_OF=<root of the primary library>: a directory
+the primary writes with MCP_WAL=on and the replica can read, such as a shared
+or network file system. Several read-only servers can then answer queries
+from their own indexes while one primary accepts the writes. The follower
+started by start():
+
+- bootstraps once, and again if it falls behind the log segments the primary
+  keeps (MCP_WAL_KEEP_SEGMENTS): it notes where the primary's log ends, copies
+  the nodes, edge logs and compression dictionaries while the primary keeps
+  writing, and builds the search indexes;
+- every MCP_REPLICA_POLL_MS reads the records the primary logged since the
+  last position and applies them: node writes and removals, edge appends, and
+  one incremental index update for the documents they changed.
+
+Applying a record again has no further effect, so a copy taken while the
+primary writes converges once the log from the noted position is applied, and
+after a restart the follower resumes from the position saved in
+index/replica.json. Mutations are refused on a replica (see storage.py);
+status(), shown by /health, reports the position and the replication lag.
+"""
+from __future__ import annotations
+import os
+import shutil
+import threading
+import traceback
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import search
+import serialization
+import storage
+import wal
+from packs import PackStore
+from storage import DICT_DIR, EDGE_DIR, EDGE_KEYS, NODE_DIRS, REPLICA_PATH
+from wal import Position
+
+POLL_S = float(os.environ.get("MCP_REPLICA_POLL_MS", "200")) / 1000
+BATCH_BYTES = 4 << 20  # log bytes applied per batch
+
+
+class Follower:
+    """Applies the primary's log to this library; see the module docstring."""
+
+    def __init__(self, primary: Path):
+        self.primary = primary
+        self.log_dir = primary / "wal"
+        self.position: Optional[Position] = None
+        self.applied = 0  # records applied, for tests and diagnostics
+        self.bootstraps = 0
+        self.error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="mcp-replica", daemon=True)
+
+    def start(self) -> "Follower":
+        if not self.primary.is_dir():
+            raise FileNotFoundError(f"Primary library {self.primary} not found")
+        storage.ensure_dirs()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+                self.error = None
+            except Exception as e:
+                self.error = str(e)
+                traceback.print_exc()
+            self._stop.wait(POLL_S)
+
+    def poll(self) -> int:
+        """Apply everything the primary logged since the last poll; returns the number of records."""
+        if self.position is None:
+            self.position = _saved_position(self.primary)
+        if self.position is None:
+            self.bootstrap()
+        count = 0
+        while True:
+            try:
+                records, position = wal.tail(self.log_dir, self.position, BATCH_BYTES)
+            except FileNotFoundError:
+                print("[replica] Fell behind the primary's log; copying the library again")
+                self.bootstrap()
+                continue
+            if position == self.position:
+                return count
+            self._apply(records, position)
+            count += len(records)
+
+    def bootstrap(self):
+        """Copy the primary library and build the indexes; the log is then followed from before the copy."""
+        position = wal.end(self.log_dir)
+        self._copy_dicts()
+        with storage.writer():
+            for kind in NODE_DIRS:
+                copied = set()
+                for node_id, node in self._primary_nodes(kind):
+                    storage.apply_node(kind, node)
+                    copied.add(node_id)
+                for node_id in set(storage.node_ids(kind)) - copied:
+                    storage.apply_removal(kind, node_id)
+            for name in EDGE_KEYS:
+                self._copy_edges(name)
+            storage.invalidate_caches()
+            search.rebuild_index()
+            self._save(position)
+        self.bootstraps += 1
+
+    def _primary_nodes(self, kind: str):
+        for p in (self.primary / "nodes" / kind).glob("*.json"):
+            try:
+                yield p.stem, serialization.read(p)
+            except (FileNotFoundError, ValueError):
+                continue  # removed or replaced meanwhile; the log has the change
+        packs = PackStore(self.primary / "packs")
+        try:
+            for node_id, data in packs.iter_records(kind):
+                yield node_id, serialization.loads(data)
+        finally:
+            packs.close()
+
+    def _copy_edges(self, name: str):
+        try:
+            data = (self.primary / "edges" / f"{name}.jsonl").read_bytes()
+        except FileNotFoundError:
+            data = b""
+        path = EDGE_DIR / f"{name}.jsonl"
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_bytes(data[: data.rfind(b"\n") + 1])  # an append may be in progress
+        tmp.replace(path)
+
+    def _copy_dicts(self):
+        """Copy the compression dictionaries the replicated content may refer to (they never change)."""
+        source = self.primary / "dicts"
+        if not source.is_dir():
+            return
+        for p in source.glob("*.zdict"):
+            target = DICT_DIR / p.name
+            if not target.exists():
+                DICT_DIR.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(p, target.with_suffix(".tmp"))
+                target.with_suffix(".tmp").replace(target)
+
+    def _apply(self, records: List[Dict[str, Any]], position: Position):
+        self._copy_dicts()
+        changed: Dict[str, None] = {}
+        added: Counter = Counter()
+        with storage.writer():
+            for record in records:
+                if "put" in record:
+                    kind, node = record["put"], record["node"]
+                    added[kind] += not storage.node_exists(kind, node["id"])
+                    storage.apply_node(kind, node)
+                    node_id = node["id"]
+                elif "del" in record:
+                    kind, node_id = record["del"], record["id"]
+                    added[kind] -= storage.apply_removal(kind, node_id)
+                else:
+                    if "edges" in record:
+                        storage.apply_edges(record["edges"], record["records"])
+                    continue  # "indexed" records: the replica indexes on its own
+                if kind == "content":
+                    changed[node_id] = None
+            for kind, delta in added.items():
+                if delta:
+                    storage.adjust_node_count(kind, delta)
+            if changed:
+                search.index_batch(changed)
+            self._save(position)
+        self.position = position
+        self.applied += len(records)
+
+    def _save(self, position: Position):
+        storage.ensure_dirs()
+        serialization.write(
+            REPLICA_PATH,
+            {
+                "primary": str(self.primary),
+                "segment": position[0],
+                "offset": position[1],
+                "date": datetime.now(timezone.utc).isoformat(),
+            },
+        )
+        self.position = position
+
+
+def _saved_position(primary: Path) -> Optional[Position]:
+    try:
+        saved = serialization.read(REPLICA_PATH)
+    except (FileNotFoundError, ValueError):
+        return None
+    if saved.get("primary") != str(primary):
+        return None
+    return (saved["segment"], saved["offset"])
+
+
+def _behind(log_dir: Path, position: Position) -> int:
+    """Bytes logged after position."""
+    segment, offset = position
+    total = 0
+    for number in wal.segments(log_dir):
+        if number < segment:
+            continue
+        try:
+            size = wal.segment_path(log_dir, number).stat().st_size
+        except FileNotFoundError:
+            continue
+        total += size - offset if number == segment else size
+    return max(0, total)
+
+
+def status() -> Optional[Dict[str, Any]]:
+    """
+    Replication state of this library (None unless it is a replica), from the
+    saved position and the size of the primary's log: lag_bytes is how much
+    of the log is not applied yet, lag_seconds how long ago the last batch was
+    applied while more was waiting (0 when caught up).
+    """
+    if not storage.REPLICA_OF:
+        return None
+    primary = Path(storage.REPLICA_OF)
+    result: Dict[str, Any] = {"primary": str(primary)}
+    if _follower is not None:
+        result.update(applied=_follower.applied, bootstraps=_follower.bootstraps, error=_follower.error)
+    try:
+        saved = serialization.read(REPLICA_PATH)
+    except (FileNotFoundError, ValueError):
+        saved = {}
+    if saved.get("primary") != str(primary):
+        return {**result, "state": "bootstrapping"}
+    behind = _behind(primary / "wal", (saved["segment"], saved["offset"]))
+    applied_at = datetime.fromisoformat(saved["date"])
+    return {
+        **result,
+        "state": "streaming" if behind else "caught_up",
+        "position": [saved["segment"], saved["offset"]],
+        "applied_at": saved["date"],
+        "lag_bytes": behind,
+        "lag_seconds": round((datetime.now(timezone.utc) - applied_at).total_seconds(), 3) if behind else 0.0,
+    }
+
+
+_follower: Optional[Follower] = None
+
+
+def start() -> Optional[Follower]:
+    """Start following MCP_REPLICA_OF; returns None when this library is not a replica."""
+    global _follower
+    if not storage.REPLICA_OF or _follower is not None:
+        return _follower
+    _follower = Follower(Path(storage.REPLICA_OF)).start()
+    return _follower
+
+
+def stop():
+    global _follower
+    if _follower is not None:
+        _follower.stop()
+        _follower = None
@@ -1,56 +1,143 @@
 from __future__ import annotations
-from dataclasses import dataclass, field
-from typing import List, Optional
+import sys
+from typing import Any, Dict, Tuple
 import re
 
 STYLE_ENUM = {"chapter", "blog", "post", "snippet", "tweet"}
 
+_REQUIRED = object()
 
-@dataclass
-class ContentNode:
-    id: str
-    type: str = "content"
-    title: Optional[str] = None
-    date: str = ""
-    style: List[str] = field(default_factory=list)
-    tags: List[str] = field(default_factory=list)
-    authors: List[str] = field(default_factory=list)
-    relates: List[str] = field(default_factory=list)
-    content: str = ""
-
-
-@dataclass
-class TagNode:
-    id: str
-    type: str = "tag"
-    name: str = ""
-
-
-@dataclass
-class StyleNode:
-    id: str
-    type: str = "style"
-    name: str = ""
-
-
-@dataclass
-class AuthorNode:
-    id: str
-    type: str = "author"
-    name: str = ""
-    linkedin_username: str = ""
-    twitter_username: str = ""
-    substack_username: str = ""
-    reddit_username: str = ""
-
-
-@dataclass
-class LinkNode:
-    id: str
-    type: str = "link"
-    url: str = ""
-    title: Optional[str] = None
-    description: Optional[str] = None
+
+class _Node:
+    """
+    Base for node types: slotted, immutable, with shallow dict conversion.
+
+    FIELDS lists (name, default) pairs in order. List values are stored as
+    tuples and converted back to lists by to_dict(), so no deep copy is made
+    in either direction.
+    """
+
+    __slots__ = ()
+    FIELDS: Tuple[Tuple[str, Any], ...] = ()
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        if len(args) > len(self.FIELDS):
+            raise TypeError(f"{type(self).__name__} takes at most {len(self.FIELDS)} positional arguments")
+        for i, (name, default) in enumerate(self.FIELDS):
+            if i < len(args):
+                value = args[i]
+            else:
+                value = kwargs.pop(name, default)
+                if value is _REQUIRED:
+                    raise TypeError(f"{type(self).__name__} missing required field '{name}'")
+            object.__setattr__(self, name, tuple(value) if isinstance(value, list) else value)
+        if kwargs:
+            raise TypeError(f"{type(self).__name__} got unexpected fields: {sorted(kwargs)}")
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def _values(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name, _ in self.FIELDS)
+
+    def __eq__(self, other: Any) -> bool:
+        return type(other) is type(self) and other._values() == self._values()
+
+    def __hash__(self) -> int:
+        return hash((type(self), self._values()))
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name, _ in self.FIELDS)
+        return f"{type(self).__name__}({fields})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = {}
+        for name, _ in self.FIELDS:
+            value = getattr(self, name)
+            out[name] = list(value) if isinstance(value, tuple) else value
+        return out
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+        """Build a node from a dict, ignoring keys that are not fields (e.g. "links")."""
+        return cls(**{name: data[name] for name, _ in cls.FIELDS if name in data})
+
+
+class ContentNode(_Node):
+    FIELDS = (
+        ("id", _REQUIRED),
+        ("type", "content"),
+        ("title", None),
+        ("date", ""),
+        ("style", ()),
+        ("tags", ()),
+        ("authors", ()),
+        ("relates", ()),
+        ("content", ""),
+    )
+    __slots__ = tuple(name for name, _ in FIELDS)
+
+
+class TagNode(_Node):
+    FIELDS = (("id", _REQUIRED), ("type", "tag"), ("name", ""))
+    __slots__ = tuple(name for name, _ in FIELDS)
+
+
+class StyleNode(_Node):
+    FIELDS = (("id", _REQUIRED), ("type", "style"), ("name", ""))
+    __slots__ = tuple(name for name, _ in FIELDS)
+
+
+class AuthorNode(_Node):
+    FIELDS = (
+        ("id", _REQUIRED),
+        ("type", "author"),
+        ("name", ""),
+        ("linkedin_username", ""),
+        ("twitter_username", ""),
+        ("substack_username", ""),
+        ("reddit_username", ""),
+    )
+    __slots__ = tuple(name for name, _ in FIELDS)
+
+
+class LinkNode(_Node):
+    FIELDS = (
+        ("id", _REQUIRED),
+        ("type", "link"),
+        ("url", ""),
+        ("title", None),
+        ("description", None),
+    )
+    __slots__ = tuple(name for name, _ in FIELDS)
+
+
+class DocMeta(_Node):
+    """
+    Per-document metadata kept in memory by the search index for filtering and
+    date sorting. Style, tag and author strings are interned, so the millions
+    of repeats across a large library share one object each.
+    """
+
+    FIELDS = (("date", ""), ("title", None), ("style", ()), ("tags", ()), ("authors", ()))
+    __slots__ = tuple(name for name, _ in FIELDS)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DocMeta":
+        intern = sys.intern
+        return cls(
+            data.get("date") or "",
+            data.get("title"),
+            tuple(map(intern, data.get("style") or ())),
+            tuple(map(intern, data.get("tags") or ())),
+            tuple(map(intern, data.get("authors") or ())),
+        )
+
+
+NODE_TYPES = {cls.FIELDS[1][1]: cls for cls in (ContentNode, TagNode, StyleNode, AuthorNode, LinkNode)}
 
 
 def slugify(s: str) -> str:
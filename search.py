@@ -1,179 +1,915 @@
 from __future__ import annotations
-import json
+import heapq
 import math
+import os
 import random
 import re
+import threading
+import time
+from bisect import bisect_left, insort
 from collections import defaultdict
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 from pathlib import Path
-from schemas import STYLE_ENUM
-from storage import INDEX_DIR, NODE_DIRS
+from schemas import STYLE_ENUM, DocMeta
+import analysis
+import metrics
+import postings
+import semantic
+import serialization
+import storage
+from analysis import analyze_document, analyze_query
+from query import Clause, parse as parse_query
+from semantic import index_vector, rebuild_vectors, remove_vector, similarity_scores
+from similarity import minhash, lsh_bands, normalize_text, signature_similarity
+from storage import (
+    INDEX_DIR,
+    NODE_DIRS,
+    ensure_dirs,
+    rebuild_dedup_index,
+    recount,
+    get_node,
+    iter_content_nodes,
+    node_ids,
+    node_signature,
+    node_stamp,
+    read_node,
+)
 
-STOP = {"the", "and", "a", "to", "of", "in", "it", "is", "that", "on", "for", "as", "with", "this", "be"}
-
-INV_PATH = INDEX_DIR / "inverted.json"
+INV_PATH = INDEX_DIR / "inverted.bin"
+LEGACY_INV_PATH = INDEX_DIR / "inverted.json"  # before the mapped format; converted on load
 LEN_PATH = INDEX_DIR / "doclens.json"
 META_PATH = INDEX_DIR / "meta.json"
+MINHASH_PATH = INDEX_DIR / "minhash.json"
+MANIFEST_PATH = INDEX_DIR / "manifest.json"
+TOMBSTONE_PATH = INDEX_DIR / "tombstones.json"
+INFO_PATH = INDEX_DIR / "info.json"
 
+# Postings of deleted documents are swept once tombstones exceed this share of live documents.
+PURGE_RATIO = float(os.environ.get("MCP_TOMBSTONE_PURGE_RATIO", "0.1"))
+
+_minhash_cache: Dict[str, Any] = {"mtime": None, "index": None}
+_tombstone_cache: Dict[str, Any] = {"mtime": None, "ids": set()}
+_manifest_cache: Dict[str, Any] = {"mtime": None, "entries": {}}
+# Inverted (mapped, or a dict once this process wrote to it), doclens and meta,
+# reused until the files change on disk. The files are only compared again once
+# the library generation (storage.generation()) moved, i.e. some process wrote.
+_index_lock = threading.RLock()
+_index_cache: Dict[str, Any] = {"key": None, "shared": None, "data": ({}, {}, {})}
+# Bumped whenever the in-memory index changes (local write or reload from disk).
+_stats: Dict[str, int] = {"generation": 0, "cache_hits": 0, "cache_misses": 0}
+_analyzer_checked = False
+# Label -> doc sets, the (date, doc) list and per-label (date, doc) lists derived
+# from meta; rebuilt when the generation changes, kept current by local writes.
+_derived: Dict[str, Any] = {"generation": None, "labels": {}, "dates": [], "facet_dates": {}}
 
-def _tokenize(text: str) -> List[str]:
-    if not text:
-        return []
-    lowered = text.lower()
-    tokens = re.findall(r"[a-z0-9]+", lowered)
-    return [t for t in tokens if t not in STOP]
 
+def index_document(doc_id: str, node: Dict[str, Any], previous: Optional[Dict[str, Any]] = None):
+    """
+    Add a content node to the indexes. When re-indexing an updated node, pass the
+    previous version so its postings are removed incrementally.
+    """
+    with storage.writer(), _index_lock:
+        _index_document(doc_id, node, previous)
 
-def index_document(doc_id: str, node: Dict[str, Any]):
-    inv = json.loads(INV_PATH.read_text()) if INV_PATH.exists() else {}
-    lens = json.loads(LEN_PATH.read_text()) if LEN_PATH.exists() else {}
-    meta = json.loads(META_PATH.read_text()) if META_PATH.exists() else {}
 
-    text = (node.get("title") or "") + "\n" + (node.get("content") or "")
-    toks = _tokenize(text)
+def _add_postings(inv, lens, meta, doc_id: str, node: Dict[str, Any]):
+    toks = analyze_document(node)
     tf: Dict[str, int] = defaultdict(int)
     for t in toks:
         tf[t] += 1
     for t, cnt in tf.items():
         inv.setdefault(t, {})[doc_id] = cnt
     lens[doc_id] = len(toks) or 1
-    meta[doc_id] = {
-        "date": node.get("date", ""),
-        "title": node.get("title"),
-        "style": node.get("style", []),
-        "tags": node.get("tags", []),
-        "authors": node.get("authors", []),
-    }
-    INV_PATH.write_text(json.dumps(inv))
-    LEN_PATH.write_text(json.dumps(lens))
-    META_PATH.write_text(json.dumps(meta))
+    meta[doc_id] = DocMeta.from_dict(node)
+
+
+def _index_document(doc_id: str, node: Dict[str, Any], previous: Optional[Dict[str, Any]] = None):
+    inv, lens, meta = _load_indexes(writable=True)
+
+    if previous is not None:
+        for t in set(analyze_document(previous)):
+            postings = inv.get(t)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del inv[t]
+    derived_current = _derived["generation"] == _stats["generation"]
+    old_meta = meta.get(doc_id)
+    _add_postings(inv, lens, meta, doc_id, node)
+    _save_indexes(inv, lens, meta)
+    dead = _load_tombstones()
+    if doc_id in dead:
+        _save_tombstones(dead - {doc_id})  # indexed again: a later purge must keep its postings
+    _derived_replace(doc_id, old_meta, meta[doc_id], derived_current)
+
+    mh = _load_minhash()
+    _minhash_insert(mh, doc_id, node.get("content") or "")
+    _save_minhash(mh)
+    index_vector(doc_id, node)
+    update_manifest([doc_id])
+
+
+def remove_document(doc_id: str):
+    """
+    Remove a deleted content node from the indexes.
+
+    The document is dropped from doc lengths and metadata (so queries skip it
+    immediately) and tombstoned; its postings are swept in one pass once
+    tombstones exceed PURGE_RATIO of the live documents, or by rebuild_index.
+    """
+    with storage.writer(), _index_lock:
+        inv, lens, meta = _load_indexes(writable=True)
+        dead = set(_load_tombstones())
+        if lens.pop(doc_id, None) is not None:
+            dead.add(doc_id)
+        derived_current = _derived["generation"] == _stats["generation"]
+        old_meta = meta.pop(doc_id, None)
+        if len(dead) > PURGE_RATIO * max(1, len(lens)):
+            _purge_postings(inv, dead)
+            dead = set()
+        _save_indexes(inv, lens, meta)
+        _derived_replace(doc_id, old_meta, None, derived_current)
+        _save_tombstones(dead)
+
+        mh = _load_minhash()
+        _minhash_insert(mh, doc_id, "")
+        _save_minhash(mh)
+        remove_vector(doc_id)
+        update_manifest([doc_id])
+
+
+def _purge_postings(inv: Dict[str, Dict[str, int]], dead: set):
+    for t in list(inv):
+        postings = inv[t]
+        if len(dead) < len(postings):
+            for doc in dead:
+                postings.pop(doc, None)
+        else:
+            for doc in dead.intersection(postings):
+                del postings[doc]
+        if not postings:
+            del inv[t]
+
+
+def _load_tombstones() -> set:
+    try:
+        mtime = TOMBSTONE_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return set()
+    if _tombstone_cache["mtime"] != mtime:
+        _tombstone_cache["ids"] = set(serialization.read(TOMBSTONE_PATH))
+        _tombstone_cache["mtime"] = mtime
+    return _tombstone_cache["ids"]
+
+
+def _save_tombstones(dead: set):
+    if not dead:
+        TOMBSTONE_PATH.unlink(missing_ok=True)
+        _tombstone_cache.update(mtime=None, ids=set())
+        return
+    serialization.write(TOMBSTONE_PATH, sorted(dead))
+    _tombstone_cache.update(mtime=TOMBSTONE_PATH.stat().st_mtime_ns, ids=dead)
+
+
+def _load_manifest() -> Dict[str, List[Any]]:
+    try:
+        mtime = MANIFEST_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _manifest_cache["mtime"] != mtime:
+        _manifest_cache.update(mtime=mtime, entries=serialization.read(MANIFEST_PATH))
+    return _manifest_cache["entries"]
+
+
+def _save_manifest(entries: Dict[str, List[Any]]):
+    serialization.write(MANIFEST_PATH, entries)
+    _manifest_cache.update(mtime=MANIFEST_PATH.stat().st_mtime_ns, entries=entries)
+
+
+def index_lock() -> threading.RLock:
+    """The lock guarding the index files and caches; take it after storage.writer()."""
+    return _index_lock
+
+
+def update_manifest(doc_ids: List[str]):
+    """Record the current file signature of doc_ids (dropping files that no longer exist)."""
+    if not MANIFEST_PATH.exists():
+        return  # created by the next rebuild; until then incremental reindex falls back to full
+    entries = _load_manifest()
+    for doc_id in doc_ids:
+        sig = node_signature("content", doc_id)
+        if sig is not None:
+            entries[doc_id] = sig
+        else:
+            entries.pop(doc_id, None)
+    _save_manifest(entries)
 
 
 def rebuild_index():
+    storage.apply_pending()
+    with storage.writer(), _index_lock:
+        _rebuild_index()
+
+
+def reindex(mode: str = "full", doc_ids: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Rebuild the indexes. mode="incremental" compares the content files with the
+    manifest of (mtime, size, hash) recorded at index time and only re-indexes
+    added or changed files and removes deleted ones; it falls back to a full
+    rebuild when there is no manifest or the analyzer settings changed.
+
+    doc_ids restricts an incremental pass to those documents instead of
+    scanning the content directory (used by the filesystem watcher).
+    """
+    if mode not in ("full", "incremental"):
+        raise ValueError(f"Invalid reindex mode '{mode}'. Allowed: ['full', 'incremental']")
+    storage.apply_pending()  # queued updates must not land after this pass
+    with storage.writer(), _index_lock:
+        t0 = time.perf_counter()
+        stats: Dict[str, Any] = {"mode": "full"}
+        if mode == "full" or not _incremental_reindex(stats, doc_ids):
+            _rebuild_index()
+            stats = {"mode": "full", "documents": len(_index_cache["data"][1])}
+        stats["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        return stats
+
+
+def _incremental_reindex(stats: Dict[str, Any], doc_ids: Optional[Iterable[str]] = None) -> bool:
+    if _recorded_analyzer() != analysis.config_signature() or not MANIFEST_PATH.exists():
+        return False
+    entries = _load_manifest()
+    changed: Dict[str, Optional[Dict[str, Any]]] = {}
+    added = unchanged = touched = 0
+    seen = set()
+    candidates = entries if doc_ids is None else set(doc_ids)
+    for doc_id in node_ids("content") if doc_ids is None else candidates:
+        stamp = node_stamp("content", doc_id)
+        if stamp is None:
+            continue  # deleted meanwhile
+        seen.add(doc_id)
+        old = entries.get(doc_id)
+        if old is not None and (old[0], old[1]) == stamp:
+            unchanged += 1
+            continue
+        sig = node_signature("content", doc_id)
+        if sig is None:
+            seen.discard(doc_id)
+            continue
+        if old is not None and old[2] == sig[2]:
+            entries[doc_id] = sig  # touched but identical
+            unchanged += 1
+            touched += 1
+            continue
+        added += old is None
+        entries[doc_id] = sig
+        changed[doc_id] = read_node("content", doc_id)
+    removed = [doc for doc in candidates if doc in entries and doc not in seen]
+    for doc in removed:
+        del entries[doc]
+        changed[doc] = None
+
+    if changed:
+        _index_changes(changed)
+        storage.replace_dedup_entries(changed)
+        if doc_ids is None:
+            storage.adjust_node_count("content", len(seen) - storage.counters()["nodes"].get("content", 0))
+        else:
+            storage.adjust_node_count("content", added - len(removed))
+    if changed or touched:
+        _save_manifest(entries)
+    storage._log({"indexed": None if doc_ids is None else list(candidates)})
+    stats.update(
+        mode="incremental",
+        added=added,
+        changed=len(changed) - added - len(removed),
+        removed=len(removed),
+        unchanged=unchanged,
+    )
+    return True
+
+
+def _index_changes(changed: Dict[str, Optional[Dict[str, Any]]]):
+    """Re-index the given nodes (None: deleted) in one pass over the postings."""
+    inv, lens, meta = _load_indexes(writable=True)
+    mh = _load_minhash()
+    _purge_postings(inv, set(changed))
+    for doc_id, node in changed.items():
+        lens.pop(doc_id, None)
+        meta.pop(doc_id, None)
+        _minhash_insert(mh, doc_id, (node or {}).get("content") or "")
+        if node is None:
+            remove_vector(doc_id)
+        else:
+            _add_postings(inv, lens, meta, doc_id, node)
+            index_vector(doc_id, node)
+    _save_indexes(inv, lens, meta)
+    _save_minhash(mh)
+    dead = _load_tombstones()
+    if dead & changed.keys():
+        _save_tombstones(dead - changed.keys())  # their postings were purged above
+
+
+def index_batch(doc_ids: Iterable[str]):
+    """
+    Bring the indexes up to date with the stored version of each document
+    (removing those that no longer exist), writing the index files once for
+    the whole batch. Used to apply the updates queued in WAL mode.
+    """
+    with storage.writer(), _index_lock:
+        changed = {doc_id: read_node("content", doc_id) for doc_id in doc_ids}
+        if changed:
+            _index_changes(changed)
+            update_manifest(list(changed))
+            storage._log({"indexed": list(changed)})
+
+
+def _rebuild_index():
     inv: Dict[str, Dict[str, int]] = {}
     lens: Dict[str, int] = {}
-    meta: Dict[str, Dict[str, Any]] = {}
-    for p in NODE_DIRS["content"].glob("*.json"):
-        node = json.loads(p.read_text())
+    meta: Dict[str, DocMeta] = {}
+    mh: Dict[str, Any] = {"sigs": {}, "buckets": {}}
+    manifest: Dict[str, List[Any]] = {}
+    for node in iter_content_nodes():
         doc_id = node["id"]
-        text = (node.get("title") or "") + "\n" + (node.get("content") or "")
-        toks = _tokenize(text)
-        tf: Dict[str, int] = defaultdict(int)
-        for t in toks:
-            tf[t] += 1
-        for t, cnt in tf.items():
-            inv.setdefault(t, {})[doc_id] = cnt
-        lens[doc_id] = len(toks) or 1
-        meta[doc_id] = {
-            "date": node.get("date", ""),
-            "title": node.get("title"),
-            "style": node.get("style", []),
-            "tags": node.get("tags", []),
-            "authors": node.get("authors", []),
-        }
-    INV_PATH.write_text(json.dumps(inv))
-    LEN_PATH.write_text(json.dumps(lens))
-    META_PATH.write_text(json.dumps(meta))
-
-
-def _idf(inv: Dict[str, Dict[str, int]], token: str) -> float:
-    doc_ids = {doc for postings in inv.values() for doc in postings}
-    total_docs = max(1, len(doc_ids))
+        _add_postings(inv, lens, meta, doc_id, node)
+        _minhash_insert(mh, doc_id, node.get("content") or "")
+        manifest[doc_id] = node_signature("content", doc_id)
+    _save_indexes(inv, lens, meta)
+    _save_manifest(manifest)
+    serialization.write(INFO_PATH, {"analyzer": analysis.config_signature()})
+    _save_tombstones(set())
+    _save_minhash(mh)
+    rebuild_vectors(iter_content_nodes())
+    rebuild_dedup_index()
+    recount()
+    storage._log({"indexed": None})
+
+
+def _load_minhash() -> Dict[str, Any]:
+    try:
+        mtime = MINHASH_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {"sigs": {}, "buckets": {}}
+    if _minhash_cache["mtime"] != mtime:
+        _minhash_cache["index"] = serialization.read(MINHASH_PATH)
+        _minhash_cache["mtime"] = mtime
+    return _minhash_cache["index"]
+
+
+def _save_minhash(index: Dict[str, Any]):
+    ensure_dirs()
+    serialization.write(MINHASH_PATH, index)
+    _minhash_cache["mtime"] = MINHASH_PATH.stat().st_mtime_ns
+    _minhash_cache["index"] = index
+
+
+def _minhash_insert(index: Dict[str, Any], doc_id: str, text: str):
+    old = index["sigs"].pop(doc_id, None)
+    if old:
+        for key in lsh_bands(old):
+            bucket = index["buckets"].get(key, [])
+            if doc_id in bucket:
+                bucket.remove(doc_id)
+            if not bucket:
+                index["buckets"].pop(key, None)
+    if not text.strip():
+        return
+    sig = minhash(text)
+    index["sigs"][doc_id] = sig
+    for key in lsh_bands(sig):
+        index["buckets"].setdefault(key, []).append(doc_id)
+
+
+def find_similar(content_id: str, k: int = 5) -> List[Dict[str, Any]]:
+    """
+    Return up to k content nodes most similar to content_id.
+
+    Candidates come from the MinHash LSH buckets maintained at index time, so
+    only colliding documents are scored; similarity is the estimated Jaccard
+    overlap of word 3-gram shingles.
+    """
+    storage.apply_pending()
+    index = _load_minhash()
+    sig = index["sigs"].get(content_id)
+    if sig is None:
+        sig = minhash(get_node(content_id).get("content") or "")
+    candidates = set()
+    for key in lsh_bands(sig):
+        candidates.update(index["buckets"].get(key, ()))
+    candidates.discard(content_id)
+    best = heapq.nlargest(
+        k, ((signature_similarity(sig, index["sigs"][doc]), doc) for doc in candidates if doc in index["sigs"])
+    )
+    results = []
+    for score, doc in best:
+        node = read_node("content", doc)
+        if node is not None:
+            results.append({"id": doc, "title": node.get("title"), "similarity": round(score, 4)})
+    return results
+
+
+def _idf(inv: Dict[str, Dict[str, int]], lens: Dict[str, int], token: str) -> float:
+    total_docs = max(1, len(lens))
     df = len(inv.get(token, {}))
     return math.log((1 + total_docs) / (1 + df)) + 1.0
 
 
 def _score(inv: Dict[str, Dict[str, int]], lens: Dict[str, int], q_toks: List[str]) -> Dict[str, float]:
     scores = defaultdict(float)
-    idf_cache = {t: _idf(inv, t) for t in set(q_toks)}
+    idf_cache = {t: _idf(inv, lens, t) for t in set(q_toks)}
     for t in q_toks:
         postings = inv.get(t, {})
         for doc, tf in postings.items():
-            scores[doc] += (tf * idf_cache[t]) / math.sqrt(lens.get(doc, 1))
+            length = lens.get(doc)
+            if length:  # tombstoned documents have no length
+                scores[doc] += (tf * idf_cache[t]) / math.sqrt(length)
     return scores
 
 
-def _load_indexes():
-    inv = json.loads(INV_PATH.read_text()) if INV_PATH.exists() else {}
-    lens = json.loads(LEN_PATH.read_text()) if LEN_PATH.exists() else {}
-    meta = json.loads(META_PATH.read_text()) if META_PATH.exists() else {}
-    return inv, lens, meta
+def _index_key():
+    key = []
+    for p in (INV_PATH, LEN_PATH, META_PATH):
+        try:
+            st = p.stat()
+            key.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            key.append(None)
+    return tuple(key)
 
 
-def search(
-    query: Optional[str],
-    filters: Dict[str, Any],
-    sort: str = "relevance",
-    page: int = 1,
-    page_size: int = 10,
-    seed: Optional[int] = None,
-) -> Dict[str, Any]:
-    inv, lens, meta = _load_indexes()
-    q_toks = _tokenize(query or "")
-    docset = set(meta.keys())
-
-    if filters.get("style"):
-        styles = [s for s in filters["style"] if s in STYLE_ENUM]
-        docset &= {doc for doc, info in meta.items() if any(s in info.get("style", []) for s in styles)}
-
-    if filters.get("tag"):
-        tags = set(filters["tag"])
-        docset &= {doc for doc, info in meta.items() if any(t in info.get("tags", []) for t in tags)}
-
-    if filters.get("author"):
-        authors = set(filters["author"])
-        docset &= {doc for doc, info in meta.items() if any(a in info.get("authors", []) for a in authors)}
-
-    if filters.get("title"):
-        substr = filters["title"].lower()
-        docset &= {doc for doc, info in meta.items() if (info.get("title") or "").lower().find(substr) >= 0}
-
-    if filters.get("content"):
-        content_dir = NODE_DIRS["content"]
-        substr = filters["content"].lower()
-        keep = set()
-        for doc in list(docset):
-            path = content_dir / f"{doc}.json"
-            if path.exists():
-                text = json.loads(path.read_text()).get("content", "").lower()
-                if substr in text:
-                    keep.add(doc)
-        docset &= keep
-
-    if filters.get("relates"):
-        rels = set(filters["relates"])
+def _recorded_analyzer() -> Optional[Dict[str, Any]]:
+    try:
+        return serialization.read(INFO_PATH).get("analyzer")
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _check_analyzer():
+    """
+    Rebuild the index once per process if it was built with different analyzer
+    settings (or predates recording them).
+    """
+    global _analyzer_checked
+    _analyzer_checked = True
+    if _recorded_analyzer() == analysis.config_signature():
+        return
+    if not (INV_PATH.exists() or LEGACY_INV_PATH.exists() or NODE_DIRS["content"].parent.exists()):
+        return  # no library yet
+    with storage.writer(), _index_lock:
+        if _recorded_analyzer() == analysis.config_signature():
+            return  # rebuilt by another process meanwhile
+        if INV_PATH.exists() or LEGACY_INV_PATH.exists():
+            _rebuild_index()
+        else:
+            ensure_dirs()
+            serialization.write(INFO_PATH, {"analyzer": analysis.config_signature()})
+
+
+def _load_indexes(writable: bool = False):
+    """
+    The (inverted, doclens, meta) indexes. The inverted index is a read-only
+    postings.MappedPostings shared with the other processes unless writable is
+    set: then it is a dict the caller (holding storage.writer()) may modify and
+    pass to _save_indexes.
+    """
+    if not _analyzer_checked:
+        _check_analyzer()
+    if not writable:
+        storage.apply_pending()  # read your writes in WAL mode
+    with _index_lock:
+        shared = storage.generation()
+        if not shared or shared != _index_cache["shared"]:
+            if LEGACY_INV_PATH.exists():
+                _convert_legacy_index()
+            key = _index_key()
+            if key != _index_cache["key"]:
+                inv = postings.MappedPostings(INV_PATH) if INV_PATH.exists() else {}
+                lens = serialization.read(LEN_PATH) if LEN_PATH.exists() else {}
+                raw_meta = serialization.read(META_PATH) if META_PATH.exists() else {}
+                meta = {doc: DocMeta.from_dict(info) for doc, info in raw_meta.items()}
+                _index_cache.update(key=key, data=(inv, lens, meta))
+                _stats["generation"] += 1
+                _stats["cache_misses"] += 1
+            else:
+                _stats["cache_hits"] += 1
+            _index_cache["shared"] = shared
+        else:
+            _stats["cache_hits"] += 1
+        inv, lens, meta = _index_cache["data"]
+        if writable and isinstance(inv, postings.MappedPostings):
+            _index_cache["data"] = (inv.to_dict(), lens, meta)
+        return _index_cache["data"]
+
+
+def _convert_legacy_index():
+    """Write an inverted.json (older libraries and snapshots) in the mapped format."""
+    try:
+        inv = serialization.read(LEGACY_INV_PATH)
+    except FileNotFoundError:
+        return  # converted by another process meanwhile
+    postings.write(INV_PATH, inv)
+    LEGACY_INV_PATH.unlink(missing_ok=True)
+
+
+def _save_indexes(inv, lens, meta):
+    ensure_dirs()
+    postings.write(INV_PATH, inv)
+    serialization.write(LEN_PATH, lens)
+    serialization.write(META_PATH, {doc: info.to_dict() for doc, info in meta.items()})
+    _index_cache.update(key=_index_key(), data=(inv, lens, meta))
+    _stats["generation"] += 1
+
+
+def index_stats() -> Dict[str, Any]:
+    """
+    In-memory index statistics (generation, sizes, cache hit/miss counts).
+    Reads no files: sizes describe the currently cached generation.
+    """
+    inv, lens, _ = _index_cache["data"]
+    return {
+        **_stats,
+        "loaded": _index_cache["key"] is not None,
+        "documents": len(lens),
+        "terms": len(inv),
+        "tombstones": len(_tombstone_cache["ids"]),
+        "vectors": semantic._state.get("n", 0),
+        "library_generation": storage.generation(),
+    }
+
+
+def warm() -> Dict[str, float]:
+    """
+    Load the search, similarity, vector and dedup indexes into memory ahead of
+    the first query. Returns the load time of each in milliseconds.
+    """
+    timings: Dict[str, float] = {}
+    for name, load in (
+        ("inverted", _load_indexes),
+        ("minhash", _load_minhash),
+        ("vectors", semantic.warm),
+        ("storage", storage.warm),
+    ):
+        t0 = time.perf_counter()
+        load()
+        timings[name] = round((time.perf_counter() - t0) * 1000, 2)
+    return timings
+
+
+def _phase(name: str):
+    return metrics.timer(metrics.SEARCH_PHASE, phase=name)
+
+
+# Operator tiers: index-backed lookups, then phrase checks (postings-prefiltered
+# file reads), then scans of metadata or the relates log, then content file scans.
+_TIERS = {"date": 0, "style": 0, "tag": 0, "author": 0, "term": 0, "phrase": 1, "title": 2, "relates": 2, "content": 3}
+_LABEL_FIELDS = {"style": "style", "tag": "tags", "author": "authors"}
+
+
+def _refresh_derived(meta: Dict[str, DocMeta]):
+    if _derived["generation"] != _stats["generation"]:
+        labels: Dict[str, Dict[str, set]] = {field: defaultdict(set) for field in _LABEL_FIELDS}
+        for doc, info in meta.items():
+            for field, attr in _LABEL_FIELDS.items():
+                for label in getattr(info, attr):
+                    labels[field][label].add(doc)
+        dates = sorted((info.date, doc) for doc, info in meta.items())
+        _derived.update(generation=_stats["generation"], labels=labels, dates=dates, facet_dates={})
+
+
+def _labels(meta: Dict[str, DocMeta]) -> Dict[str, Dict[str, set]]:
+    """Label -> doc set maps for style/tag/author."""
+    _refresh_derived(meta)
+    return _derived["labels"]
+
+
+def _dates(meta: Dict[str, DocMeta]) -> List[Tuple[str, str]]:
+    """All live documents as (date, doc) pairs in ascending order."""
+    _refresh_derived(meta)
+    return _derived["dates"]
+
+
+def _facet_dates(meta: Dict[str, DocMeta], field: str, label: str) -> List[Tuple[str, str]]:
+    """(date, doc) pairs of the documents with one style/tag/author label, ascending; built on first use."""
+    _refresh_derived(meta)
+    key = (field, label)
+    facets = _derived["facet_dates"]
+    if key not in facets:
+        facets[key] = sorted((meta[doc].date, doc) for doc in _derived["labels"][field].get(label, ()))
+    return facets[key]
+
+
+def _sorted_remove(items: List[Tuple[str, str]], item: Tuple[str, str]):
+    i = bisect_left(items, item)
+    if i < len(items) and items[i] == item:
+        del items[i]
+
+
+def _derived_replace(doc_id: str, old: Optional[DocMeta], new: Optional[DocMeta], current: bool):
+    """Apply one document's metadata change to the derived structures if they were current before the write."""
+    if not current:
+        return
+    labels, facets = _derived["labels"], _derived["facet_dates"]
+    if old is not None:
+        _sorted_remove(_derived["dates"], (old.date, doc_id))
+    if new is not None:
+        insort(_derived["dates"], (new.date, doc_id))
+    for field, attr in _LABEL_FIELDS.items():
+        for label in getattr(old, attr, ()):
+            labels[field][label].discard(doc_id)
+            if (field, label) in facets:
+                _sorted_remove(facets[(field, label)], (old.date, doc_id))
+        for label in getattr(new, attr, ()):
+            labels[field][label].add(doc_id)
+            if (field, label) in facets:
+                insort(facets[(field, label)], (new.date, doc_id))
+    _derived["generation"] = _stats["generation"]
+
+
+def _date_bounds(value: str) -> Tuple[str, str]:
+    """Split "FROM..TO" (either side optional; a bare value means FROM..FROM) into bounds."""
+    lo, sep, hi = value.partition("..")
+    return (lo.strip(), hi.strip() if sep else lo.strip())
+
+
+def _date_slice(dates: List[Tuple[str, str]], value: str) -> List[Tuple[str, str]]:
+    """Entries whose date lies in the inclusive range; a bound matches every date it prefixes."""
+    lo, hi = _date_bounds(value)
+    start = bisect_left(dates, (lo,)) if lo else 0
+    end = bisect_left(dates, (hi + "\uffff",)) if hi else len(dates)
+    return dates[start:end]
+
+
+def _filter_clauses(filters: Dict[str, Any]) -> List[Clause]:
+    """Translate the search filters dict into query clauses."""
+    clauses = []
+    for field in ("style", "tag", "author", "title", "content", "relates"):
+        value = filters.get(field)
+        if value:
+            values = (value,) if isinstance(value, str) else tuple(value)
+            if field == "style":
+                values = tuple(v for v in values if v in STYLE_ENUM)
+            clauses.append(Clause(field, values))
+    if filters.get("date_from") or filters.get("date_to"):
+        clauses.append(Clause("date", (f"{filters.get('date_from') or ''}..{filters.get('date_to') or ''}",)))
+    return clauses
+
+
+def _term_postings(inv: Dict[str, Dict[str, int]], text: str) -> Optional[List[Dict[str, int]]]:
+    terms = analyze_query(text)
+    return [inv.get(t, {}) for t in terms] if terms else None
+
+
+def _estimate(clause: Clause, meta, inv) -> int:
+    """Estimated number of matching documents, from the label maps and postings."""
+    if clause.field in _LABEL_FIELDS:
+        labels = _labels(meta)[clause.field]
+        return sum(len(labels.get(v, ())) for v in clause.values)
+    if clause.field in ("term", "phrase"):
+        postings = _term_postings(inv, clause.values[0])
+        return min(map(len, postings)) if postings else len(meta)
+    if clause.field == "date":
+        return len(_date_slice(_dates(meta), clause.values[0]))
+    return len(meta)
+
+
+def plan_query(clauses: List[Clause], meta, inv) -> List[Tuple[Clause, int]]:
+    """
+    Order clauses for execution: cheaper tiers first; within a tier, positive
+    clauses before negations and the most selective (smallest estimate) first,
+    so file-reading operators only see the survivors of the cheap ones.
+    """
+    estimated = [(c, _estimate(c, meta, inv)) for c in clauses]
+    return sorted(estimated, key=lambda ce: (_TIERS[ce[0].field], ce[0].negate, ce[1]))
+
+
+def _match(clause: Clause, docset: Optional[set], meta, inv) -> set:
+    """Documents in docset (all live documents when None) matching clause."""
+    field, values = clause.field, clause.values
+    scope = docset if docset is not None else meta.keys()
+    if field in _LABEL_FIELDS:
+        labels = _labels(meta)[field]
+        matched = set().union(*(labels.get(v, ()) for v in values))
+        return matched & docset if docset is not None else matched
+    if field == "date":
+        matched = {doc for _, doc in _date_slice(_dates(meta), values[0])}
+        return matched & docset if docset is not None else matched
+    if field == "term":
+        postings = _term_postings(inv, values[0]) or []
+        matched = set(scope)
+        for p in postings:
+            matched &= p.keys()
+        return matched if postings else set()
+    if field == "title":
+        subs = [v.lower() for v in values]
+        return {doc for doc in scope if any(sub in (meta[doc].title or "").lower() for sub in subs)}
+    if field == "phrase":
+        postings = _term_postings(inv, values[0])
+        candidates = set(scope)
+        for p in sorted(postings or [], key=len):
+            candidates &= p.keys()
+        pattern = re.compile(r"(?<!\w)" + re.escape(normalize_text(values[0])) + r"(?!\w)")
+        return {doc for doc in candidates if pattern.search(normalize_text(_doc_text(doc)))}
+    if field == "content":
+        subs = [v.lower() for v in values]
+        matched = set()
+        for doc in scope:
+            node = read_node("content", doc)
+            if node is not None:
+                text = node.get("content", "").lower()
+                if any(sub in text for sub in subs):
+                    matched.add(doc)
+        return matched
+    if field == "relates":
+        rels = set(values)
         rel_path = NODE_DIRS["content"].parent.parent / "edges" / "relates.jsonl"
-        keep = set()
+        matched = set()
         if rel_path.exists():
-            for line in rel_path.read_text().splitlines():
+            for line in rel_path.read_bytes().splitlines():
                 try:
-                    obj = json.loads(line)
+                    obj = serialization.loads(line)
                 except Exception:
                     continue
-                if obj.get("src") in docset or obj.get("dst") in docset:
-                    if obj.get("src") in rels or obj.get("dst") in rels:
-                        keep.add(obj.get("src"))
-                        keep.add(obj.get("dst"))
-        docset &= keep
+                if obj.get("src") in rels or obj.get("dst") in rels:
+                    matched.add(obj.get("src"))
+                    matched.add(obj.get("dst"))
+        return matched & set(scope)
+    raise ValueError(f"Unknown query field '{field}'")
+
+
+def _doc_text(doc: str) -> str:
+    node = read_node("content", doc)
+    if node is None:
+        return ""
+    return (node.get("title") or "") + "\n" + (node.get("content") or "")
+
+
+def _execute(plan: List[Tuple[Clause, int]], meta, inv, steps: Optional[List[Dict[str, Any]]] = None) -> set:
+    docset: Optional[set] = None
+    for clause, estimate in plan:
+        t0 = time.perf_counter()
+        rows_in = len(docset) if docset is not None else len(meta)
+        matched = _match(clause, docset, meta, inv)
+        if clause.negate:
+            docset = (docset if docset is not None else set(meta)) - matched
+        else:
+            docset = matched
+        if steps is not None:
+            steps.append(
+                {
+                    "op": clause.field,
+                    "values": list(clause.values),
+                    "negate": clause.negate,
+                    "estimate": estimate,
+                    "rows_in": rows_in,
+                    "rows_out": len(docset),
+                    "ms": round((time.perf_counter() - t0) * 1000, 3),
+                }
+            )
+    return docset if docset is not None else set(meta)
+
+
+def _newest_first(candidates: set, plan: List[Tuple[Clause, int]], meta, limit: int) -> List[str]:
+    """
+    The `limit` newest candidates, walking a date-ordered list and stopping
+    early instead of sorting every candidate. The list walked is the smallest
+    per-label list of a positive style/tag/author clause (merged across its
+    values), or the global one.
+    """
+    if limit <= 0:
+        return []
+    sources = [_dates(meta)]
+    for clause, estimate in plan:
+        if clause.field in _LABEL_FIELDS and not clause.negate and estimate < sum(map(len, sources)):
+            sources = [_facet_dates(meta, clause.field, v) for v in clause.values]
+    walk = sum(map(len, sources))
+    # Walking visits ~walk/len(candidates) entries per hit; sort small candidate sets instead.
+    if len(candidates) * 8 < walk:
+        return [doc for _, doc in heapq.nlargest(limit, ((meta[doc].date, doc) for doc in candidates))]
+    out: List[str] = []
+    seen = set()
+    for _, doc in heapq.merge(*(reversed(src) for src in sources), reverse=True):
+        if doc in candidates and doc not in seen:
+            seen.add(doc)
+            out.append(doc)
+            if len(out) >= limit:
+                break
+    return out
+
+
+def _seeded_sample(candidates: set, meta, seed: Optional[int], limit: int) -> List[str]:
+    """
+    The first `limit` elements of a seeded random permutation of candidates.
+
+    Runs a partial Fisher-Yates shuffle with the swaps kept in a dict, so it
+    costs O(limit) draws instead of shuffling every candidate. Candidates are
+    taken in the stable (date, doc) order, and each page's results are a
+    prefix of the next page's, so a seed paginates consistently across
+    requests and worker processes.
+    """
+    dates = _dates(meta)
+    if len(candidates) == len(dates):
+        population = dates
+    else:
+        population = [entry for entry in dates if entry[1] in candidates]
+    n = len(population)
+    rnd = random.Random(seed)
+    swaps: Dict[int, int] = {}
+    out = []
+    for i in range(min(limit, n)):
+        j = i + rnd.randrange(n - i)
+        out.append(population[swaps.get(j, j)][1])
+        swaps[j] = swaps.get(i, i)
+    return out
+
+
+def search_ids(
+    query: Optional[str],
+    filters: Dict[str, Any],
+    sort: str = "relevance",
+    seed: Optional[int] = None,
+    semantic_weight: float = 0.0,
+    steps: Optional[List[Dict[str, Any]]] = None,
+    limit: Optional[int] = None,
+) -> List[str]:
+    """
+    Filter and rank content nodes, returning the matching IDs in order (the
+    first `limit` of them when given).
+
+    The query is parsed with the query language (see query.py): its clauses
+    and the filters are planned by plan_query and executed in that order, and
+    its free text ranks the results. Pass a list as steps to receive the plan
+    with per-step row counts and timings.
+
+    With sort="relevance" and semantic_weight > 0, the max-normalized TF-IDF
+    score is blended with the cosine similarity of the local hashed n-gram
+    vectors: (1 - w) * lexical + w * semantic.
+    """
+    return _ranked(query, filters, sort, seed, semantic_weight, steps, limit)[0]
+
 
-    candidates = list(docset)
+def _ranked(query, filters, sort, seed, semantic_weight, steps, limit) -> Tuple[List[str], int]:
+    with _phase("load"):
+        inv, lens, meta = _load_indexes()
+    parsed = parse_query(query or "")
+    q_toks = analyze_query(parsed.text)
 
+    with _phase("filter"):
+        plan = plan_query(_filter_clauses(filters) + parsed.clauses, meta, inv)
+        matched = _execute(plan, meta, inv, steps)
+    total = len(matched)
+    limit = total if limit is None else min(limit, total)
+
+    scores: Dict[str, float] = {}
     if sort == "relevance":
-        scores = _score(inv, lens, q_toks) if q_toks else {doc: 0.0 for doc in candidates}
-        candidates.sort(key=lambda doc: scores.get(doc, 0.0), reverse=True)
-    elif sort == "date":
-        candidates.sort(key=lambda doc: (meta.get(doc, {}).get("date") or ""), reverse=True)
-    elif sort == "random":
-        rnd = random.Random(seed)
-        rnd.shuffle(candidates)
-
-    total = len(candidates)
+        with _phase("score"):
+            scores = _score(inv, lens, q_toks) if q_toks else {}
+            weight = min(1.0, max(0.0, semantic_weight))
+            if weight > 0 and parsed.text:
+                top = max(scores.values(), default=0.0) or 1.0
+                sem = similarity_scores(parsed.text)
+                scores = {
+                    doc: (1 - weight) * scores.get(doc, 0.0) / top + weight * max(0.0, sem.get(doc, 0.0))
+                    for doc in matched
+                }
+
+    with _phase("sort"):
+        if sort == "relevance":
+            ordered = heapq.nlargest(limit, matched, key=lambda doc: scores.get(doc, 0.0))
+        elif sort == "date":
+            ordered = _newest_first(matched, plan, meta, limit)
+        elif sort == "random":
+            ordered = _seeded_sample(matched, meta, seed, limit)
+        else:
+            ordered = list(matched)[:limit]
+    return ordered, total
+
+
+def search(
+    query: Optional[str],
+    filters: Dict[str, Any],
+    sort: str = "relevance",
+    page: int = 1,
+    page_size: int = 10,
+    seed: Optional[int] = None,
+    semantic_weight: float = 0.0,
+    explain: bool = False,
+) -> Dict[str, Any]:
+    """
+    Filter, rank and paginate content nodes; see search_ids for ranking. With
+    explain=True the result includes the executed filter plan under "plan".
+    """
+    steps: Optional[List[Dict[str, Any]]] = [] if explain else None
     start = max(0, (page - 1) * page_size)
-    page_items = candidates[start : start + page_size]
+    ordered, total = _ranked(query, filters, sort, seed, semantic_weight, steps, start + page_size)
+    page_items = ordered[start : start + page_size]
 
     items: List[Dict[str, Any]] = []
-    for doc in page_items:
-        path = NODE_DIRS["content"] / f"{doc}.json"
-        if path.exists():
-            items.append(json.loads(path.read_text()))
-    return {"items": items, "total": total, "page": page, "page_size": page_size}
+    with _phase("fetch"):
+        for doc in page_items:
+            node = read_node("content", doc)
+            if node is not None:
+                items.append(node)
+    result = {"items": items, "total": total, "page": page, "page_size": page_size}
+    if explain:
+        result["plan"] = steps
+    return result
@@ -0,0 +1,248 @@
+"""
+Local, CPU-only semantic vectors for hybrid search.
+
+Documents are embedded with feature hashing of word unigrams, word bigrams and
+character trigrams into a fixed-width, L2-normalized float32 vector. Vectors are
+appended to ``index/vectors.f32`` (raw rows) with their IDs appended to
+``index/vectors.ids``, so indexing a document never rewrites the matrix.
+Deleting a document tombstones its current row (by row number) in
+``index/vectors.deleted`` until the next rebuild, so a row appended when the
+document is indexed again is live.
+
+NumPy is optional. When it is installed the matrix is memory-mapped and scored
+with one matrix-vector product, and an IVF (inverted file) coarse quantizer can
+be built for large libraries; without it a pure Python scan is used.
+"""
+from __future__ import annotations
+import math
+import os
+import re
+import zlib
+from array import array
+from collections import Counter
+from typing import Any, Dict, List, Optional
+import serialization
+from similarity import normalize_text
+import storage
+from storage import INDEX_DIR
+
+DIM = 256
+VEC_PATH = INDEX_DIR / "vectors.f32"
+IDS_PATH = INDEX_DIR / "vectors.ids"
+DELETED_PATH = INDEX_DIR / "vectors.deleted"
+IVF_CENTROIDS_PATH = INDEX_DIR / "ivf_centroids.f32"
+IVF_LISTS_PATH = INDEX_DIR / "ivf_lists.json"
+
+SEMANTIC_INDEX = os.environ.get("MCP_SEMANTIC_INDEX", "1") != "0"
+IVF_MIN_ROWS = int(os.environ.get("MCP_IVF_MIN_ROWS", "50000"))
+IVF_NPROBE = int(os.environ.get("MCP_IVF_NPROBE", "8"))
+
+_WORD_RE = re.compile(r"\w+")
+_ROW_BYTES = DIM * 4
+
+_numpy: Any = None
+_state: Dict[str, Any] = {"key": None}
+
+
+def _np():
+    """Import NumPy on first use; returns None when it is not installed."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy  # type: ignore
+
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+
+def embed(text: str) -> List[float]:
+    """Hashed n-gram embedding of text, L2-normalized."""
+    words = _WORD_RE.findall(normalize_text(text))
+    counts: Dict[str, float] = dict(Counter(words))
+    for w, c in list(counts.items()):
+        if len(w) > 3:
+            for i in range(len(w) - 2):
+                tri = "#" + w[i : i + 3]
+                counts[tri] = counts.get(tri, 0.0) + 0.25 * c
+    for key, c in Counter(map(" ".join, zip(words, words[1:]))).items():
+        counts[key] = counts.get(key, 0.0) + 0.5 * c
+    vec = [0.0] * DIM
+    log, crc32 = math.log, zlib.crc32
+    for feature, count in counts.items():
+        h = crc32(feature.encode("utf-8"))
+        weight = 1.0 + log(count) if count >= 1 else count
+        vec[h % DIM] += weight if (h >> 16) & 1 else -weight
+    norm = math.sqrt(sum(v * v for v in vec))
+    return [v / norm for v in vec] if norm else vec
+
+
+def _load() -> Dict[str, Any]:
+    """Load (or reuse) the memory-mapped matrix and the row -> ID mapping."""
+    try:
+        key = (VEC_PATH.stat().st_size, IDS_PATH.stat().st_mtime_ns, _mtime(DELETED_PATH))
+    except FileNotFoundError:
+        return {"key": None, "ids": [], "rows": {}, "matrix": None, "n": 0, "ivf": None}
+    if _state["key"] == key:
+        return _state
+    ids = IDS_PATH.read_text(encoding="utf-8").split()
+    n = min(len(ids), key[0] // _ROW_BYTES)
+    ids = ids[:n]
+    rows = {doc: i for i, doc in enumerate(ids)}  # later rows supersede earlier ones
+    if DELETED_PATH.exists():
+        for token in DELETED_PATH.read_text(encoding="utf-8").split():
+            if not token.isdigit():
+                rows.pop(token, None)  # written by earlier versions, which tombstoned IDs
+            elif int(token) < n and rows.get(ids[int(token)]) == int(token):
+                del rows[ids[int(token)]]
+    np = _np()
+    if n == 0:
+        matrix = None
+    elif np is not None:
+        matrix = np.memmap(VEC_PATH, dtype=np.float32, mode="r", shape=(n, DIM))
+    else:
+        matrix = array("f")
+        matrix.frombytes(VEC_PATH.read_bytes()[: n * _ROW_BYTES])
+    _state.update(key=key, ids=ids, rows=rows, matrix=matrix, n=n, ivf=_load_ivf(n))
+    return _state
+
+
+def _mtime(path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def warm():
+    """Memory-map the vector matrix (and IVF lists) ahead of the first query."""
+    _load()
+
+
+def index_vector(doc_id: str, node: Dict[str, Any]):
+    """Append the embedding of a content node; called alongside search.index_document."""
+    if not SEMANTIC_INDEX:
+        return
+    text = (node.get("title") or "") + "\n" + (node.get("content") or "")
+    with VEC_PATH.open("ab") as f:
+        f.write(array("f", embed(text)).tobytes())
+    with IDS_PATH.open("a", encoding="utf-8") as f:
+        f.write(doc_id + "\n")
+
+
+def remove_vector(doc_id: str):
+    """Tombstone the current vector row of a deleted document; called alongside search.remove_document."""
+    row = _load()["rows"].get(doc_id)
+    if row is None:
+        return
+    with DELETED_PATH.open("a", encoding="utf-8") as f:
+        f.write(f"{row}\n")
+
+
+def rebuild_vectors(nodes) -> int:
+    """Rewrite the vector files from an iterable of content nodes; returns the row count."""
+    VEC_PATH.unlink(missing_ok=True)
+    IDS_PATH.unlink(missing_ok=True)
+    DELETED_PATH.unlink(missing_ok=True)
+    IVF_CENTROIDS_PATH.unlink(missing_ok=True)
+    IVF_LISTS_PATH.unlink(missing_ok=True)
+    _state["key"] = None
+    if not SEMANTIC_INDEX:
+        return 0
+    count = 0
+    with VEC_PATH.open("wb") as vf, IDS_PATH.open("w", encoding="utf-8") as idf:
+        for node in nodes:
+            text = (node.get("title") or "") + "\n" + (node.get("content") or "")
+            vf.write(array("f", embed(text)).tobytes())
+            idf.write(node["id"] + "\n")
+            count += 1
+    if count >= IVF_MIN_ROWS and _np() is not None:
+        build_ivf()
+    return count
+
+
+def _load_ivf(n: int) -> Optional[Dict[str, Any]]:
+    np = _np()
+    if np is None or not IVF_LISTS_PATH.exists() or not IVF_CENTROIDS_PATH.exists():
+        return None
+    info = serialization.read(IVF_LISTS_PATH)
+    if info["rows"] > n:
+        return None
+    centroids = np.fromfile(IVF_CENTROIDS_PATH, dtype=np.float32).reshape(-1, DIM)
+    lists = [np.asarray(rows, dtype=np.int64) for rows in info["lists"]]
+    return {"rows": info["rows"], "centroids": centroids, "lists": lists}
+
+
+def build_ivf(nlist: Optional[int] = None, iterations: int = 10) -> int:
+    """
+    Train a spherical k-means coarse quantizer over the current vectors (NumPy only).
+
+    Rows appended after training are scanned exhaustively until the next build.
+    Returns the number of lists.
+    """
+    np = _np()
+    if np is None:
+        raise RuntimeError("NumPy is required to build an IVF index")
+    state = _load()
+    n = state["n"]
+    if n == 0:
+        return 0
+    matrix = np.asarray(state["matrix"])
+    nlist = nlist or max(1, int(math.sqrt(n)))
+    rng = np.random.default_rng(0)
+    centroids = matrix[rng.choice(n, size=min(nlist, n), replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(matrix @ centroids.T, axis=1)
+        for c in range(len(centroids)):
+            members = matrix[assign == c]
+            if len(members):
+                mean = members.mean(axis=0)
+                norm = np.linalg.norm(mean)
+                centroids[c] = mean / norm if norm else mean
+    assign = np.argmax(matrix @ centroids.T, axis=1)
+    lists = [np.nonzero(assign == c)[0].tolist() for c in range(len(centroids))]
+    centroids.astype(np.float32).tofile(IVF_CENTROIDS_PATH)
+    serialization.write(IVF_LISTS_PATH, {"rows": n, "lists": lists})
+    _state["key"] = None
+    return len(lists)
+
+
+def similarity_scores(text: str, top_n: Optional[int] = None) -> Dict[str, float]:
+    """
+    Cosine similarity between text and indexed documents, keyed by doc ID.
+
+    With an IVF index only the IVF_NPROBE closest lists (plus rows added since
+    training) are scored; otherwise every live row is scored.
+    """
+    storage.apply_pending()
+    state = _load()
+    if state["n"] == 0:
+        return {}
+    q = embed(text)
+    ids, rows = state["ids"], state["rows"]
+    np = _np()
+    if np is not None:
+        qv = np.asarray(q, dtype=np.float32)
+        ivf = state["ivf"]
+        if ivf is not None:
+            probe = np.argsort(ivf["centroids"] @ qv)[::-1][:IVF_NPROBE]
+            parts = [ivf["lists"][c] for c in probe] + [np.arange(ivf["rows"], state["n"])]
+            cand = np.concatenate(parts)
+            sims = np.asarray(state["matrix"][cand] @ qv)
+        else:
+            cand = np.arange(state["n"])
+            sims = np.asarray(state["matrix"] @ qv)
+        if top_n is not None and top_n < len(sims):
+            keep = np.argpartition(-sims, top_n)[:top_n]
+            cand, sims = cand[keep], sims[keep]
+        pairs = zip(cand.tolist(), sims.tolist())
+    else:
+        matrix = state["matrix"]
+        pairs = (
+            (r, sum(a * b for a, b in zip(matrix[r * DIM : (r + 1) * DIM], q))) for r in range(state["n"])
+        )
+    scores = {ids[r]: s for r, s in pairs if rows.get(ids[r]) == r}
+    if top_n is not None and len(scores) > top_n:
+        scores = dict(sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:top_n])
+    return scores
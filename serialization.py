@@ -0,0 +1,77 @@
+"""
+JSON encoding for node, edge and index files.
+
+Uses orjson when it is installed, then msgspec, and falls back to the stdlib
+json module. Machine files (indexes, edge logs, counters) are written compact;
+node files keep two-space indentation so they stay readable and diffable.
+All backends produce and accept UTF-8 bytes, and decode errors are raised as
+ValueError whichever backend is active.
+
+write() replaces files atomically (temporary file and rename), so another
+process reading the library never sees a half-written index file.
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Union
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgspec  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    msgspec = None
+
+if orjson is not None:
+    BACKEND = "orjson"
+elif msgspec is not None:
+    BACKEND = "msgspec"
+else:
+    BACKEND = "json"
+
+if BACKEND == "msgspec":
+    _encoder = msgspec.json.Encoder()
+    _decoder = msgspec.json.Decoder()
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """Encode obj as UTF-8 JSON; compact unless pretty."""
+    if BACKEND == "orjson":
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if BACKEND == "msgspec":
+        data = _encoder.encode(obj)
+        return msgspec.json.format(data, indent=2) if pretty else data
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_line(obj: Any) -> bytes:
+    """Encode obj as one compact JSON Lines record, newline included."""
+    return dumps(obj) + b"\n"
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    if BACKEND == "msgspec":
+        try:
+            return _decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+    return json.loads(data)
+
+
+def read(path: Path) -> Any:
+    return loads(path.read_bytes())
+
+
+def write(path: Path, obj: Any, pretty: bool = False):
+    tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    tmp.write_bytes(dumps(obj, pretty))
+    tmp.replace(path)
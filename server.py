@@ -3,8 +3,14 @@ import json
 import os
 from typing import Any, Optional, List, Dict
 from mcp.server.fastmcp import FastMCP
+from metrics import instrument
+from profiling import profile_slow, list_profiles
 from storage import (
+    BODY_COMPRESSION,
+    NODE_STORE,
     add_content,
+    update_content,
+    delete_content,
     add_tag,
     add_style,
     add_author,
@@ -15,8 +21,12 @@ from storage import (
     link_url,
     get_node,
     get_content_links,
+    compact_edges,
+    train_body_dictionary,
+    recompress_content,
+    repack,
 )
-from search import search, rebuild_index
+from search import search, rebuild_index, reindex, find_similar
 from content_tools import (
     extract_raw_content,
     extract_by_paragraph,
@@ -39,7 +49,19 @@ HTTP_PATH = _ensure_path(os.environ.get("MCP_HTTP_PATH", "/mcp"))
 mcp = FastMCP("snippets_manager", host=HTTP_HOST, port=HTTP_PORT, streamable_http_path=HTTP_PATH)
 
 
-@mcp.tool(
+def tool(**kwargs):
+    """
+    Register an MCP tool whose calls, errors and latency are recorded in metrics
+    and whose slow calls are profiled when MCP_PROFILE_SLOW_MS is set.
+    """
+
+    def decorator(fn):
+        return mcp.tool(**kwargs)(instrument(fn.__name__)(profile_slow(fn.__name__)(fn)))
+
+    return decorator
+
+
+@tool(
     title="Add content",
     description="""Create a new content node (long-form or snippet) and index it for search.
 
@@ -50,8 +72,9 @@ mcp = FastMCP("snippets_manager", host=HTTP_HOST, port=HTTP_PORT, streamable_htt
     - style (list[str], optional): List of style identifiers. Must be one or more of: "chapter", "blog", "post", "snippet", "tweet". Defaults to empty list.
     - tags (list[str], optional): List of tag names. Tags will be automatically normalized to lowercase with dashes replacing spaces/punctuation. Defaults to empty list.
     - authors (list[str], optional): List of author names or slugs. Authors will be created if they don't exist. Defaults to empty list.
+    - on_duplicate (str, optional): What to do when content with the same normalized title and body already exists. One of: "return" (return the existing UUID), "reject" (raise an error), "allow" (always create a new node). Defaults to "return".
 
-    Returns: UUID string of the newly created content node (e.g., "a1b2c3d4-e5f6-7890-abcd-ef1234567890").
+    Returns: UUID string of the newly created content node (e.g., "a1b2c3d4-e5f6-7890-abcd-ef1234567890"), or of the existing node when the content is a duplicate.
 
     Example usage:
     - Short snippet: content="Focus on user needs", style=["snippet"], tags=["product-management"]
@@ -65,11 +88,64 @@ async def tool_add_content(
     style: Optional[List[str]] = None,
     tags: Optional[List[str]] = None,
     authors: Optional[List[str]] = None,
+    on_duplicate: str = "return",
+) -> str:
+    return add_content(content, title, date, style, tags, authors, on_duplicate=on_duplicate)
+
+
+@tool(
+    title="Update content",
+    description="""Update fields of an existing content node and reindex it incrementally.
+
+    Parameters:
+    - content_id (str, required): UUID of the content node to update.
+    - content (str, optional): New text body. Omit to keep the current body.
+    - title (str, optional): New title. Omit to keep the current title.
+    - date (str, optional): New ISO8601 datetime string. Omit to keep the current date.
+    - style (list[str], optional): Replacement list of styles ("chapter", "blog", "post", "snippet", "tweet"). Omit to keep the current styles.
+    - tags (list[str], optional): Replacement list of tag names. New tags are linked. Omit to keep the current tags.
+    - authors (list[str], optional): Replacement list of author names or slugs. New authors are linked. Omit to keep the current authors.
+
+    Returns: JSON string of the updated content node.
+
+    Raises: FileNotFoundError if content_id doesn't exist.
+
+    Note: Only the postings of the changed node are touched; no full reindex is needed.
+    """
+)
+async def tool_update_content(
+    content_id: str,
+    content: Optional[str] = None,
+    title: Optional[str] = None,
+    date: Optional[str] = None,
+    style: Optional[List[str]] = None,
+    tags: Optional[List[str]] = None,
+    authors: Optional[List[str]] = None,
 ) -> str:
-    return add_content(content, title, date, style, tags, authors)
+    return json.dumps(update_content(content_id, content, title, date, style, tags, authors))
 
 
-@mcp.tool(
+@tool(
+    title="Delete content",
+    description="""Delete a content node and remove it from search results.
+
+    Parameters:
+    - content_id (str, required): UUID of the content node to delete.
+
+    Returns: "ok" on success.
+
+    Raises: FileNotFoundError if content_id doesn't exist.
+
+    Note: The node is tombstoned in the search indexes, so it disappears from search immediately without a reindex.
+    Edges that reference it are removed by the compact_edges tool.
+    """
+)
+async def tool_delete_content(content_id: str) -> str:
+    delete_content(content_id)
+    return "ok"
+
+
+@tool(
     title="Add tag",
     description="""Create or return a tag node by name.
 
@@ -85,7 +161,7 @@ async def tool_add_tag(name: str) -> str:
     return add_tag(name)
 
 
-@mcp.tool(
+@tool(
     title="Add style",
     description="""Register a writing style node.
 
@@ -103,7 +179,7 @@ async def tool_add_style(name: str) -> str:
     return add_style(name)
 
 
-@mcp.tool(
+@tool(
     title="Add author",
     description="""Create or return an author node with optional social media handles.
 
@@ -129,7 +205,7 @@ async def tool_add_author(
     return add_author(name, linkedin_username, twitter_username, substack_username, reddit_username)
 
 
-@mcp.tool(
+@tool(
     title="Add link",
     description="""Create or return a link (URL) node.
 
@@ -148,7 +224,7 @@ async def tool_add_link(url: str, title: Optional[str] = None, description: Opti
     return add_link(url, title, description)
 
 
-@mcp.tool(
+@tool(
     title="Link content relates",
     description="""Create a relationship edge between two content nodes.
 
@@ -171,7 +247,7 @@ async def tool_link_relates(src_content_id: str, relation_type: str, dst_content
     return "ok"
 
 
-@mcp.tool(
+@tool(
     title="Link tag",
     description="""Attach a tag to a content node.
 
@@ -189,7 +265,7 @@ async def tool_link_tag(content_id: str, tag_slug: str) -> str:
     return "ok"
 
 
-@mcp.tool(
+@tool(
     title="Link author",
     description="""Attach an author to a content node.
 
@@ -207,7 +283,7 @@ async def tool_link_author(content_id: str, author_slug: str) -> str:
     return "ok"
 
 
-@mcp.tool(
+@tool(
     title="Link URL",
     description="""Associate a URL with a content node.
 
@@ -228,12 +304,16 @@ async def tool_link_url(content_id: str, url: str, title: Optional[str] = None,
     return "ok"
 
 
-@mcp.tool(
+@tool(
     title="Search content",
     description="""Search and filter content nodes with full-text query and metadata filters.
 
     Parameters:
-    - query (str, optional): Free-text search query. Searches title and content fields with TF-IDF ranking. Defaults to None (no text filtering).
+    - query (str, optional): Search query. Free text searches title and content fields with TF-IDF ranking (it ranks but does not filter). The query may also contain:
+        * field:value clauses for title, tag, author, style, content, relates and date (e.g., tag:ai, title:"getting started", date:2025-01..2025-03)
+        * "exact phrase" - requires the phrase as whole words in the title or content
+        * -clause or -word - excludes matches (e.g., -style:tweet, -draft)
+      Defaults to None (no text filtering).
     - filters (dict, optional): Dictionary containing filter criteria. Supported keys:
         * "style": list[str] - Filter by writing style (e.g., ["blog", "post"])
         * "tag": list[str] - Filter by tag slugs (e.g., ["machine-learning", "ai"])
@@ -241,23 +321,31 @@ async def tool_link_url(content_id: str, url: str, title: Optional[str] = None,
         * "title": str - Substring match in title field
         * "content": str - Substring match in content field
         * "relates": list[str] - Filter by content IDs that have relationships with these IDs
+        * "date_from": str - Earliest ISO8601 date, inclusive (e.g., "2025-01" or "2025-01-15")
+        * "date_to": str - Latest ISO8601 date, inclusive; a partial date covers the whole period (e.g., "2025-06" includes all of June)
     - sort (str, optional): Sort order. Must be one of: "relevance" (TF-IDF score, requires query), "date" (newest first), "random" (shuffled). Defaults to "relevance".
     - page (int, optional): 1-based page number for pagination. Defaults to 1.
     - page_size (int, optional): Number of results per page. Defaults to 10.
     - seed (int, optional): Random seed for stable "random" sort order. Only used when sort="random". Defaults to None.
+    - semantic_weight (float, optional): Blend of semantic (local vector) similarity into "relevance" ranking, from 0.0 (purely lexical TF-IDF) to 1.0 (purely semantic). Requires a query. Defaults to 0.0.
+    - explain (bool, optional): If True, include the executed filter plan: each step's operator, values, estimated matches, rows in/out and time in ms. Defaults to False.
 
     Returns: JSON string with structure:
     {
         "items": [list of content node objects with full data],
         "total": total count of matching items,
         "page": current page number,
-        "page_size": items per page
+        "page_size": items per page,
+        "plan": [filter plan steps, only with explain=True]
     }
 
     Example usage:
     - Find all blog posts: filters={"style": ["blog"]}
     - Search with tag filter: query="machine learning", filters={"tag": ["ai", "tutorial"]}
     - Random snippets: filters={"style": ["snippet"]}, sort="random", seed=42
+    - Newest posts from the first half of 2025: filters={"style": ["post"], "date_from": "2025-01", "date_to": "2025-06"}, sort="date"
+    - Hybrid search: query="shipping faster", semantic_weight=0.5
+    - Query language: query='tag:ai -style:tweet "prompt engineering" examples', explain=True
     """
 )
 async def tool_search(
@@ -267,13 +355,24 @@ async def tool_search(
     page: int = 1,
     page_size: int = 10,
     seed: Optional[int] = None,
+    semantic_weight: float = 0.0,
+    explain: bool = False,
 ) -> str:
     filters_dict = filters if filters else {}
-    res = search(query, filters_dict, sort=sort, page=page, page_size=page_size, seed=seed)
+    res = search(
+        query,
+        filters_dict,
+        sort=sort,
+        page=page,
+        page_size=page_size,
+        seed=seed,
+        semantic_weight=semantic_weight,
+        explain=explain,
+    )
     return json.dumps(res)
 
 
-@mcp.tool(
+@tool(
     title="Get node",
     description="""Retrieve a single node by ID or slug.
 
@@ -301,31 +400,138 @@ async def tool_get_node(node_id: str) -> str:
     return json.dumps(node)
 
 
-@mcp.tool(
+@tool(
+    title="Find similar content",
+    description="""Find content nodes whose text is similar to a given content node.
+
+    Parameters:
+    - content_id (str, required): UUID of the content node to compare against.
+    - k (int, optional): Maximum number of similar nodes to return. Defaults to 5.
+
+    Returns: JSON array of objects with "id", "title" and "similarity" (estimated Jaccard similarity of word 3-grams, 0.0-1.0), most similar first.
+
+    Use cases:
+    - Spot near-duplicate snippets before publishing
+    - Discover related material that has no explicit "relates" edge
+    - Gather candidates for combine_related_snippets
+
+    Note: Uses MinHash locality-sensitive hashing maintained at index time, so only likely matches are scored.
+    Nodes below roughly 0.3 similarity are usually not returned. Run reindex after manual file system modifications.
+    """
+)
+async def tool_find_similar(content_id: str, k: int = 5) -> str:
+    return json.dumps(find_similar(content_id, k))
+
+
+@tool(
     title="Reindex",
-    description="""Rebuild the full-text search index from scratch.
+    description="""Rebuild the search indexes from the content nodes on disk.
 
-    Parameters: None
+    Parameters:
+    - mode (str, optional): "full" rebuilds everything from scratch; "incremental" only re-indexes content files added or changed since they were last indexed and removes deleted ones. Defaults to "full".
 
-    Returns: "ok" on success.
+    Returns: "ok" for a full rebuild. For mode="incremental", a JSON object with "mode", "added", "changed", "removed", "unchanged" and "ms" (if no manifest of indexed files exists yet or the analyzer settings changed, a full rebuild runs and "mode" is "full").
 
     Use cases:
     - After bulk imports of content nodes
     - If search results seem out of sync with actual content
-    - After manual file system modifications
+    - After manual file system modifications or a git pull of the library (use mode="incremental")
 
-    Note: This operation scans all content nodes and rebuilds the inverted index, doc lengths, and metadata cache.
+    Note: A full rebuild scans all content nodes and rebuilds the inverted index, doc lengths, metadata cache and similarity indexes.
+    When the server runs with MCP_WATCH enabled, external edits are picked up automatically and this tool is rarely needed.
     The process is safe and idempotent - it won't affect your content nodes, only the search index files.
     """
 )
-async def tool_reindex() -> str:
-    rebuild_index()
-    return "ok"
+async def tool_reindex(mode: str = "full") -> str:
+    if mode == "full":
+        rebuild_index()
+        return "ok"
+    return json.dumps(reindex(mode))
+
+
+@tool(
+    title="Compact edges",
+    description="""Deduplicate and clean up the relationship edge logs (tags, authors, links, relates).
+
+    Parameters:
+    - drop_dangling (bool, optional): If True, also drop edges that reference content, tag, author or link nodes that no longer exist. Defaults to True.
+
+    Returns: JSON object keyed by edge log name ("relates", "tags", "authors", "links") with "before", "after", "duplicates" and "dangling" edge counts.
+
+    Use cases:
+    - After re-running extractors or re-linking the same tags many times on older libraries
+    - After deleting or moving node files by hand
+
+    Note: New edges are already deduplicated at write time; this cleans up older logs and dangling references.
+    Each log is rewritten atomically and the tool is safe to run while the server is serving requests.
+    """
+)
+async def tool_compact_edges(drop_dangling: bool = True) -> str:
+    return json.dumps(compact_edges(drop_dangling))
+
+
+@tool(
+    title="Recompress content",
+    description="""Rewrite all content nodes using the server's body compression setting (MCP_BODY_COMPRESSION).
+
+    Parameters:
+    - train_dictionary (bool, optional): If True, first train a shared compression dictionary from a sample of the library, which greatly improves compression of short snippets. Defaults to True.
+
+    Returns: JSON object with "dictionary" (ID of the dictionary in use, or null), "nodes", "bytes_before" and "bytes_after".
+
+    Use cases:
+    - After enabling MCP_BODY_COMPRESSION=zlib on an existing library
+    - Periodically, as the library grows and its vocabulary changes
+    - After disabling compression, to store every body as plain text again
+
+    Note: Only content bodies are compressed; titles, tags, authors and other metadata stay plain JSON. Reads decode transparently.
+    """
+)
+async def tool_recompress_content(train_dictionary: bool = True) -> str:
+    dict_id = train_body_dictionary() if train_dictionary and BODY_COMPRESSION == "zlib" else None
+    return json.dumps({"dictionary": dict_id, **recompress_content()})
+
+
+@tool(
+    title="Repack node storage",
+    description=f"""Rewrite the node pack files without dead records and move nodes to the configured storage format (currently "{NODE_STORE}", set by MCP_NODE_STORE).
+
+    Returns: JSON object with "segments", "records", "bytes" and "garbage_bytes" of the packs after repacking, "copied" (records rewritten), "removed_segments" and "migrated" (nodes moved between loose files and packs).
+
+    Use cases:
+    - After switching an existing library to MCP_NODE_STORE=pack, to move its loose node files into packs
+    - After switching back to MCP_NODE_STORE=loose, to write packed nodes out as loose files again
+    - After many updates or deletes in pack mode (a repack also starts automatically in the background once dead records exceed MCP_PACK_REPACK_RATIO of the pack size)
+
+    Note: Safe to run while the server is serving requests. The next incremental reindex re-stamps moved nodes without re-indexing them.
+    """
+)
+async def tool_repack() -> str:
+    return json.dumps(repack())
+
+
+@tool(
+    title="List slow-call profiles",
+    description="""List profiles captured for recent slow MCP tool calls.
+
+    Parameters:
+    - limit (int, optional): Maximum number of profiles to return, newest first. Defaults to 20.
+
+    Returns: JSON array of objects with "name", "tool", "elapsed_ms", "threshold_ms", "mode", "date", "args" (truncated reprs of the call arguments), "files" and "directory".
+
+    Note: Profiling is opt-in. Set MCP_PROFILE_SLOW_MS to a latency threshold (milliseconds) before starting the server;
+    any tool call at least that slow is profiled into MCP_SNIPPETS_ROOT/profiles. MCP_PROFILE_MODE selects "cprofile"
+    (.prof + .txt summary, default) or "sampler" (low-overhead wall-clock sampling, .folded stacks + .txt summary).
+    Only the newest MCP_PROFILE_KEEP (default 50) profiles are kept. Returns an empty list when profiling is disabled.
+    """
+)
+async def tool_list_slow_profiles(limit: int = 20) -> str:
+    return json.dumps(list_profiles(limit))
 
 
 # Content extraction and transformation tools
 
-@mcp.tool(
+@tool(
     title="Extract raw content",
     description="""Extract raw content from a source node, with optional truncation and metadata preservation.
 
@@ -356,7 +562,7 @@ async def tool_extract_raw_content(
     return extract_raw_content(content_id, max_length, style, preserve_tags, preserve_authors)
 
 
-@mcp.tool(
+@tool(
     title="Extract by paragraph",
     description="""Break down content into individual paragraph snippets.
 
@@ -386,7 +592,7 @@ async def tool_extract_by_paragraph(
     return json.dumps(ids)
 
 
-@mcp.tool(
+@tool(
     title="Extract similar sections",
     description="""Extract sections containing a specific keyword or topic with surrounding context.
 
@@ -417,7 +623,7 @@ async def tool_extract_similar_sections(
     return json.dumps(ids)
 
 
-@mcp.tool(
+@tool(
     title="Extract for social media",
     description="""Extract punchy, quotable snippets optimized for social media platforms.
 
@@ -451,15 +657,19 @@ async def tool_extract_for_social_media(
     return json.dumps(ids)
 
 
-@mcp.tool(
+@tool(
     title="Combine related snippets",
     description="""Combine multiple snippets or content nodes into a single longer-form piece.
 
     Parameters:
-    - content_ids (list[str], required): List of content node UUIDs to combine, in order.
     - title (str, required): Title for the combined content.
+    - content_ids (list[str], optional): List of content node UUIDs to combine, in order. If omitted, sources are selected with search using query/filters/sort/limit.
     - style (list[str], optional): Style tags for the combined piece (e.g., ["blog", "post"]). Defaults to ["blog", "post"].
     - separator (str, optional): Text to insert between combined sections. Defaults to "\\n\\n---\\n\\n".
+    - query (str, optional): Search query for selecting sources when content_ids is omitted.
+    - filters (dict, optional): Search filters (same keys as the search tool) for selecting sources when content_ids is omitted.
+    - sort (str, optional): Order of search-selected sources: "relevance", "date" (newest first) or "random". Defaults to "date".
+    - limit (int, optional): Maximum number of search-selected sources. Defaults to 100.
 
     Returns: UUID of the newly created combined content node.
 
@@ -472,20 +682,28 @@ async def tool_extract_for_social_media(
     - Assemble a blog post from collected snippets
     - Create a comprehensive guide from atomic units
     - Build documentation from scattered notes
+    - Assemble a book chapter from every snippet tagged "chapter-3": filters={"tag": ["chapter-3"]}
 
     Note: Invalid content IDs are silently skipped. At least one valid ID is required.
     """
 )
 async def tool_combine_related_snippets(
-    content_ids: List[str],
     title: str,
+    content_ids: Optional[List[str]] = None,
     style: Optional[List[str]] = None,
     separator: str = "\n\n---\n\n",
+    query: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    sort: str = "date",
+    limit: int = 100,
 ) -> str:
-    return combine_related_snippets(content_ids, title, style, separator)
+    return combine_related_snippets(content_ids, title, style, separator, query, filters, sort, limit)
 
 
 def main():
+    import watcher
+
+    watcher.start()
     mcp.run(transport="stdio")
 
 
@@ -7,38 +7,140 @@ It will try to serve the Starlette `app` defined in `app.py` using
 uvicorn. If that fails for any reason (uvicorn not installed or the
 app module not present) it falls back to calling `mcp.run(...)` which
 may be appropriate in some environments.
+
+Imports of uvicorn and the app are deferred until `_run_uvicorn` and each
+startup phase is timed (see `startup.py`). Index loading is controlled by
+MCP_PREWARM:
+
+- "background" (default): start listening immediately, then load the search
+  indexes in a background thread so the first query does not pay for it.
+- "eager": load the indexes before listening (slower start, predictable
+  first query).
+- "off": load lazily on the first query.
+
+MCP_WATCH starts the filesystem watcher (see `watcher.py`) once the server
+is up, so edits made outside the server are indexed in the background.
+
+MCP_WORKERS (default 1) serves from that many uvicorn worker processes, so
+search scoring uses more than one core. The workers share the library: the
+inverted index is memory-mapped read-only (see `postings.py`), writes are
+serialized by the library's write lock (storage.writer()), and each write
+bumps a generation counter that the other workers check before using their
+caches. Each worker prewarms its own indexes as set by MCP_PREWARM; the
+watcher runs once, in the supervising process.
+
+MCP_WAL=on makes writes durable through a write-ahead log with group commit
+and applies search index updates in background batches (see `wal.py` and
+storage.py); after a crash, each process replays the log on its first write or query.
+
+MCP_REPLICA_OF=<primary library root> runs a read replica: the library under
+MCP_SNIPPETS_ROOT follows the primary's write-ahead log (see `replica.py`),
+writes are refused and /health reports the replication lag. Like the
+watcher, the follower runs once, in the supervising process.
 """
 
 import os
+import threading
+import time
 import traceback
 
-# Preferred path: run the ASGI Starlette app in `app.py` with uvicorn.
-try:
-    from app import app  # the Starlette app instance
-    has_app = True
-except Exception:
-    has_app = False
+from startup import phase, mark, report
+
+PREWARM = os.environ.get("MCP_PREWARM", "background")
+WORKERS = int(os.environ.get("MCP_WORKERS", "1"))
+
+
+def _warm_indexes():
+    with phase("prewarm"):
+        from search import warm
+
+        warm()
 
-try:
-    # Try to import uvicorn only when we plan to run it
-    import uvicorn  # type: ignore
-    has_uvicorn = True
-except Exception:
-    has_uvicorn = False
+
+def _warm_quietly():
+    try:
+        _warm_indexes()
+    except Exception:
+        traceback.print_exc()
+
+
+def create_worker_app():
+    """App factory run by each worker process when MCP_WORKERS > 1."""
+    from app import app
+
+    if PREWARM == "eager":
+        _warm_indexes()
+    elif PREWARM == "background":
+        threading.Thread(target=_warm_quietly, daemon=True).start()
+    return app
+
+
+def _start_watcher():
+    try:
+        with phase("watcher"):
+            import watcher
+
+            watcher.start()
+    except Exception:
+        traceback.print_exc()
+
+
+def _start_replica():
+    try:
+        with phase("replica"):
+            import replica
+
+            replica.start()
+    except Exception:
+        traceback.print_exc()
+
+
+def _prewarm_when_listening(server):
+    while not server.started:
+        if server.should_exit:
+            return
+        time.sleep(0.05)
+    mark("listening")
+    _warm_quietly()
+    _start_watcher()
+    _start_replica()
+    print(f"Startup phases: {report()}")
 
 
 def _run_uvicorn():
     host = os.environ.get("MCP_HTTP_HOST", "0.0.0.0")
     port = int(os.environ.get("MCP_HTTP_PORT", "8000"))
-    # Run using the app object if available
-    if has_app and has_uvicorn:
-        uvicorn.run(app, host=host, port=port, log_level="info")
-    elif has_app and not has_uvicorn:
+    try:
+        with phase("import_uvicorn"):
+            import uvicorn  # type: ignore
+    except Exception:
         print("uvicorn is not installed. Install requirements: pip install -r requirements.txt")
         raise RuntimeError("uvicorn not available")
-    else:
+    try:
+        with phase("import_app"):
+            from app import app  # the Starlette app instance
+    except Exception:
         raise RuntimeError("ASGI app not available (app.py missing or import failed)")
 
+    if WORKERS > 1:
+        _start_watcher()
+        _start_replica()
+        print(f"Startup phases: {report()}; starting {WORKERS} workers")
+        uvicorn.run(
+            "server_http:create_worker_app", factory=True, host=host, port=port, workers=WORKERS, log_level="info"
+        )
+        return
+    if PREWARM == "eager":
+        _warm_indexes()
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="info"))
+    if PREWARM == "background":
+        threading.Thread(target=_prewarm_when_listening, args=(server,), daemon=True).start()
+    else:
+        _start_watcher()
+        _start_replica()
+        print(f"Startup phases: {report()}")
+    server.run()
+
 
 if __name__ == "__main__":
     # Primary: try to run uvicorn with the Starlette app from app.py.
@@ -57,4 +159,3 @@ if __name__ == "__main__":
             print("Fallback failed. Please ensure uvicorn is installed and app.py is present.")
             traceback.print_exc()
             raise
-
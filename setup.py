@@ -7,7 +7,7 @@ setup(
     author="Your Name",
     author_email="your.email@example.com",
     packages=find_packages(),
-    py_modules=["server", "storage", "schemas", "search", "content_tools", "app", "server_http"],
+    py_modules=["server", "storage", "schemas", "search", "content_tools", "similarity", "semantic", "serialization", "analysis", "query", "postings", "packs", "wal", "replica", "snapshot", "watcher", "startup", "metrics", "profiling", "app", "server_http"],
     install_requires=[
         "mcp[cli]>=0.1.0",
         "starlette>=0.27.0",
@@ -0,0 +1,150 @@
+"""
+Text fingerprints used for duplicate and near-duplicate detection.
+
+All functions here are pure: they turn text into stable integers (stable across
+processes, unlike the builtin ``hash``) and leave persistence to the callers.
+"""
+from __future__ import annotations
+import hashlib
+import random
+import re
+import unicodedata
+from typing import Any, Iterable, List
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4  # 4 x 16-bit bands: any pair within 3 bits shares a band
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize, case-fold and collapse whitespace."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(text.split())
+
+
+def _hash64(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _features(text: str) -> List[str]:
+    words = _WORD_RE.findall(normalize_text(text))
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over word unigrams and bigrams."""
+    feats = _features(text)
+    if not feats:
+        return 0
+    # Transpose the fixed-width bit strings so each bit column is counted in C.
+    rows = [format(_hash64(f), "064b") for f in feats]
+    half = len(rows) / 2
+    fp = 0
+    for bit, column in enumerate(reversed(list(zip(*rows)))):
+        if column.count("1") > half:
+            fp |= 1 << bit
+    return fp
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def simhash_bands(fp: int) -> Iterable[str]:
+    """Bucket keys for a fingerprint; near duplicates (<= 3 bits) share at least one."""
+    width = SIMHASH_BITS // SIMHASH_BANDS
+    mask = (1 << width) - 1
+    for band in range(SIMHASH_BANDS):
+        yield f"{band}:{(fp >> (band * width)) & mask:x}"
+
+
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16  # 16 bands x 4 rows: pairs above ~0.5 Jaccard usually collide
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_CHUNK = 4096  # shingles hashed per NumPy pass, bounding its temporary arrays
+
+
+def _permutations(n: int):
+    """Universal hash functions x -> (a*x + b) mod p, p = 2**61 - 1, standing in for random permutations."""
+    rnd = random.Random(0x5EED)
+    return [(rnd.randrange(1, _MERSENNE_PRIME), rnd.randrange(0, _MERSENNE_PRIME)) for _ in range(n)]
+
+
+_PERMS = _permutations(MINHASH_PERMUTATIONS)
+
+_numpy: Any = None
+_np_perms: Any = None
+
+
+def _np():
+    """Import NumPy on first use; returns None when it is not installed."""
+    global _numpy, _np_perms
+    if _numpy is None:
+        try:
+            import numpy  # type: ignore
+
+            _numpy = numpy
+            a = numpy.array([a for a, _ in _PERMS], dtype=numpy.uint64)[:, None]
+            b = numpy.array([b for _, b in _PERMS], dtype=numpy.uint64)[:, None]
+            _np_perms = (a >> numpy.uint64(32), a & numpy.uint64(_MAX_HASH), b)
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+
+def shingles(text: str, size: int = 3) -> set:
+    words = _WORD_RE.findall(normalize_text(text))
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(text: str) -> List[int]:
+    """MinHash signature of the word 3-gram shingles of text."""
+    hashed = [_hash64(s) & _MAX_HASH for s in shingles(text)]
+    if not hashed:
+        return [_MAX_HASH] * MINHASH_PERMUTATIONS
+    np = _np()
+    if np is None:
+        return [min(((a * x + b) % _MERSENNE_PRIME) & _MAX_HASH for x in hashed) for a, b in _PERMS]
+    sig = None
+    for i in range(0, len(hashed), _CHUNK):
+        mins = _np_hashes(np, np.array(hashed[i : i + _CHUNK], dtype=np.uint64)).min(axis=1)
+        sig = mins if sig is None else np.minimum(sig, mins)
+    return sig.tolist()
+
+
+def _np_hashes(np, x):
+    """
+    (a*x + b) mod p & _MAX_HASH for every permutation (rows) and 32-bit shingle
+    hash x (columns), exactly as the pure Python expression: a*x needs up to 93
+    bits, so a is split into 29 high and 32 low bits and each product is folded
+    with 2**61 = 1 (mod p), keeping every intermediate below 2**64.
+    """
+    a_hi, a_lo, b = _np_perms
+    p, u29, u32, u61 = np.uint64(_MERSENNE_PRIME), np.uint64(29), np.uint64(32), np.uint64(61)
+    hi = a_hi * x  # < 2**61; hi * 2**32 = (hi >> 29) * 2**61 + (hi & (2**29 - 1)) * 2**32
+    lo = a_lo * x  # < 2**64
+    h = ((hi & np.uint64((1 << 29) - 1)) << u32) + (hi >> u29) + (lo & p) + (lo >> u61) + b  # < 2**63
+    h = (h & p) + (h >> u61)
+    h = np.where(h >= p, h - p, h)
+    return h & np.uint64(_MAX_HASH)
+
+
+def signature_similarity(a: List[int], b: List[int]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    if not a or not b:
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def lsh_bands(sig: List[int]) -> Iterable[str]:
+    """LSH bucket keys for a MinHash signature."""
+    rows = len(sig) // LSH_BANDS
+    for band in range(LSH_BANDS):
+        chunk = ",".join(str(v) for v in sig[band * rows : (band + 1) * rows])
+        yield f"{band}:{_hash64(chunk):x}"
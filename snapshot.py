@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+"""Consistent snapshots of a whole library, streamed as one tar or NDJSON file.
+
+    python snapshot.py export -o library.tar            # nodes and edges
+    python snapshot.py export --index -o library.tar    # plus the search indexes
+    python snapshot.py export --format ndjson > library.ndjson
+    python snapshot.py import library.tar               # or "-" for stdin
+
+An export captures the library at one point in time while writes continue: it
+starts once no write is half applied (storage.writer()), and a node changed
+or deleted afterwards is streamed as it was at that point; edge logs are read
+up to their length at that point and pack segments through descriptors opened
+then. Loose node files changed meanwhile by another process (a second server
+worker, say) can only be read as they are by then. Content bodies are exported decoded, so a snapshot does not depend on the
+compression dictionaries of its source.
+
+The tar layout mirrors the library (``nodes/<kind>/<id>.json``,
+``edges/<name>.jsonl``, ``index/<file>``) after a ``snapshot.json`` header.
+The NDJSON stream has one ``{"snapshot": header}`` line, then ``{"node": ...}``,
+``{"edge": name, "record": ...}`` and base64 ``{"file": path, "data": ...}``
+lines, and a final ``{"end": counts}`` line.
+
+An import bulk-loads nodes and edges without going through add_content, then
+either installs the snapshot's index files (when the library was empty and
+uses the same analyzer settings) or runs a single rebuild_index().
+"""
+from __future__ import annotations
+import argparse
+import base64
+import io
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+import analysis
+import search
+import serialization
+import storage
+from storage import EDGE_DIR, EDGE_KEYS, INDEX_DIR, NODE_DIRS, ROOT
+
+FORMAT = "mcp-content-library-snapshot"
+VERSION = 1
+FORMATS = ("tar", "ndjson")
+CHUNK = 1 << 20  # index file bytes per NDJSON line (before base64)
+
+
+class _View:
+    """The library as it was when the view was opened; close() it when done."""
+
+    def __init__(self, include_index: bool):
+        self.created = datetime.now(timezone.utc).isoformat()
+        self._lock = threading.Lock()
+        self._preserved: Dict[Tuple[str, str], Optional[bytes]] = {}
+        self.index_dir: Optional[Path] = None
+        with storage.writer(), search.index_lock(), storage.edge_lock():
+            self.packed, self._segments = storage.pin_packs()  # segment -> open descriptor
+            self.loose = [(kind, p.stem) for kind, base in NODE_DIRS.items() if base.exists() for p in base.glob("*.json")]
+            self._pending = set(self.loose)  # loose nodes not streamed yet
+            storage.add_node_change_hook(self._preserve)
+            self.edges: Dict[str, Tuple[int, int]] = {}  # name -> (descriptor, length)
+            for name in EDGE_KEYS:
+                path = EDGE_DIR / f"{name}.jsonl"
+                if path.exists():
+                    fd = os.open(path, os.O_RDONLY)
+                    self.edges[name] = (fd, os.fstat(fd).st_size)
+            if include_index and INDEX_DIR.exists():
+                self.index_dir = Path(tempfile.mkdtemp(prefix="snapshot-index-", dir=ROOT / "tmp"))
+                for p in INDEX_DIR.iterdir():
+                    if p.is_file() and not p.name.endswith(".tmp"):
+                        shutil.copyfile(p, self.index_dir / p.name)
+
+    def _preserve(self, kind: str, node_id: str):
+        """Node change hook: keep the pre-image of a loose node not streamed yet."""
+        with self._lock:
+            key = (kind, node_id)
+            if key in self._pending and key not in self._preserved:
+                try:
+                    self._preserved[key] = storage.node_path(kind, node_id).read_bytes()
+                except FileNotFoundError:
+                    self._preserved[key] = None
+
+    def nodes(self) -> Iterator[Dict[str, Any]]:
+        """Every node of the view, decoded."""
+        for (kind, node_id), (seg, offset, length) in self.packed:
+            data = os.pread(self._segments[seg], length, offset)
+            yield storage.decode_node(serialization.loads(data))
+        for key in self.loose:
+            with self._lock:  # a writer must not replace the file while it is read
+                self._pending.discard(key)
+                if key in self._preserved:
+                    data = self._preserved.pop(key)
+                else:
+                    try:
+                        data = storage.node_path(*key).read_bytes()
+                    except FileNotFoundError:
+                        data = None  # removed outside the server
+            if data is not None:
+                try:
+                    yield storage.decode_node(serialization.loads(data))
+                except ValueError:
+                    continue
+
+    def edge_chunks(self, name: str) -> Iterator[bytes]:
+        fd, length = self.edges[name]
+        offset = 0
+        while offset < length:
+            chunk = os.pread(fd, min(CHUNK, length - offset), offset)
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+
+    def edge_records(self, name: str) -> Iterator[Dict[str, Any]]:
+        rest = b""
+        for chunk in self.edge_chunks(name):
+            lines = (rest + chunk).split(b"\n")
+            rest = lines.pop()
+            for line in lines:
+                try:
+                    yield serialization.loads(line)
+                except ValueError:
+                    continue
+
+    def index_files(self) -> List[Path]:
+        return sorted(self.index_dir.iterdir()) if self.index_dir else []
+
+    def close(self):
+        storage.remove_node_change_hook(self._preserve)
+        for fd in self._segments.values():
+            os.close(fd)
+        for fd, _ in self.edges.values():
+            os.close(fd)
+        if self.index_dir:
+            shutil.rmtree(self.index_dir, ignore_errors=True)
+
+
+def export_snapshot(out: BinaryIO, fmt: str = "tar", include_index: bool = False) -> Dict[str, int]:
+    """
+    Stream a consistent snapshot of the library to the binary file out.
+    include_index adds the search index files. Returns node and edge counts.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid snapshot format '{fmt}'. Allowed: {list(FORMATS)}")
+    storage.ensure_dirs()
+    view = _View(include_index)
+    try:
+        header = {"format": FORMAT, "version": VERSION, "created": view.created, "index": view.index_dir is not None}
+        if fmt == "tar":
+            return _export_tar(view, header, out)
+        return _export_ndjson(view, header, out)
+    finally:
+        view.close()
+
+
+def _tar_add(tar: tarfile.TarFile, name: str, data: bytes, mtime: float):
+    info = tarfile.TarInfo(name)
+    info.size, info.mtime = len(data), mtime
+    tar.addfile(info, io.BytesIO(data))
+
+
+def _export_tar(view: _View, header: Dict[str, Any], out: BinaryIO) -> Dict[str, int]:
+    counts = {"nodes": 0, "edges": 0}
+    now = time.time()
+    with tarfile.open(fileobj=out, mode="w|") as tar:
+        _tar_add(tar, "snapshot.json", serialization.dumps(header, pretty=True), now)
+        for node in view.nodes():
+            _tar_add(tar, f"nodes/{node['type']}/{node['id']}.json", serialization.dumps(node), now)
+            counts["nodes"] += 1
+        for name, (fd, length) in view.edges.items():
+            info = tarfile.TarInfo(f"edges/{name}.jsonl")
+            info.size, info.mtime = length, now
+            with os.fdopen(os.dup(fd), "rb") as f:
+                f.seek(0)
+                tar.addfile(info, f)  # reads exactly length bytes
+            counts["edges"] += sum(chunk.count(b"\n") for chunk in view.edge_chunks(name))
+        for p in view.index_files():
+            tar.add(p, arcname=f"index/{p.name}", recursive=False)
+    return counts
+
+
+def _export_ndjson(view: _View, header: Dict[str, Any], out: BinaryIO) -> Dict[str, int]:
+    counts = {"nodes": 0, "edges": 0}
+    write = out.write
+    write(serialization.dumps_line({"snapshot": header}))
+    for node in view.nodes():
+        write(serialization.dumps_line({"node": node}))
+        counts["nodes"] += 1
+    for name in view.edges:
+        for record in view.edge_records(name):
+            write(serialization.dumps_line({"edge": name, "record": record}))
+            counts["edges"] += 1
+    for p in view.index_files():
+        with p.open("rb") as f:
+            offset = 0
+            while True:
+                chunk = f.read(CHUNK)
+                data = base64.b64encode(chunk).decode("ascii")
+                write(serialization.dumps_line({"file": f"index/{p.name}", "offset": offset, "data": data}))
+                offset += len(chunk)
+                if len(chunk) < CHUNK:
+                    break
+    write(serialization.dumps_line({"end": counts}))
+    return counts
+
+
+# -- import -------------------------------------------------------------------
+
+
+def _read_tar(stream: BinaryIO, staging: Path) -> Iterator[Tuple[str, Any]]:
+    with tarfile.open(fileobj=stream, mode="r|*") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            f = tar.extractfile(member)
+            parts = member.name.split("/")
+            if member.name == "snapshot.json":
+                yield "snapshot", serialization.loads(f.read())
+            elif parts[0] == "nodes" and len(parts) == 3:
+                yield "node", serialization.loads(f.read())
+            elif parts[0] == "edges" and len(parts) == 2 and parts[1].endswith(".jsonl"):
+                name = parts[1][: -len(".jsonl")]
+                for line in f:
+                    if line.strip():
+                        yield "edge", (name, serialization.loads(line))
+            elif parts[0] == "index" and len(parts) == 2:
+                with (staging / parts[1]).open("wb") as dst:
+                    shutil.copyfileobj(f, dst)
+                yield "file", parts[1]
+    yield "end", None
+
+
+def _read_ndjson(stream: BinaryIO, staging: Path) -> Iterator[Tuple[str, Any]]:
+    for line in stream:
+        if not line.strip():
+            continue
+        record = serialization.loads(line)
+        if "node" in record:
+            yield "node", record["node"]
+        elif "edge" in record:
+            yield "edge", (record["edge"], record["record"])
+        elif "file" in record:
+            name = record["file"].split("/", 1)[-1]
+            with (staging / name).open("ab" if record["offset"] else "wb") as dst:
+                dst.write(base64.b64decode(record["data"]))
+            yield "file", name
+        elif "snapshot" in record:
+            yield "snapshot", record["snapshot"]
+        elif "end" in record:
+            yield "end", record["end"]
+            return
+    raise ValueError("Snapshot stream is truncated (no end record)")
+
+
+def import_snapshot(stream: BinaryIO) -> Dict[str, Any]:
+    """
+    Bulk-load a snapshot (tar or NDJSON, detected from its first bytes) into
+    the library; nodes with the same ID are replaced. Returns counts and
+    whether the snapshot's index files were installed or the index rebuilt.
+    """
+    reader = stream if hasattr(stream, "peek") else io.BufferedReader(stream)
+    storage.ensure_dirs()
+    staging = Path(tempfile.mkdtemp(prefix="snapshot-import-", dir=ROOT / "tmp"))
+    try:
+        records = (_read_ndjson if reader.peek(1)[:1] == b"{" else _read_tar)(reader, staging)
+        with storage.writer():
+            empty = not any(storage.node_ids(kind) for kind in NODE_DIRS)
+            header, counts, files = _load_records(records)
+            if header is None or header.get("format") != FORMAT:
+                raise ValueError("Not a library snapshot")
+            if header.get("version", 0) > VERSION:
+                raise ValueError(f"Snapshot version {header['version']} is newer than supported ({VERSION})")
+            installed = bool(empty and files) and _install_index(staging, files)
+            storage.invalidate_caches()
+            if installed:
+                search.update_manifest(storage.node_ids("content"))
+            else:
+                search.rebuild_index()
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return {**counts, "index": "installed" if installed else "rebuilt"}
+
+
+def _load_records(records: Iterator[Tuple[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Dict[str, int], List[str]]:
+    header = None
+    counts = {"nodes": 0, "edges": 0}
+    files: List[str] = []
+    edges: Dict[str, List[Dict[str, Any]]] = {}
+
+    def nodes():
+        nonlocal header
+        for kind, value in records:
+            if kind == "snapshot":
+                header = value
+            elif kind == "node":
+                if header is None:
+                    raise ValueError("Not a library snapshot")
+                yield value
+            elif kind == "edge":
+                name, record = value
+                edges.setdefault(name, []).append(record)
+                if len(edges[name]) >= 10000:
+                    counts["edges"] += storage.append_edges(name, edges.pop(name))
+            elif kind == "file":
+                if value not in files:
+                    files.append(value)
+
+    counts["nodes"] = storage.write_nodes(nodes())
+    for name, batch in edges.items():
+        counts["edges"] += storage.append_edges(name, batch)
+    return header, counts, files
+
+
+def _install_index(staging: Path, files: List[str]) -> bool:
+    """Move staged index files into place if they were built with this analyzer configuration."""
+    try:
+        info = serialization.read(staging / "info.json")
+    except (FileNotFoundError, ValueError):
+        return False
+    if info.get("analyzer") != analysis.config_signature():
+        return False
+    with search.index_lock():
+        for name in files:
+            os.replace(staging / name, INDEX_DIR / name)
+        if storage.DEDUP_LOG_PATH.name not in files:
+            storage.DEDUP_LOG_PATH.unlink(missing_ok=True)  # would replay onto the imported dedup.json
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="write a snapshot of the library")
+    exp.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    exp.add_argument("--format", choices=FORMATS, default="tar")
+    exp.add_argument("--index", action="store_true", help="include the search index files")
+    imp = sub.add_parser("import", help="bulk-load a snapshot into the library")
+    imp.add_argument("input", nargs="?", default="-", help="snapshot file (default: stdin)")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    if args.command == "export":
+        if args.output == "-":
+            result = export_snapshot(sys.stdout.buffer, args.format, args.index)
+        else:
+            with open(args.output, "wb") as f:
+                result = export_snapshot(f, args.format, args.index)
+    elif args.input == "-":
+        result = import_snapshot(sys.stdin.buffer)
+    else:
+        with open(args.input, "rb") as f:
+            result = import_snapshot(f)
+    result["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    print(serialization.dumps(result).decode("utf-8"), file=sys.stderr)
+    return result
+
+
+if __name__ == "__main__":
+    main()
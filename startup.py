@@ -0,0 +1,33 @@
+"""
+Startup phase timings for the HTTP server.
+
+server_http records each phase (imports, app construction, time until the
+socket is listening, background index pre-warm) here so they can be printed
+at startup and reported by the HTTP endpoints.
+"""
+from __future__ import annotations
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+STARTED_AT = time.perf_counter()
+PHASES: Dict[str, float] = {}
+
+
+@contextmanager
+def phase(name: str):
+    """Record the wall-clock duration of the enclosed block in milliseconds."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASES[name] = round((time.perf_counter() - t0) * 1000, 2)
+
+
+def mark(name: str):
+    """Record the time elapsed since process start (module import) in milliseconds."""
+    PHASES[name] = round((time.perf_counter() - STARTED_AT) * 1000, 2)
+
+
+def report() -> str:
+    return ", ".join(f"{name}={ms}ms" for name, ms in PHASES.items())
@@ -1,12 +1,31 @@
 from __future__ import annotations
-import json
+import atexit
+import base64
+import contextlib
+import functools
+import hashlib
+import mmap
 import os
+import struct
+import threading
+import time
 import uuid
-from typing import Dict, Any, List, Optional
-from dataclasses import asdict
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 from datetime import datetime, timezone
 from schemas import ContentNode, TagNode, StyleNode, AuthorNode, LinkNode, slugify, ensure_style
+import serialization
+from packs import Location, PackStore
+from similarity import normalize_text, simhash, simhash_bands, hamming
+from wal import WriteAheadLog
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # pragma: no cover - not on Windows: writes are only serialized within a process
+    fcntl = None
 
 ROOT = Path(os.environ.get("MCP_SNIPPETS_ROOT", os.path.expanduser("~/.mcp_snippets")))
 NODE_DIRS = {
@@ -19,9 +38,217 @@ NODE_DIRS = {
 EDGE_DIR = ROOT / "edges"
 INDEX_DIR = ROOT / "index"
 TMP_DIR = ROOT / "tmp" / "locks"
+DICT_DIR = ROOT / "dicts"
+PACK_DIR = ROOT / "packs"
+DEDUP_PATH = INDEX_DIR / "dedup.json"
+DEDUP_LOG_PATH = INDEX_DIR / "dedup.log"
+COUNTERS_PATH = INDEX_DIR / "counters.json"
+WRITER_LOCK_PATH = TMP_DIR / "writer.lock"
+GENERATION_PATH = TMP_DIR / "generation"
+WAL_DIR = ROOT / "wal"
+REPLICA_PATH = INDEX_DIR / "replica.json"
+
+# Fields identifying an edge in each edge log (the date is not part of it),
+# and the node kind each endpoint field refers to.
+EDGE_KEYS = {
+    "relates": ("src", "type", "dst"),
+    "tags": ("content", "tag"),
+    "authors": ("content", "author"),
+    "links": ("content", "link"),
+}
+EDGE_ENDPOINTS = {
+    "relates": (("src", "content"), ("dst", "content")),
+    "tags": (("content", "content"), ("tag", "tag")),
+    "authors": (("content", "content"), ("author", "author")),
+    "links": (("content", "content"), ("link", "link")),
+}
+
+# How add_content treats content whose normalized title + body already exists.
+DUPLICATE_MODES = {"return", "reject", "allow"}
+# Near-duplicate (SimHash) detection is opt-in and only applied to short styles.
+NEAR_DUP_BITS = int(os.environ.get("MCP_NEAR_DUP_BITS", "0"))
+NEAR_DUP_STYLES = {"snippet", "tweet"}
+
+# Optional compression of content bodies ("none" or "zlib"); metadata stays plain JSON.
+BODY_COMPRESSION = os.environ.get("MCP_BODY_COMPRESSION", "none")
+COMPRESS_MIN_BYTES = int(os.environ.get("MCP_COMPRESS_MIN_BYTES", "512"))
+ZDICT_SIZE = 32768  # zlib uses at most a 32 KiB preset dictionary
+
+# Where new nodes are written: "loose" (one JSON file each) or "pack" (appended
+# to segment files, see packs.py). Both are always readable, so a library can be
+# switched either way; repack() then moves the existing nodes over.
+NODE_STORE = os.environ.get("MCP_NODE_STORE", "loose")
+if NODE_STORE not in ("loose", "pack"):
+    raise ValueError(f"Invalid MCP_NODE_STORE '{NODE_STORE}'. Allowed: ['loose', 'pack']")
+# Repack in the background once dead records exceed this share of the packs.
+REPACK_RATIO = float(os.environ.get("MCP_PACK_REPACK_RATIO", "0.5"))
+
+# MCP_WAL=on records every node and edge change in a write-ahead log (wal.py)
+# before applying it, and a mutation returns once its records are on disk.
+# Only the search index updates are deferred: node files and edge logs are
+# still written (without fsync) inside the mutation, so reads see them at
+# once, and the log is what makes them durable. The index updates are applied
+# in batches by a background thread, after waiting up to MCP_WAL_APPLY_MS for
+# more writes (see apply_pending()).
+# A checkpoint starts a new log segment once the current one exceeds
+# MCP_WAL_CHECKPOINT_MB; the newest MCP_WAL_KEEP_SEGMENTS segments are kept
+# for read replicas.
+WAL_MODE = os.environ.get("MCP_WAL", "off")
+if WAL_MODE not in ("off", "on"):
+    raise ValueError(f"Invalid MCP_WAL '{WAL_MODE}'. Allowed: ['off', 'on']")
+WAL_APPLY_DELAY = float(os.environ.get("MCP_WAL_APPLY_MS", "5")) / 1000
+WAL_CHECKPOINT_BYTES = int(float(os.environ.get("MCP_WAL_CHECKPOINT_MB", "16")) * 1024 * 1024)
+WAL_KEEP_SEGMENTS = int(os.environ.get("MCP_WAL_KEEP_SEGMENTS", "4"))
+# MCP_REPLICA_OF=<root of a library written with MCP_WAL=on> makes this library
+# a read replica of it, kept up to date from its log by replica.py. Only the
+# replica follower writes to a replica; the mutations below refuse.
+REPLICA_OF = os.environ.get("MCP_REPLICA_OF") or None
+
+_dirs_ready = False
+
+# Held by every public mutation for its whole duration (node, edges and index
+# updates), so snapshots can start at a point where no write is half applied.
+# writer() adds an exclusive lock on WRITER_LOCK_PATH, so that the processes
+# sharing a library (server workers, the watcher, CLI tools) write one at a time.
+_write_lock = threading.RLock()
+_writer: Dict[str, Any] = {"fd": None, "depth": 0}
+# The library generation: a counter in GENERATION_PATH, mapped into memory and
+# bumped whenever a writer releases the lock. A process that sees a value other
+# than the last one it saw drops what it cached from disk (see refresh()).
+_GENERATION = struct.Struct("<Q")
+_generation: Dict[str, Any] = {"map": None, "seen": 0}
+_refresh_lock = threading.Lock()
+# After the generation, the size the write-ahead log had when the last writer
+# released the lock: a log of another size means a writer died mid-mutation.
+_WAL_MARK = struct.Struct("<Q")
+_wal = WriteAheadLog(WAL_DIR, WAL_KEEP_SEGMENTS) if WAL_MODE == "on" and not REPLICA_OF else None
+_wal_state: Dict[str, Any] = {"replaying": False, "recovered": False, "checkpoints": 0}
+# Content IDs whose search index update is queued (WAL mode), in write order.
+_pending: Dict[str, None] = {}
+_pending_cond = threading.Condition()
+_applier: Dict[str, Any] = {"thread": None, "batch": 0}
+# Callbacks run with (kind, node_id) just before a stored node is overwritten
+# or removed; snapshots use them to keep the version they started with.
+_node_change_hooks: List[Callable[[str, str], None]] = []
 
-for p in [*NODE_DIRS.values(), EDGE_DIR, INDEX_DIR, TMP_DIR]:
-    p.mkdir(parents=True, exist_ok=True)
+
+@contextlib.contextmanager
+def writer():
+    """
+    Hold the library's write lock, shared by all processes using the library
+    and re-entrant within a thread. Entering it drops caches made stale by
+    other processes; leaving it bumps the generation so they notice this write.
+    """
+    with _write_lock:
+        if _writer["depth"] == 0 and fcntl is not None:
+            if _writer["fd"] is None:
+                TMP_DIR.mkdir(parents=True, exist_ok=True)
+                _writer["fd"] = os.open(WRITER_LOCK_PATH, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(_writer["fd"], fcntl.LOCK_EX)
+        _writer["depth"] += 1
+        try:
+            if _writer["depth"] == 1:
+                refresh()
+                if _wal is not None and not _wal_state["replaying"]:
+                    if not _wal_state["recovered"] or _wal_mark() != _wal.size():
+                        _replay_wal()
+            yield
+        finally:
+            _writer["depth"] -= 1
+            if _writer["depth"] == 0:
+                try:
+                    _publish()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(_writer["fd"], fcntl.LOCK_UN)
+
+
+def _refuse_on_replica():
+    if REPLICA_OF:
+        raise ValueError(f"This library is a read replica of {REPLICA_OF}; write to the primary instead")
+
+
+def _mutation(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        _refuse_on_replica()
+        with writer():
+            outer = _writer["depth"] == 1
+            result = fn(*args, **kwargs)
+            if outer and _wal is not None:
+                _maybe_checkpoint()
+        if outer and _wal is not None:
+            _wal.commit(_wal.ticket())  # outside the lock, so concurrent writers share syncs
+        return result
+
+    return wrapper
+
+
+def _generation_map(create: bool) -> Optional[mmap.mmap]:
+    mm = _generation["map"]
+    if mm is None:
+        if not create and not GENERATION_PATH.exists():
+            return None
+        TMP_DIR.mkdir(parents=True, exist_ok=True)
+        fd = os.open(GENERATION_PATH, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            size = _GENERATION.size + _WAL_MARK.size
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            mm = _generation["map"] = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+    return mm
+
+
+def generation() -> int:
+    """The library generation (0 before the first write); one memory read."""
+    mm = _generation_map(create=False)
+    return _GENERATION.unpack_from(mm)[0] if mm is not None else 0
+
+
+def _wal_mark() -> int:
+    mm = _generation_map(create=False)
+    return _WAL_MARK.unpack_from(mm, _GENERATION.size)[0] if mm is not None else 0
+
+
+def _publish():
+    mm = _generation_map(create=True)
+    if _wal is not None:
+        _WAL_MARK.pack_into(mm, _GENERATION.size, _wal.size())
+    with _refresh_lock:
+        value = _GENERATION.unpack_from(mm)[0] + 1
+        _GENERATION.pack_into(mm, 0, value)
+        _generation["seen"] = value
+
+
+def refresh() -> bool:
+    """
+    Drop the caches of this process (counters, dedup index, edge sets, pack
+    index) if another process wrote to the library since they were loaded.
+    Returns whether it did. Called by the read functions below; the search
+    indexes check the generation themselves.
+    """
+    if generation() == _generation["seen"]:
+        return False
+    with _refresh_lock:
+        current = generation()
+        if current == _generation["seen"]:
+            return False
+        _drop_caches()
+        _generation["seen"] = current
+    return True
+
+
+def ensure_dirs():
+    """Create the storage tree on first write rather than at import time."""
+    global _dirs_ready
+    if not _dirs_ready:
+        for p in [*NODE_DIRS.values(), EDGE_DIR, INDEX_DIR, TMP_DIR]:
+            p.mkdir(parents=True, exist_ok=True)
+        _dirs_ready = True
+        # Counters must be loaded before the first write they will count.
+        _load_counters()
 
 
 def _iso_now() -> str:
@@ -29,17 +256,864 @@ def _iso_now() -> str:
 
 
 def _write_json(path: Path, obj: Dict[str, Any]):
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
-    tmp.replace(path)
+    ensure_dirs()
+    serialization.write(path, obj, pretty="content_encoding" not in obj)
+
+
+_zdicts: Dict[str, bytes] = {}
+
+
+def _zdict(dict_id: str) -> bytes:
+    if dict_id not in _zdicts:
+        _zdicts[dict_id] = (DICT_DIR / f"{dict_id}.zdict").read_bytes()
+    return _zdicts[dict_id]
+
+
+def _current_dict_id() -> Optional[str]:
+    try:
+        return (DICT_DIR / "current").read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _encode_node(node: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compress the body of a content node per MCP_BODY_COMPRESSION.
+
+    The compressed body is stored base64-encoded in "content_z" with
+    "content_encoding" set to "zlib" or "zlib:<dictionary id>".
+    """
+    body = (node.get("content") or "").encode("utf-8")
+    if BODY_COMPRESSION != "zlib" or len(body) < COMPRESS_MIN_BYTES:
+        return node
+    dict_id = _current_dict_id()
+    comp = zlib.compressobj(6, zdict=_zdict(dict_id)) if dict_id else zlib.compressobj(6)
+    packed = comp.compress(body) + comp.flush()
+    encoded = {k: v for k, v in node.items() if k != "content"}
+    encoded["content_encoding"] = f"zlib:{dict_id}" if dict_id else "zlib"
+    encoded["content_z"] = base64.b64encode(packed).decode("ascii")
+    return encoded
+
+
+def decode_node(node: Dict[str, Any]) -> Dict[str, Any]:
+    """Decode a stored node in place: a compressed content body becomes "content" again."""
+    encoding = node.pop("content_encoding", None)
+    if encoding is None:
+        return node
+    codec, _, dict_id = encoding.partition(":")
+    if codec != "zlib":
+        raise ValueError(f"Unknown content encoding '{encoding}'")
+    packed = base64.b64decode(node.pop("content_z"))
+    decomp = zlib.decompressobj(zdict=_zdict(dict_id)) if dict_id else zlib.decompressobj()
+    node["content"] = (decomp.decompress(packed) + decomp.flush()).decode("utf-8")
+    return node
+
+
+def read_node_file(path: Path) -> Dict[str, Any]:
+    """Read a node file, transparently decoding a compressed content body."""
+    return decode_node(serialization.read(path))
+
+
+_packs = PackStore(PACK_DIR, lock=writer)
+_repack_lock = threading.Lock()
+
+
+def pin_packs() -> Tuple[List[Tuple[Tuple[str, str], Location]], Dict[int, int]]:
+    """The packed nodes and a descriptor per segment they use (see PackStore.pin())."""
+    return _packs.pin()
+
+
+def add_node_change_hook(hook: Callable[[str, str], None]):
+    _node_change_hooks.append(hook)
+
+
+def remove_node_change_hook(hook: Callable[[str, str], None]):
+    if hook in _node_change_hooks:
+        _node_change_hooks.remove(hook)
+
+
+def node_path(kind: str, node_id: str) -> Path:
+    """Where the loose file of a node is (or would be) stored."""
+    return NODE_DIRS[kind] / f"{node_id}.json"
+
+
+def read_node(kind: str, node_id: str) -> Optional[Dict[str, Any]]:
+    """A node of the given kind, packed or loose, or None if it does not exist."""
+    refresh()
+    data = _packs.get(kind, node_id)
+    if data is not None:
+        return decode_node(serialization.loads(data))
+    try:
+        return read_node_file(node_path(kind, node_id))
+    except FileNotFoundError:
+        return None
+
+
+def node_exists(kind: str, node_id: str) -> bool:
+    refresh()
+    return _packs.location(kind, node_id) is not None or node_path(kind, node_id).exists()
+
+
+def node_ids(kind: str) -> List[str]:
+    """IDs of all nodes of a kind: packed ones first, then loose files."""
+    refresh()
+    ids = _packs.ids(kind)
+    if NODE_DIRS[kind].exists():
+        ids += [p.stem for p in NODE_DIRS[kind].glob("*.json")]
+    return ids
+
+
+def iter_nodes(kind: str) -> Iterator[Dict[str, Any]]:
+    """All nodes of a kind (packed ones in storage order, then loose files), skipping unreadable ones."""
+    refresh()
+    for _, data in _packs.iter_records(kind):
+        try:
+            yield decode_node(serialization.loads(data))
+        except ValueError:
+            continue
+    for p in NODE_DIRS[kind].glob("*.json"):
+        try:
+            yield read_node_file(p)
+        except (FileNotFoundError, ValueError):
+            continue
+
+
+def node_stamp(kind: str, node_id: str) -> Optional[Tuple[Any, Any]]:
+    """
+    A cheap identity of the stored version of a node: (segment, offset) when
+    packed, (mtime_ns, size) for a loose file; None if it does not exist.
+    """
+    loc = _packs.location(kind, node_id)
+    if loc is not None:
+        return f"seg-{loc[0]:06d}", loc[1]
+    try:
+        st = node_path(kind, node_id).stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def node_signature(kind: str, node_id: str) -> Optional[List[Any]]:
+    """
+    The node_stamp plus a hash of the node's compact encoding, so a node moved
+    between loose files and packs (or by a repack) is recognized as unchanged.
+    """
+    stamp = node_stamp(kind, node_id)
+    if stamp is None:
+        return None
+    data = _packs.get(kind, node_id)
+    if data is None:
+        try:
+            data = serialization.dumps(serialization.read(node_path(kind, node_id)))
+        except (FileNotFoundError, ValueError):
+            return None
+    return [*stamp, hashlib.sha256(data).hexdigest()[:16]]
+
+
+def _stored_size(kind: str, node_id: str) -> int:
+    loc = _packs.location(kind, node_id)
+    if loc is not None:
+        return loc[2]
+    try:
+        return node_path(kind, node_id).stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _write_node(kind: str, node: Dict[str, Any]):
+    """Store an (encoded) node per MCP_NODE_STORE, dropping its copy in the other store."""
+    path = node_path(kind, node["id"])
+    for hook in _node_change_hooks:
+        hook(kind, node["id"])
+    _log({"put": kind, "node": node})
+    if NODE_STORE == "pack":
+        ensure_dirs()
+        _packs.put(kind, node["id"], serialization.dumps(node))
+        path.unlink(missing_ok=True)
+    else:
+        _write_json(path, node)
+        _packs.delete(kind, node["id"])
+    _maybe_repack()
+
+
+def _remove_node(kind: str, node_id: str) -> bool:
+    for hook in _node_change_hooks:
+        hook(kind, node_id)
+    _log({"del": kind, "id": node_id})
+    removed = _packs.delete(kind, node_id)
+    try:
+        node_path(kind, node_id).unlink()
+        removed = True
+    except FileNotFoundError:
+        pass
+    _maybe_repack()
+    return removed
+
+
+def apply_node(kind: str, node: Dict[str, Any]):
+    """
+    Store an (encoded) node as logged, bypassing the mutation checks; for
+    callers that hold writer() and keep the counters themselves (replicas).
+    """
+    _write_node(kind, node)
+
+
+def apply_removal(kind: str, node_id: str) -> bool:
+    """Remove a node like apply_node() stores one; returns whether it existed."""
+    return _remove_node(kind, node_id)
+
+
+@_mutation
+def write_nodes(nodes: Iterable[Dict[str, Any]]) -> int:
+    """
+    Store many nodes at once (bulk import), replacing nodes with the same ID.
+
+    Only the node files are written: counters, the dedup index and the search
+    indexes are left to the caller, which typically runs one rebuild_index()
+    afterwards. Returns the number of nodes written.
+    """
+    ensure_dirs()
+    count = 0
+    batch: List[Tuple[str, str, bytes]] = []
+    for node in nodes:
+        kind, node_id = node["type"], node["id"]
+        if kind not in NODE_DIRS:
+            raise ValueError(f"Unknown node type '{kind}'")
+        node = _encode_node(node) if kind == "content" else node
+        for hook in _node_change_hooks:
+            hook(kind, node_id)
+        _log({"put": kind, "node": node})
+        if NODE_STORE == "pack":
+            batch.append((kind, node_id, serialization.dumps(node)))
+            node_path(kind, node_id).unlink(missing_ok=True)
+            if len(batch) >= 1024:
+                _packs.put_many(batch)
+                batch = []
+        else:
+            _write_json(node_path(kind, node_id), node)
+            _packs.delete(kind, node_id)
+        count += 1
+    if batch:
+        _packs.put_many(batch)
+    return count
+
+
+def repack() -> Dict[str, int]:
+    """
+    Rewrite the pack segments without dead records (superseded or deleted
+    nodes) and move nodes to the store selected by MCP_NODE_STORE: loose files
+    are migrated into the packs in pack mode, and packed nodes are written out
+    as loose files in loose mode. Returns segment, record and byte counts and
+    the number of nodes migrated.
+    """
+    moved: List[Tuple[str, str]] = []
+    if NODE_STORE == "pack":
+        loose = [(kind, p) for kind, base in NODE_DIRS.items() if base.exists() for p in base.glob("*.json")]
+
+        def migrate():
+            for kind, p in loose:
+                try:
+                    yield kind, p.stem, serialization.dumps(serialization.read(p))
+                except (FileNotFoundError, ValueError):
+                    continue
+
+        with _repack_lock:
+            stats = _packs.repack(migrate(), sum(p.stat().st_size for _, p in loose))
+        with writer():
+            for kind, p in loose:
+                if _packs.location(kind, p.stem) is not None:
+                    for hook in _node_change_hooks:
+                        hook(kind, p.stem)
+                    p.unlink(missing_ok=True)
+                    moved.append((kind, p.stem))
+    else:
+        with writer():
+            for kind in NODE_DIRS:
+                for node_id, data in list(_packs.iter_records(kind)):
+                    _write_json(node_path(kind, node_id), serialization.loads(data))
+                    _packs.delete(kind, node_id)
+                    moved.append((kind, node_id))
+        with _repack_lock:
+            stats = _packs.repack()
+    stats["migrated"] = len(moved)
+    return stats
+
+
+def _maybe_repack():
+    """Start a background repack once dead records exceed REPACK_RATIO of the pack bytes."""
+    if REPACK_RATIO <= 0 or _repack_lock.locked():
+        return
+    stats = _packs.stats()
+    if stats["garbage_bytes"] > max(REPACK_RATIO * stats["bytes"], _packs.segment_bytes):
+        threading.Thread(target=_background_repack, daemon=True).start()
+
+
+def _background_repack():
+    if not _repack_lock.acquire(blocking=False):
+        return
+    try:
+        _packs.repack()
+    except Exception:
+        pass
+    finally:
+        _repack_lock.release()
+
+
+def train_body_dictionary(sample_size: int = 1000) -> Optional[str]:
+    """
+    Train a shared zlib preset dictionary from a sample of content bodies and
+    make it the one used for newly compressed bodies. Returns its ID, or None
+    when the library has no repeated phrases to learn from.
+
+    The dictionary is the most frequent word 1-3 grams (by document frequency
+    times length), most useful last since zlib favours short back-references.
+    Bodies keep the ID of the dictionary they were written with, so older
+    dictionaries are never deleted.
+    """
+    phrases: Counter = Counter()
+    for i, node in enumerate(iter_content_nodes()):
+        if i >= sample_size:
+            break
+        words = (node.get("content") or "").split()
+        grams = set()
+        for n in (1, 2, 3):
+            grams.update(" ".join(words[j : j + n]) for j in range(len(words) - n + 1))
+        phrases.update(grams)
+    ranked = sorted(
+        ((df * len(p), p) for p, df in phrases.items() if df > 1 and len(p) > 3), reverse=True
+    )
+    chosen, size = [], 0
+    for _, phrase in ranked:
+        size += len(phrase.encode("utf-8")) + 1
+        if size > ZDICT_SIZE:
+            break
+        chosen.append(phrase)
+    if not chosen:
+        return None
+    zdict = (" ".join(reversed(chosen)) + " ").encode("utf-8")
+    dict_id = hashlib.sha256(zdict).hexdigest()[:12]
+    DICT_DIR.mkdir(parents=True, exist_ok=True)
+    (DICT_DIR / f"{dict_id}.zdict").write_bytes(zdict)
+    (DICT_DIR / "current").write_text(dict_id, encoding="utf-8")
+    _zdicts[dict_id] = zdict
+    return dict_id
+
+
+@_mutation
+def recompress_content() -> Dict[str, int]:
+    """
+    Rewrite every content node with the current MCP_BODY_COMPRESSION setting and
+    dictionary (or uncompressed when compression is off). Returns byte totals.
+    """
+    before = after = count = 0
+    for node_id in node_ids("content"):
+        node = read_node("content", node_id)
+        if node is None:
+            continue
+        before += _stored_size("content", node_id)
+        _write_node("content", _encode_node(node))
+        after += _stored_size("content", node_id)
+        count += 1
+    return {"nodes": count, "bytes_before": before, "bytes_after": after}
+
+
+_edge_lock = threading.RLock()
+
+
+def edge_lock() -> threading.RLock:
+    """The lock serializing edge log appends; take it after search.index_lock()."""
+    return _edge_lock
+
+
+_edge_sets: Dict[str, set] = {}
+_edge_sizes: Dict[str, int] = {}  # log size covered by _edge_sets and the counters
+
+
+def _edge_key(name: str, obj: Dict[str, Any]) -> Tuple:
+    return tuple(obj.get(k) for k in EDGE_KEYS.get(name, ()))
+
+
+def _edge_set(name: str) -> set:
+    """In-memory set of the edge keys present in edges/<name>.jsonl."""
+    if name not in _edge_sets:
+        keys = set()
+        path = EDGE_DIR / f"{name}.jsonl"
+        _edge_sizes[name] = 0
+        if path.exists():
+            with path.open("rb") as f:
+                for line in f:
+                    try:
+                        keys.add(_edge_key(name, serialization.loads(line)))
+                    except ValueError:
+                        continue
+                _edge_sizes[name] = f.tell()
+        _edge_sets[name] = keys
+    return _edge_sets[name]
+
+
+def _append_jsonl(path: Path, obj: Dict[str, Any]) -> bool:
+    """Append an edge unless an identical one (ignoring date) already exists."""
+    return _append_edges(path.stem, [obj]) > 0
+
+
+def _append_edges(name: str, records: Iterable[Dict[str, Any]]) -> int:
+    """Append the edges not already in edges/<name>.jsonl with one write; returns how many."""
+    with _edge_lock:
+        keys = _edge_set(name)
+        new = []
+        for obj in records:
+            key = _edge_key(name, obj)
+            if key in keys:
+                continue
+            keys.add(key)
+            new.append(obj)
+        if new:
+            _log({"edges": name, "records": new})
+            ensure_dirs()
+            with (EDGE_DIR / f"{name}.jsonl").open("ab") as f:
+                f.write(b"".join(map(serialization.dumps_line, new)))
+                _edge_sizes[name] = f.tell()
+            _bump("edges", name, len(new))
+    return len(new)
+
+
+_counters: Optional[Dict[str, Dict[str, int]]] = None
+
+
+def recount() -> Dict[str, Dict[str, int]]:
+    """
+    Recompute node and edge counters from disk (slow path; run by rebuild_index
+    and when no counters file exists yet).
+    """
+    global _counters
+    nodes = {kind: len(node_ids(kind)) for kind in NODE_DIRS}
+    edges = {}
+    for p in EDGE_DIR.glob("*.jsonl"):
+        with p.open("rb") as f:
+            edges[p.stem] = sum(1 for line in f if line.strip())
+    _counters = {"nodes": nodes, "edges": edges}
+    if ROOT.exists():
+        ensure_dirs()
+        serialization.write(COUNTERS_PATH, _counters)
+    return _counters
+
+
+def _load_counters() -> Dict[str, Dict[str, int]]:
+    global _counters
+    if _counters is None:
+        try:
+            _counters = serialization.read(COUNTERS_PATH)
+        except (FileNotFoundError, ValueError):
+            recount()
+    return _counters
+
 
+def _bump(kind: str, name: str, delta: int = 1):
+    counters = _load_counters()
+    counters[kind][name] = counters[kind].get(name, 0) + delta
+    serialization.write(COUNTERS_PATH, counters)
 
-def _append_jsonl(path: Path, obj: Dict[str, Any]):
-    with path.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(obj, ensure_ascii=False) + "\n")
 
+def adjust_node_count(kind: str, delta: int):
+    """Correct the node counter of a kind after apply_node()/apply_removal()."""
+    _bump("nodes", kind, delta)
 
+
+def counters() -> Dict[str, Dict[str, int]]:
+    """
+    Node counts per type and edge counts per edge log, maintained on every write
+    so callers such as /health never glob the library.
+    """
+    refresh()
+    loaded = _load_counters()
+    return {kind: dict(values) for kind, values in loaded.items()}
+
+
+def queue_depth() -> int:
+    """Number of content changes whose search index update is not applied yet (WAL mode)."""
+    return len(_pending) + _applier["batch"]
+
+
+def _log(record: Dict[str, Any]):
+    """Record a change in the write-ahead log before applying it (no-op unless MCP_WAL=on)."""
+    if _wal is not None and not _wal_state["replaying"]:
+        _wal.append(record)
+
+
+def _index_content(doc_id: str, node: Optional[Dict[str, Any]], previous: Optional[Dict[str, Any]] = None):
+    """Update the search indexes for a stored (None: deleted) content node; queued in WAL mode."""
+    if _wal is not None:
+        with _pending_cond:
+            _pending[doc_id] = None
+            if _applier["thread"] is None:
+                _applier["thread"] = threading.Thread(target=_apply_loop, daemon=True)
+                _applier["thread"].start()
+                atexit.register(_apply_at_exit)
+            _pending_cond.notify()
+        return
+    import search
+
+    if node is None:
+        search.remove_document(doc_id)
+    else:
+        search.index_document(doc_id, node, previous)
+
+
+def _apply_at_exit():
+    try:
+        apply_pending()
+    except Exception as e:
+        print(f"[storage] Index updates left to the next replay: {e}")
+
+
+def _apply_loop():
+    while True:
+        with _pending_cond:
+            while not _pending:
+                _pending_cond.wait()
+        time.sleep(WAL_APPLY_DELAY)  # let concurrent writes join the batch
+        try:
+            apply_pending()
+        except Exception as e:
+            print(f"[storage] Applying index updates failed: {e}")
+            time.sleep(1)
+
+
+def apply_pending() -> int:
+    """
+    Apply the queued search index updates now, as one batch (WAL mode; queries
+    call this first so they see the writes made before them). A process that
+    has not recovered the log yet replays it. Returns the number of documents.
+    """
+    if _wal is None or (not _pending and not _applier["batch"] and _wal_state["recovered"]):
+        return 0
+    with writer():  # waits for a batch the applier thread is indexing
+        applied = _apply_batch()
+        _maybe_checkpoint()
+    return applied
+
+
+def _apply_batch() -> int:
+    with _pending_cond:
+        batch = list(_pending)
+        _pending.clear()
+        _applier["batch"] = len(batch)
+    if not batch:
+        return 0
+    try:
+        import search
+
+        search.index_batch(batch)
+    except Exception:
+        with _pending_cond:
+            for doc_id in batch:
+                _pending.setdefault(doc_id, None)
+        raise
+    finally:
+        _applier["batch"] = 0
+    return len(batch)
+
+
+def _unindexed(records: Iterable[Dict[str, Any]]) -> List[str]:
+    """Content IDs changed by the records without a later "indexed" record covering them."""
+    changed: Dict[str, None] = {}
+    for record in records:
+        if record.get("put") == "content":
+            changed[record["node"]["id"]] = None
+        elif record.get("del") == "content":
+            changed[record["id"]] = None
+        elif "indexed" in record:
+            if record["indexed"] is None:
+                changed.clear()
+            else:
+                for doc_id in record["indexed"]:
+                    changed.pop(doc_id, None)
+    return list(changed)
+
+
+def _replay_wal() -> Dict[str, int]:
+    """
+    Recover from the write-ahead log (the caller holds writer()). If a writer
+    died mid-mutation (the log is not the size recorded when the lock was last
+    released), the latest logged version of each node and the logged edges are
+    redone; in any case content whose index update was lost is indexed. Runs
+    on a process's first write or query and after such a crash; idempotent.
+    """
+    stats = {"records": 0, "nodes": 0, "edges": 0, "indexed": 0}
+    _wal_state["replaying"] = True
+    try:
+        crashed = _wal_mark() != _wal.size()
+        records = list(_wal.records())
+        changed: Dict[str, None] = {}
+        if crashed:
+            latest: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+            for record in records:
+                if "put" in record:
+                    latest[(record["put"], record["node"]["id"])] = record["node"]
+                elif "del" in record:
+                    latest[(record["del"], record["id"])] = None
+                elif "edges" in record:
+                    stats["edges"] += _append_edges(record["edges"], record["records"])
+            for (kind, node_id), node in latest.items():
+                if node is None:
+                    redone = _remove_node(kind, node_id)
+                elif read_node(kind, node_id) != (decode_node(node) if kind == "content" else node):
+                    _write_node(kind, node)
+                    redone = True
+                else:
+                    redone = False
+                if redone:
+                    stats["nodes"] += 1
+                    if kind == "content":
+                        changed[node_id] = None
+        stats["records"] = len(records)
+        unindexed = _unindexed(records)
+        if unindexed:
+            import search
+
+            search.index_batch(unindexed)
+            stats["indexed"] = len(unindexed)
+        changed.update(dict.fromkeys(unindexed))
+        if changed:
+            replace_dedup_entries({doc_id: read_node("content", doc_id) for doc_id in changed})
+        if crashed:
+            recount()
+    finally:
+        _wal_state["replaying"] = False
+    _wal_state["recovered"] = True
+    if stats["nodes"] or stats["edges"] or stats["indexed"]:
+        print(f"[storage] Replayed the write-ahead log: {stats}")
+    return stats
+
+
+def checkpoint() -> bool:
+    """
+    Start a new write-ahead log segment once the changes recorded in the
+    current one are durable in the library files: queued index updates are
+    applied, content still unindexed (e.g. queued by a process that died) is
+    indexed, and all files are synced. Returns whether there was anything to
+    checkpoint.
+    """
+    if _wal is None:
+        return False
+    with writer():
+        if not _wal.size():
+            return False
+        _apply_batch()
+        unindexed = _unindexed(_wal.records())
+        if unindexed:
+            import search
+
+            search.index_batch(unindexed)
+        _flush_dedup()
+        os.sync()
+        _wal.rotate()
+        _wal_state["checkpoints"] += 1
+    return True
+
+
+def _maybe_checkpoint():
+    if _wal is not None and _wal.size() >= WAL_CHECKPOINT_BYTES:
+        checkpoint()
+
+
+def wal_stats() -> Dict[str, Any]:
+    """Write-ahead log size, commit/sync counts (syncs < commits: commits shared a sync) and queue depth."""
+    if _wal is None:
+        return {"mode": "off"}
+    return {
+        "mode": "on",
+        "segment": _wal.segment,
+        "bytes": _wal.size(),
+        "queue_depth": queue_depth(),
+        "commits": _wal.commits,
+        "syncs": _wal.syncs,
+        "checkpoints": _wal_state["checkpoints"],
+    }
+
+
+class DuplicateContentError(ValueError):
+    """Raised by add_content(on_duplicate="reject") when the content already exists."""
+
+    def __init__(self, existing_id: str):
+        super().__init__(f"Duplicate of existing content '{existing_id}'")
+        self.existing_id = existing_id
+
+
+def content_hash(content: str, title: Optional[str] = None) -> str:
+    """Content address of a node: SHA-256 of the normalized title and body."""
+    normalized = normalize_text(title or "") + "\n" + normalize_text(content or "")
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+_dedup: Optional[Dict[str, Any]] = None
+_dedup_log = {"lines": 0}  # records in dedup.log not yet folded into dedup.json
+
+# The dedup index is stored as a snapshot (dedup.json) plus a log of the
+# changes made since (dedup.log, JSON Lines), so an ingest appends one record
+# instead of rewriting the whole index. The log is folded into the snapshot
+# at a WAL checkpoint, on a rebuild, or once it holds more records than the
+# index has entries. Replaying a record twice has no further effect, so a
+# crash between writing the snapshot and removing the log is harmless.
+
+
+def _dedup_put(cid: str, content: str, title: Optional[str]) -> Dict[str, Any]:
+    return {"put": cid, "hash": content_hash(content, title), "fp": simhash(content)}
+
+
+def _dedup_del(cid: str, content: Optional[str] = None, title: Optional[str] = None) -> Dict[str, Any]:
+    """A removal record; without content, every content hash registered for cid is dropped."""
+    return {"del": cid, "hash": content_hash(content, title) if content is not None else None}
+
+
+def _dedup_apply(index: Dict[str, Any], record: Dict[str, Any]):
+    if "put" in record:
+        cid = record["put"]
+        index["exact"].setdefault(record["hash"], cid)
+        index["simhash"][cid] = record["fp"]
+        for key in simhash_bands(record["fp"]):
+            bucket = index["bands"].setdefault(key, [])
+            if cid not in bucket:
+                bucket.append(cid)
+        return
+    cid, digest = record["del"], record["hash"]
+    if digest is None:
+        for stale in [d for d, owner in index["exact"].items() if owner == cid]:
+            del index["exact"][stale]
+    elif index["exact"].get(digest) == cid:
+        del index["exact"][digest]
+    fp = index["simhash"].pop(cid, None)
+    if fp is not None:
+        for key in simhash_bands(fp):
+            bucket = index["bands"].get(key, [])
+            if cid in bucket:
+                bucket.remove(cid)
+            if not bucket:
+                index["bands"].pop(key, None)
+
+
+def _save_dedup(index: Dict[str, Any], records: List[Dict[str, Any]]):
+    """Apply records to the loaded index and append them to dedup.log (the caller holds writer())."""
+    for record in records:
+        _dedup_apply(index, record)
+    ensure_dirs()
+    with DEDUP_LOG_PATH.open("ab") as f:
+        f.write(b"".join(serialization.dumps_line(r) for r in records))
+    _dedup_log["lines"] += len(records)
+    if _dedup_log["lines"] > max(1000, len(index["simhash"])):
+        _flush_dedup()
+
+
+def _flush_dedup():
+    """Fold dedup.log into the dedup.json snapshot."""
+    if _dedup is None or not DEDUP_LOG_PATH.exists():
+        return
+    serialization.write(DEDUP_PATH, _dedup)
+    DEDUP_LOG_PATH.unlink(missing_ok=True)
+    _dedup_log["lines"] = 0
+
+
+def replace_dedup_entries(nodes: Dict[str, Optional[Dict[str, Any]]]):
+    """
+    Re-register content IDs in the dedup index from their current node (None
+    when deleted), for changes made on disk whose previous version is unknown.
+    """
+    records = []
+    for cid, node in nodes.items():
+        records.append(_dedup_del(cid))
+        if node is not None:
+            records.append(_dedup_put(cid, node.get("content", ""), node.get("title")))
+    _save_dedup(_load_dedup(), records)
+
+
+def rebuild_dedup_index() -> Dict[str, Any]:
+    """
+    Rebuild the content-hash / SimHash index from the content nodes on disk.
+    """
+    global _dedup
+    index: Dict[str, Any] = {"exact": {}, "simhash": {}, "bands": {}}
+    for node in iter_content_nodes():
+        _dedup_apply(index, _dedup_put(node["id"], node.get("content", ""), node.get("title")))
+    ensure_dirs()
+    serialization.write(DEDUP_PATH, index)
+    DEDUP_LOG_PATH.unlink(missing_ok=True)
+    _dedup_log["lines"] = 0
+    _dedup = index
+    return index
+
+
+def _load_dedup() -> Dict[str, Any]:
+    global _dedup
+    if _dedup is None:
+        if DEDUP_PATH.exists():
+            index = serialization.read(DEDUP_PATH)
+            lines = 0
+            if DEDUP_LOG_PATH.exists():
+                with DEDUP_LOG_PATH.open("rb") as f:
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break  # torn by a crash mid-append
+                        _dedup_apply(index, serialization.loads(line))
+                        lines += 1
+            _dedup_log["lines"] = lines
+            _dedup = index
+        else:
+            rebuild_dedup_index()
+    return _dedup
+
+
+def invalidate_caches():
+    """
+    Forget everything cached from disk (counters, dedup index, edge sets, pack
+    index) after the library files were replaced underneath this process.
+    """
+    with _write_lock:
+        _drop_caches()
+
+
+def _drop_caches():
+    global _counters, _dedup
+    with _edge_lock:
+        _counters = None
+        _dedup = None
+        _edge_sets.clear()
+        _edge_sizes.clear()
+        _packs.close()
+    if _wal is not None:
+        _wal.close()  # another process may have started a new segment
+
+
+def warm():
+    """Load storage-side indexes and counters into memory ahead of the first write."""
+    _load_dedup()
+    _load_counters()
+
+
+def find_duplicate(content: str, title: Optional[str] = None, max_distance: int = 0) -> Optional[str]:
+    """
+    Return the ID of existing content with the same normalized title and body.
+
+    With max_distance > 0, also match content whose SimHash differs by at most
+    that many bits (title ignored). Band lookup guarantees recall up to 3 bits.
+    """
+    index = _load_dedup()
+    cid = index["exact"].get(content_hash(content, title))
+    if cid and node_exists("content", cid):
+        return cid
+    if max_distance <= 0:
+        return None
+    fp = simhash(content)
+    best = None
+    for key in simhash_bands(fp):
+        for cand in index["bands"].get(key, []):
+            dist = hamming(fp, index["simhash"].get(cand, 0))
+            if dist <= max_distance and (best is None or dist < best[0]):
+                if node_exists("content", cand):
+                    best = (dist, cand)
+    return best[1] if best else None
+
+
+@_mutation
 def add_content(
     content: str,
     title: Optional[str] = None,
@@ -47,10 +1121,33 @@ def add_content(
     style: Optional[List[str]] = None,
     tags: Optional[List[str]] = None,
     authors: Optional[List[str]] = None,
+    on_duplicate: str = "return",
+    near_duplicate_bits: Optional[int] = None,
 ) -> str:
-    cid = str(uuid.uuid4())
+    """
+    Create a content node, link its tags/authors and index it.
+
+    Content is deduplicated on its normalized title + body: on_duplicate="return"
+    (default) returns the existing ID after adding the given tags/authors it
+    lacks to it, "reject" raises DuplicateContentError and
+    "allow" always creates a new node. near_duplicate_bits enables SimHash
+    matching; it defaults to MCP_NEAR_DUP_BITS for snippet/tweet styles.
+    """
+    if on_duplicate not in DUPLICATE_MODES:
+        raise ValueError(f"Invalid on_duplicate '{on_duplicate}'. Allowed: {sorted(DUPLICATE_MODES)}")
     if style:
         style = [ensure_style(s) for s in style]
+    dedup = _load_dedup()
+    if on_duplicate != "allow":
+        if near_duplicate_bits is None:
+            near_duplicate_bits = NEAR_DUP_BITS if NEAR_DUP_STYLES & set(style or []) else 0
+        existing = find_duplicate(content, title, near_duplicate_bits)
+        if existing:
+            if on_duplicate == "reject":
+                raise DuplicateContentError(existing)
+            _link_duplicate(existing, tags or [], authors or [])
+            return existing
+    cid = str(uuid.uuid4())
     node = ContentNode(
         id=cid,
         title=title,
@@ -60,46 +1157,150 @@ def add_content(
         authors=authors or [],
         content=content,
     )
-    path = NODE_DIRS["content"] / f"{cid}.json"
-    _write_json(path, asdict(node))
+    data = node.to_dict()
+    _write_node("content", _encode_node(data))
+    _bump("nodes", "content")
     for t in node.tags:
         link_tag(cid, t)
     for a in node.authors:
         link_author(cid, a)
+    _save_dedup(dedup, [_dedup_put(cid, node.content, node.title)])
     try:
-        from search import index_document
-
-        index_document(cid, asdict(node))
+        _index_content(cid, data)
     except Exception:
         pass
     return cid
 
 
+def _link_duplicate(content_id: str, tags: List[str], authors: List[str]):
+    """Add the tags/authors a duplicate add_content() call brought to the existing node."""
+    node = read_node("content", content_id)
+    if node is None:
+        return
+    new_tags = [t for t in tags if t not in node.get("tags", [])]
+    new_authors = [a for a in authors if a not in node.get("authors", [])]
+    if new_tags or new_authors:
+        update_content(
+            content_id,
+            tags=node.get("tags", []) + new_tags if new_tags else None,
+            authors=node.get("authors", []) + new_authors if new_authors else None,
+        )
+
+
+@_mutation
+def update_content(
+    content_id: str,
+    content: Optional[str] = None,
+    title: Optional[str] = None,
+    date: Optional[str] = None,
+    style: Optional[List[str]] = None,
+    tags: Optional[List[str]] = None,
+    authors: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Update fields of a content node in place and reindex it incrementally.
+
+    Fields left as None are kept. New tags/authors are linked; edges of tags or
+    authors that were removed stay in the (append-only) edge logs.
+    """
+    old = read_node("content", content_id)
+    if old is None:
+        raise FileNotFoundError(content_id)
+    changes: Dict[str, Any] = {}
+    if style is not None:
+        changes["style"] = [ensure_style(s) for s in style]
+    for field, value in (("content", content), ("title", title), ("date", date), ("tags", tags), ("authors", authors)):
+        if value is not None:
+            changes[field] = value
+    node = ContentNode.from_dict({**old, **changes}).to_dict()
+    _write_node("content", _encode_node(node))
+    for t in set(node.get("tags", [])) - set(old.get("tags", [])):
+        link_tag(content_id, t)
+    for a in set(node.get("authors", [])) - set(old.get("authors", [])):
+        link_author(content_id, a)
+    if node.get("content") != old.get("content") or node.get("title") != old.get("title"):
+        _save_dedup(
+            _load_dedup(),
+            [
+                _dedup_del(content_id, old.get("content", ""), old.get("title")),
+                _dedup_put(content_id, node.get("content", ""), node.get("title")),
+            ],
+        )
+    _index_content(content_id, node, previous=old)
+    return node
+
+
+@_mutation
+def delete_content(content_id: str):
+    """
+    Delete a content node and tombstone it in the search indexes.
+
+    Edges referencing the node are left in the edge logs until compact_edges()
+    drops them as dangling.
+    """
+    old = read_node("content", content_id)
+    if old is None:
+        raise FileNotFoundError(content_id)
+    _remove_node("content", content_id)
+    _bump("nodes", "content", -1)
+    _save_dedup(_load_dedup(), [_dedup_del(content_id, old.get("content", ""), old.get("title"))])
+    _index_content(content_id, None)
+
+
 def get_node(node_id: str) -> Dict[str, Any]:
-    for base in NODE_DIRS.values():
-        p = base / f"{node_id}.json"
-        if p.exists():
-            return json.loads(p.read_text(encoding="utf-8"))
+    for kind in NODE_DIRS:
+        node = read_node(kind, node_id)
+        if node is not None:
+            return node
     raise FileNotFoundError(node_id)
 
 
+def _read_content_file(content_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        return read_node("content", content_id)
+    except ValueError:
+        return None
+
+
+def get_content_nodes(content_ids: Iterable[str], batch_size: int = 32) -> Iterator[Dict[str, Any]]:
+    """
+    Yield content nodes for content_ids, in order, skipping missing IDs.
+
+    Unlike get_node this only looks at content nodes, and each batch is read
+    concurrently while the caller consumes the previous one.
+    """
+    ids = list(content_ids)
+    with ThreadPoolExecutor(max_workers=min(8, batch_size)) as pool:
+        pending = pool.map(_read_content_file, ids[:batch_size])
+        for start in range(batch_size, len(ids) + batch_size, batch_size):
+            current = pending
+            if start < len(ids):
+                pending = pool.map(_read_content_file, ids[start : start + batch_size])
+            for node in current:
+                if node is not None:
+                    yield node
+
+
+@_mutation
 def add_tag(name: str) -> str:
     slug = slugify(name)
-    path = NODE_DIRS["tag"] / f"{slug}.json"
-    if not path.exists():
-        _write_json(path, asdict(TagNode(id=slug, name=name)))
+    if not node_exists("tag", slug):
+        _write_node("tag", TagNode(id=slug, name=name).to_dict())
+        _bump("nodes", "tag")
     return slug
 
 
+@_mutation
 def add_style(name: str) -> str:
     ensure_style(name)
     slug = slugify(name)
-    path = NODE_DIRS["style"] / f"{slug}.json"
-    if not path.exists():
-        _write_json(path, asdict(StyleNode(id=slug, name=name)))
+    if not node_exists("style", slug):
+        _write_node("style", StyleNode(id=slug, name=name).to_dict())
+        _bump("nodes", "style")
     return slug
 
 
+@_mutation
 def add_author(
     name: str,
     linkedin_username: str = "",
@@ -108,8 +1309,7 @@ def add_author(
     reddit_username: str = "",
 ) -> str:
     slug = slugify(name)
-    path = NODE_DIRS["author"] / f"{slug}.json"
-    if not path.exists():
+    if not node_exists("author", slug):
         node = AuthorNode(
             id=slug,
             name=name,
@@ -118,28 +1318,31 @@ def add_author(
             substack_username=substack_username,
             reddit_username=reddit_username,
         )
-        _write_json(path, asdict(node))
+        _write_node("author", node.to_dict())
+        _bump("nodes", "author")
     return slug
 
 
+@_mutation
 def add_link(url: str, title: Optional[str] = None, description: Optional[str] = None) -> str:
     """
     Create or return a link node by URL.
     Uses URL as the unique identifier (slugified).
     """
     slug = slugify(url)
-    path = NODE_DIRS["link"] / f"{slug}.json"
-    if not path.exists():
+    if not node_exists("link", slug):
         node = LinkNode(
             id=slug,
             url=url,
             title=title,
             description=description,
         )
-        _write_json(path, asdict(node))
+        _write_node("link", node.to_dict())
+        _bump("nodes", "link")
     return slug
 
 
+@_mutation
 def link_relates(src_content_id: str, relation_type: str, dst_content_id: str):
     assert relation_type in {"snippet_of", "related_to"}
     _append_jsonl(
@@ -153,6 +1356,36 @@ def link_relates(src_content_id: str, relation_type: str, dst_content_id: str):
     )
 
 
+@_mutation
+def link_relates_many(edges: Iterable[Tuple[str, str, str]]):
+    """
+    Append many (src, relation_type, dst) relates edges with a single write.
+    """
+    date = _iso_now()
+    records = []
+    for src, relation_type, dst in edges:
+        assert relation_type in {"snippet_of", "related_to"}
+        records.append({"src": src, "type": relation_type, "dst": dst, "date": date})
+    _append_edges("relates", records)
+
+
+def apply_edges(name: str, records: Iterable[Dict[str, Any]]) -> int:
+    """append_edges() without the mutation checks, for callers that hold writer() (replicas)."""
+    return _append_edges(name, records)
+
+
+@_mutation
+def append_edges(name: str, records: Iterable[Dict[str, Any]]) -> int:
+    """
+    Append many edge records to edges/<name>.jsonl with one write (bulk
+    import), skipping edges already present. Returns the number appended.
+    """
+    if name not in EDGE_KEYS:
+        raise ValueError(f"Unknown edge log '{name}'. Allowed: {sorted(EDGE_KEYS)}")
+    return _append_edges(name, records)
+
+
+@_mutation
 def link_tag(content_id: str, tag_name_or_slug: str):
     slug = slugify(tag_name_or_slug)
     add_tag(slug)
@@ -167,6 +1400,7 @@ def link_tag(content_id: str, tag_name_or_slug: str):
     )
 
 
+@_mutation
 def link_author(content_id: str, author_name_or_slug: str):
     slug = slugify(author_name_or_slug)
     add_author(slug)
@@ -181,6 +1415,7 @@ def link_author(content_id: str, author_name_or_slug: str):
     )
 
 
+@_mutation
 def link_url(content_id: str, url: str, title: Optional[str] = None, description: Optional[str] = None):
     """
     Link a content node to a URL by creating/fetching a link node
@@ -197,6 +1432,125 @@ def link_url(content_id: str, url: str, title: Optional[str] = None, description
         },
     )
 
+def _compact_lines(
+    name: str,
+    lines: List[bytes],
+    seen: set,
+    alive: Optional[Callable[[str, Any], bool]],
+    deferred: Optional[List[bytes]] = None,
+) -> Tuple[List[bytes], int, int]:
+    """
+    Keep the first occurrence of each edge in lines. Edges with an endpoint
+    that alive() rejects are dropped as dangling, or added to deferred to be
+    checked again under the write lock.
+    """
+    kept, duplicates, dangling = [], 0, 0
+    for line in lines:
+        try:
+            obj = serialization.loads(line)
+        except ValueError:
+            continue
+        key = _edge_key(name, obj)
+        if key in seen:
+            duplicates += 1
+            continue
+        if alive is not None and not all(alive(kind, obj.get(field)) for field, kind in EDGE_ENDPOINTS[name]):
+            if deferred is not None:
+                deferred.append(line)
+            else:
+                dangling += 1
+            continue
+        seen.add(key)
+        kept.append(serialization.dumps_line(obj))
+    return kept, duplicates, dangling
+
+
+def compact_edges(drop_dangling: bool = True) -> Dict[str, Dict[str, int]]:
+    """
+    Rewrite each edge log without duplicate edges (first occurrence wins) and,
+    optionally, without edges whose endpoints no longer exist.
+
+    Safe to run while the server is serving: the bulk of each log is compacted
+    without holding the write lock; only the tail appended meanwhile is
+    processed under the lock before the log is atomically replaced. An edge
+    is only dropped as dangling if its endpoint is still missing under the
+    lock, so edges of nodes created during the compaction are kept.
+    """
+    _refuse_on_replica()
+    checkpoint()  # so a replay does not append edges dropped here again
+    snapshot = alive = None
+    if drop_dangling:
+        live = {kind: set(node_ids(kind)) for kind in NODE_DIRS}
+        snapshot = lambda kind, node_id: node_id in live[kind]
+        alive = lambda kind, node_id: node_id in live[kind] or node_exists(kind, node_id)
+    report: Dict[str, Dict[str, int]] = {}
+    for path in sorted(EDGE_DIR.glob("*.jsonl")):
+        name = path.stem
+        if name not in EDGE_KEYS:
+            continue
+        with path.open("rb") as f:
+            head = f.read()
+        head = head[: head.rfind(b"\n") + 1]  # an append may be in progress
+        seen: set = set()
+        lines = head.splitlines()
+        suspects: List[bytes] = []
+        kept, duplicates, dangling = _compact_lines(name, lines, seen, snapshot, suspects)
+        with writer(), _edge_lock:
+            with path.open("rb") as f:
+                f.seek(len(head))
+                tail = f.read().splitlines()
+            more, d2, x2 = _compact_lines(name, suspects + tail, seen, alive)
+            kept += more
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            with tmp.open("wb") as f:
+                f.write(b"".join(kept))
+                f.flush()
+                os.fsync(f.fileno())
+            tmp.replace(path)
+            _edge_sets[name] = seen
+            _edge_sizes[name] = sum(map(len, kept))
+            counters = _load_counters()
+            counters["edges"][name] = len(kept)
+            serialization.write(COUNTERS_PATH, counters)
+        report[name] = {
+            "before": len(lines) + len(tail),
+            "after": len(kept),
+            "duplicates": duplicates + d2,
+            "dangling": dangling + x2,
+        }
+    return report
+
+
+def refresh_edges(names: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Pick up edge logs changed outside this process (appended to or replaced by
+    hand, by another tool or by a sync): their dedup sets are dropped and their
+    edge counters recounted. Returns the names of the logs that had changed.
+    """
+    refreshed = []
+    with writer(), _edge_lock:
+        for name in names if names is not None else list(EDGE_KEYS):
+            path = EDGE_DIR / f"{name}.jsonl"
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                size = 0
+            if name in _edge_sizes and _edge_sizes[name] == size:
+                continue
+            _edge_sets.pop(name, None)
+            _edge_sizes[name] = size
+            count = 0
+            if size:
+                with path.open("rb") as f:
+                    count = sum(1 for line in f if line.strip())
+            counters = _load_counters()
+            if counters["edges"].get(name, 0) != count:
+                counters["edges"][name] = count
+                serialization.write(COUNTERS_PATH, counters)
+            refreshed.append(name)
+    return refreshed
+
+
 def get_content_links(content_id: str) -> List[Dict[str, Any]]:
     """
     Retrieve all link nodes associated with a content node.
@@ -205,14 +1559,14 @@ def get_content_links(content_id: str) -> List[Dict[str, Any]]:
     links_path = EDGE_DIR / "links.jsonl"
     link_nodes = []
     if links_path.exists():
-        for line in links_path.read_text(encoding="utf-8").splitlines():
+        for line in links_path.read_bytes().splitlines():
             try:
-                edge = json.loads(line)
+                edge = serialization.loads(line)
                 if edge.get("content") == content_id:
                     link_slug = edge.get("link")
-                    link_path = NODE_DIRS["link"] / f"{link_slug}.json"
-                    if link_path.exists():
-                        link_nodes.append(json.loads(link_path.read_text(encoding="utf-8")))
+                    link = read_node("link", link_slug)
+                    if link is not None:
+                        link_nodes.append(link)
             except Exception:
                 continue
     return link_nodes
@@ -220,17 +1574,15 @@ def get_content_links(content_id: str) -> List[Dict[str, Any]]:
 
 def get_all_content_count() -> int:
     """
-    Get the total count of stored content items.
+    Get the total count of stored content items (from the maintained counters,
+    reloaded first if another process wrote to the library).
     """
     try:
-        return len(list(NODE_DIRS["content"].glob("*.json")))
+        refresh()
+        return _load_counters()["nodes"].get("content", 0)
     except Exception:
         return 0
 
 
 def iter_content_nodes():
-    for p in NODE_DIRS["content"].glob("*.json"):
-        try:
-            yield json.loads(p.read_text(encoding="utf-8"))
-        except Exception:
-            continue
+    return iter_nodes("content")
@@ -0,0 +1,47 @@
+"""Tests for the search analyzers."""
+
+import uuid
+
+import pytest
+
+import analysis
+import search
+import serialization
+from analysis import analyze_query, light_stem
+from storage import add_content
+
+
+def test_analyzer_stems_and_drops_stopwords():
+    assert analyze_query("The Studies of running foxes") == ["study", "run", "fox"]
+    assert [light_stem(w) for w in ("tasks", "jumped", "hopping", "boss", "status", "matches")] == [
+        "task", "jump", "hop", "boss", "status", "match"
+    ]
+    assert analyze_query("Ｃafé") == ["café"]
+
+
+def test_inflected_query_matches_and_config_mismatch_reindexes(monkeypatch):
+    marker = f"zq{uuid.uuid4().hex[:8]}"
+    cid = add_content(content=f"Notes about indexing libraries {marker}")
+    assert search.search("indexed library", {})["items"][0]["id"] == cid
+    assert serialization.read(search.INFO_PATH)["analyzer"] == analysis.config_signature()
+
+    monkeypatch.setattr(analysis, "ANALYZER_VERSION", analysis.ANALYZER_VERSION + 1)
+    monkeypatch.setattr(search, "_analyzer_checked", False)
+    calls = []
+    monkeypatch.setattr(search, "_rebuild_index", lambda: calls.append(1))
+    search._load_indexes()
+    assert calls == [1]
+
+
+def test_titles_and_queries_share_one_analyzer(monkeypatch):
+    node = {"title": "The Running Foxes", "content": "running foxes"}
+    assert analysis.analyze_document(node) == analyze_query("running foxes") * 2
+    marker = f"zt{uuid.uuid4().hex[:8]}"
+    cid = add_content(title=f"Running Foxes {marker}", content="Body text without the title words")
+    assert search.search(f"run fox {marker}", {})["items"][0]["id"] == cid
+
+    monkeypatch.setenv("MCP_ANALYZERS", '{"stemmer": "none"}')
+    assert analysis._load_config() == {**analysis.DEFAULT_CONFIG, "stemmer": "none"}
+    monkeypatch.setenv("MCP_ANALYZERS", '{"title": {"stemmer": "none"}}')
+    with pytest.raises(ValueError):
+        analysis._load_config()  # one index, so no per-field settings
@@ -0,0 +1,63 @@
+"""Tests for compressed content body storage, run on a library of their own."""
+
+import json
+import os
+import subprocess
+import sys
+
+ROUND_TRIP = """
+import json, sys, storage
+from search import search
+from storage import NODE_DIRS, add_content, get_node, train_body_dictionary, recompress_content
+
+def stored(cid):
+    return json.loads((NODE_DIRS["content"] / f"{cid}.json").read_text())
+
+def encoding():
+    dict_id = storage._current_dict_id()  # what new bodies are compressed with
+    return f"zlib:{dict_id}" if dict_id else "zlib"
+
+body = "The quick brown fox jumps over the lazy dog. " * 40 + sys.argv[1]
+expected = encoding()
+cid = add_content(content=body, title="Compressed", tags=["zip"])
+add_content(content="The lazy dog sleeps while the quick brown fox jumps. " * 20)
+raw = stored(cid)
+result = {
+    "raw": {k: raw.get(k) for k in ("content", "content_encoding", "title", "tags")},
+    "expected": expected,
+    "round_trip": get_node(cid)["content"] == body,
+    "found": search(None, {"content": "lazy dog", "tag": ["zip"]})["items"][0]["content"] == body,
+}
+
+result["dict_id"] = train_body_dictionary()
+result["recompressed"] = recompress_content()["nodes"]
+result["encoding_after"] = stored(cid)["content_encoding"]
+result["expected_after"] = encoding()
+result["round_trip_after"] = get_node(cid)["content"] == body
+
+storage.BODY_COMPRESSION = "none"
+recompress_content()
+result["plain"] = stored(cid).get("content") == body
+print(json.dumps(result))
+"""
+
+
+def test_compressed_bodies_round_trip(tmp_path):
+    env = {**os.environ, "MCP_SNIPPETS_ROOT": str(tmp_path), "MCP_BODY_COMPRESSION": "zlib", "MCP_NODE_STORE": "loose"}
+    proc = subprocess.run(
+        [sys.executable, "-c", ROUND_TRIP, "zcompressed"], env=env, capture_output=True, text=True, timeout=60
+    )
+    assert proc.returncode == 0, proc.stderr
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    raw = result["raw"]
+    assert raw["content"] is None and raw["content_encoding"] == result["expected"]
+    assert raw["title"] == "Compressed" and raw["tags"] == ["zip"]
+    assert result["round_trip"] and result["found"]
+
+    assert result["dict_id"]  # the two bodies share phrases
+    assert result["recompressed"] == 2
+    assert result["expected_after"] == f"zlib:{result['dict_id']}"
+    assert result["encoding_after"] == result["expected_after"]
+    assert result["round_trip_after"]
+    assert result["plain"]
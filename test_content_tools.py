@@ -0,0 +1,28 @@
+"""Tests for combining snippets into longer pieces."""
+
+import json
+import uuid
+
+from content_tools import combine_related_snippets
+from storage import add_content, get_node, EDGE_DIR
+
+
+def test_combine_by_filter_streams_sources_in_date_order():
+    tag = f"book-{uuid.uuid4().hex[:8]}"
+    first = add_content(content="Chapter one opens.", date="2025-01-01T00:00:00+00:00", tags=[tag])
+    second = add_content(content="Chapter two follows.", date="2025-01-02T00:00:00+00:00", tags=[tag])
+
+    combined = combine_related_snippets(None, "Book", filters={"tag": [tag]}, separator="\n")
+    node = get_node(combined)
+    assert node["content"] == "Chapter two follows.\nChapter one opens."
+    assert node["tags"] == [tag]
+
+    edges = [json.loads(line) for line in (EDGE_DIR / "relates.jsonl").read_text().splitlines()]
+    linked = {e["src"] for e in edges if e["dst"] == combined and e["type"] == "related_to"}
+    assert linked == {first, second}
+
+
+def test_combine_skips_missing_ids():
+    a = add_content(content=f"Alpha {uuid.uuid4()}")
+    combined = combine_related_snippets([a, "missing-id"], "Only alpha")
+    assert get_node(combined)["content"] == get_node(a)["content"]
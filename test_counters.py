@@ -0,0 +1,22 @@
+"""Tests for maintained node/edge counters."""
+
+import uuid
+
+import storage
+from storage import add_content, link_relates, counters, recount, get_all_content_count
+
+
+def test_counters_track_writes_and_match_recount():
+    before = counters()
+    tag = f"count-{uuid.uuid4().hex[:8]}"
+    cid = add_content(content=f"Counted {uuid.uuid4()}", tags=[tag])
+    add_content(content=f"Counted {uuid.uuid4()}", tags=[tag])
+    link_relates(cid, "related_to", cid)
+
+    after = counters()
+    assert after["nodes"]["content"] == before["nodes"].get("content", 0) + 2
+    assert after["nodes"]["tag"] == before["nodes"].get("tag", 0) + 1
+    assert after["edges"]["tags"] == before["edges"].get("tags", 0) + 2
+    assert after["edges"]["relates"] == before["edges"].get("relates", 0) + 1
+    assert get_all_content_count() == after["nodes"]["content"]
+    assert recount() == storage._counters == after
@@ -0,0 +1,107 @@
+"""Tests for content-addressed deduplication on ingest."""
+
+import uuid
+
+import pytest
+
+from search import search
+import storage
+from storage import DEDUP_LOG_PATH, DEDUP_PATH, add_content, delete_content, find_duplicate, get_node, DuplicateContentError
+from similarity import simhash, hamming
+
+
+def test_duplicate_add_returns_existing_id():
+    body = f"Ship small changes often. {uuid.uuid4()}"
+    first = add_content(content=body, title="Shipping", style=["snippet"])
+    again = add_content(content="  ship small changes OFTEN. " + body.split(". ")[1], title="shipping")
+    assert again == first
+    assert find_duplicate(body, "Shipping") == first
+
+
+def test_duplicate_add_links_new_tags_and_authors():
+    body = f"Name things for the reader. {uuid.uuid4()}"
+    first = add_content(content=body, tags=["naming"], authors=["ann"])
+    assert add_content(content=body, tags=["naming", "style"], authors=["bob"]) == first
+    node = get_node(first)
+    assert node["tags"] == ["naming", "style"]
+    assert node["authors"] == ["ann", "bob"]
+    assert [n["id"] for n in search(None, {"tag": ["style"], "author": ["bob"]})["items"]] == [first]
+
+
+def test_duplicate_reject_and_allow():
+    body = f"Write the test first. {uuid.uuid4()}"
+    first = add_content(content=body, title="TDD")
+    with pytest.raises(DuplicateContentError) as exc:
+        add_content(content=body, title="TDD", on_duplicate="reject")
+    assert exc.value.existing_id == first
+    assert add_content(content=body, title="TDD", on_duplicate="allow") != first
+
+
+def test_near_duplicate_snippets():
+    body = (
+        "Great products come from listening closely to users, shipping quickly, "
+        "measuring what happens and then iterating on the parts that actually matter to them"
+    )
+    first = add_content(content=body, style=["snippet"])
+    variant = body + "."
+    assert hamming(simhash(body), simhash(variant + " today")) <= 3
+    assert find_duplicate(variant + " today") is None
+    assert add_content(content=variant + " today", style=["snippet"], near_duplicate_bits=3) == first
+
+
+def test_find_similar_uses_lsh_buckets():
+    from search import find_similar
+
+    base = (
+        "Retrieval quality depends on chunking strategy, embedding choice and the way "
+        "results are reranked before they reach the model context window"
+    )
+    a = add_content(content=base + " in production systems.", style=["snippet"])
+    b = add_content(content=base + " in hobby projects.", style=["snippet"])
+    c = add_content(content="Bake the bread at a high temperature for a crisp crust.", style=["snippet"])
+    similar = find_similar(a, k=5)
+    ids = [item["id"] for item in similar]
+    assert b in ids
+    assert c not in ids
+    assert similar[0]["similarity"] > 0.5
+
+
+def test_minhash_estimates_jaccard(monkeypatch):
+    import random
+
+    import similarity
+
+    rnd = random.Random(7)
+    words = [f"w{rnd.randint(0, 300)}" for _ in range(300)]
+    edited = list(words)
+    for i in rnd.sample(range(300), 30):
+        edited[i] = "edit"
+    a, b = " ".join(words), " ".join(edited)
+    sa, sb = similarity.shingles(a), similarity.shingles(b)
+    estimate = similarity.signature_similarity(similarity.minhash(a), similarity.minhash(b))
+    assert abs(estimate - len(sa & sb) / len(sa | sb)) < 0.15
+
+    vectorized = similarity.minhash(a)
+    monkeypatch.setattr(similarity, "_numpy", False)  # the pure Python fallback
+    assert similarity.minhash(a) == vectorized
+
+
+def test_ingest_appends_to_the_dedup_log():
+    storage._load_dedup()
+    snapshot = DEDUP_PATH.stat().st_mtime_ns
+    lines = storage._dedup_log["lines"]
+    body = f"Append, do not rewrite. {uuid.uuid4()}"
+    cid = add_content(content=body)
+    gone = add_content(content=f"Deleted again. {uuid.uuid4()}")
+    delete_content(gone)
+    assert DEDUP_PATH.stat().st_mtime_ns == snapshot  # only the log grew
+    assert storage._dedup_log["lines"] == lines + 3
+
+    storage.invalidate_caches()  # reloaded from the snapshot and the log
+    assert find_duplicate(body) == cid
+    assert gone not in storage._load_dedup()["simhash"]
+
+    storage._flush_dedup()
+    assert not DEDUP_LOG_PATH.exists()
+    storage.invalidate_caches()
+    assert find_duplicate(body) == cid
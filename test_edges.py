@@ -0,0 +1,123 @@
+"""Tests for edge write-time dedup and edge log compaction."""
+
+import json
+import os
+import subprocess
+import sys
+import uuid
+
+from storage import add_content, link_tag, link_relates, EDGE_DIR
+
+COMPACT = """
+import json, storage
+from storage import add_content, compact_edges, counters, EDGE_DIR
+cid = add_content(content="Compaction source")
+other = add_content(content="Compaction target")
+line = json.dumps({"src": cid, "type": "related_to", "dst": other, "date": "2025-01-01"}) + "\\n"
+dangling = json.dumps({"src": cid, "type": "related_to", "dst": "gone", "date": "2025-01-01"}) + "\\n"
+with (EDGE_DIR / "relates.jsonl").open("a") as f:
+    f.write(line + line + dangling)  # written behind storage's back
+report = compact_edges()
+storage._edge_sets.clear()
+print(json.dumps({
+    "cid": cid,
+    "report": report,
+    "relates": [json.loads(l) for l in (EDGE_DIR / "relates.jsonl").read_text().splitlines()],
+    "counted": counters()["edges"]["relates"],
+    "reloaded": sorted(storage._edge_set("relates")),
+}))
+"""
+
+
+def _edges(name):
+    path = EDGE_DIR / f"{name}.jsonl"
+    return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+
+def test_relinking_does_not_grow_edge_logs():
+    tag = f"dedup-{uuid.uuid4().hex[:8]}"
+    cid = add_content(content=f"Edge dedup {uuid.uuid4()}", tags=[tag])
+    other = add_content(content=f"Edge dedup {uuid.uuid4()}")
+    before = len(_edges("tags"))
+    link_tag(cid, tag)
+    link_tag(cid, tag.upper())
+    link_relates(cid, "related_to", other)
+    link_relates(cid, "related_to", other)
+    assert len(_edges("tags")) == before
+    assert sum(1 for e in _edges("relates") if e["src"] == cid and e["dst"] == other) == 1
+
+CONCURRENT = """
+import json, storage
+from storage import add_content, compact_edges, counters, EDGE_DIR
+anchor = add_content(content="Compaction anchor")
+created = {}
+node_ids, compact_lines = storage.node_ids, storage._compact_lines
+
+def node_ids_then_write(kind):
+    ids = node_ids(kind)
+    if kind == "link" and "head" not in created:  # the live-node snapshot is taken; a writer gets in
+        created["head"] = None
+        created["head"] = add_content(content="Created after the snapshot", tags=["fresh"])
+        storage.link_relates(created["head"], "related_to", anchor)
+    return ids
+
+def compact_lines_then_write(name, lines, *args):
+    result = compact_lines(name, lines, *args)
+    if name == "relates" and "tail" not in created:  # the head of the log is compacted; a writer gets in
+        created["tail"] = None
+        created["tail"] = add_content(content="Created during compaction", tags=["fresh"])
+        storage.link_relates(created["tail"], "related_to", anchor)
+    return result
+
+storage.node_ids, storage._compact_lines = node_ids_then_write, compact_lines_then_write
+report = compact_edges()
+print(json.dumps({
+    "created": created,
+    "report": report,
+    "relates": [json.loads(l) for l in (EDGE_DIR / "relates.jsonl").read_text().splitlines()],
+    "tags": [json.loads(l) for l in (EDGE_DIR / "tags.jsonl").read_text().splitlines()],
+}))
+"""
+
+
+def _run(tmp_path, script, **env):
+    env = {**os.environ, "MCP_SNIPPETS_ROOT": str(tmp_path), **env}
+    proc = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def test_compaction_removes_duplicates_and_dangling_edges(tmp_path):
+    result = _run(tmp_path, COMPACT)
+
+    cid, relates = result["cid"], result["relates"]
+    assert result["report"]["relates"]["duplicates"] == 1
+    assert result["report"]["relates"]["dangling"] == 1
+    assert sum(1 for e in relates if e["src"] == cid) == 1
+    assert not any(e["dst"] == "gone" for e in relates)
+    assert result["counted"] == len(relates)
+    assert result["reloaded"] == sorted([e["src"], e["type"], e["dst"]] for e in relates)
+
+
+def test_compaction_keeps_edges_of_nodes_created_meanwhile(tmp_path):
+    result = _run(tmp_path, CONCURRENT)
+    created = result["created"]
+    assert set(created) == {"head", "tail"}
+    for key in ("relates", "tags"):
+        assert result["report"][key]["dangling"] == 0
+    assert {e["src"] for e in result["relates"]} == set(created.values())
+    assert {e["content"] for e in result["tags"]} == set(created.values())
+
+
+def test_compaction_is_refused_on_a_replica(tmp_path):
+    (tmp_path / "primary").mkdir()
+    script = """
+import json, storage
+try:
+    storage.compact_edges()
+    refused = False
+except ValueError:
+    refused = True
+print(json.dumps(refused))
+"""
+    assert _run(tmp_path / "replica", script, MCP_REPLICA_OF=str(tmp_path / "primary")) is True
@@ -0,0 +1,87 @@
+"""Tests for the tool metrics and the /metrics endpoint."""
+
+import asyncio
+import inspect
+import re
+from types import SimpleNamespace
+
+import pytest
+from starlette.testclient import TestClient
+
+import metrics
+import server
+from metrics import TOOL_CALLS, TOOL_ERRORS, TOOL_LATENCY
+
+SAMPLE_RE = re.compile(
+    r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\.)*"(,[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\.)*")*\})? \S+$'
+)
+
+
+def _series(kind, name, tool):
+    return getattr(metrics, kind).get(name, {}).get((("tool", tool),))
+
+
+def test_instrument_counts_calls_errors_and_latency(monkeypatch):
+    clock = iter([0.0, 0.003, 1.0, 1.2, 2.0, 22.0])  # calls taking 3 ms, 200 ms and 20 s
+    monkeypatch.setattr(metrics, "time", SimpleNamespace(perf_counter=lambda: next(clock)))
+
+    @metrics.instrument("test_tool")
+    async def handler(fail=False):
+        if fail:
+            raise ValueError("boom")
+        return "ok"
+
+    assert asyncio.run(handler()) == "ok"
+    assert asyncio.run(handler()) == "ok"
+    with pytest.raises(ValueError):
+        asyncio.run(handler(fail=True))
+
+    assert _series("_counters", TOOL_CALLS, "test_tool") == 3
+    assert _series("_counters", TOOL_ERRORS, "test_tool") == 1
+    hist = _series("_histograms", TOOL_LATENCY, "test_tool")
+    assert hist.count == 3 and hist.sum == pytest.approx(20.203)
+    assert hist.counts[metrics.DEFAULT_BUCKETS.index(0.005)] == 1
+    assert hist.counts[metrics.DEFAULT_BUCKETS.index(0.25)] == 1
+    assert sum(hist.counts) == 2  # 20 s only counts in +Inf
+
+
+def test_metrics_endpoint_uses_prometheus_text_format():
+    from app import app
+
+    asyncio.run(server.mcp.call_tool("tool_add_tag", {"name": "metrics-tag"}))
+    metrics.inc(TOOL_CALLS, tool='odd "name"\n')
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    text = response.text
+    assert text.endswith("\n")
+    typed = {}
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            continue
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            typed[name] = kind
+            continue
+        assert SAMPLE_RE.match(line), line
+        float(line.rsplit(" ", 1)[1])
+    assert typed[TOOL_CALLS] == "counter" and typed[TOOL_LATENCY] == "histogram"
+    assert 'mcp_tool_calls_total{tool="tool_add_tag"}' in text
+    assert 'tool="odd \\"name\\"\\n"' in text
+
+    label = '{tool="tool_add_tag",le="'
+    buckets = [line for line in text.splitlines() if line.startswith(TOOL_LATENCY + "_bucket" + label)]
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert buckets[-1].startswith(f'{TOOL_LATENCY}_bucket{label}+Inf"}}')
+    assert counts == sorted(counts)  # cumulative
+    assert f'{TOOL_LATENCY}_count{{tool="tool_add_tag"}} {counts[-1]}' in text
+
+
+def test_wrapped_tools_keep_their_parameter_schema():
+    tools = {t.name: t for t in asyncio.run(server.mcp.list_tools())}
+    schema = tools["tool_add_content"].inputSchema
+    assert list(schema["properties"]) == list(inspect.signature(server.tool_add_content).parameters)
+    assert schema["required"] == ["content"]
+    assert schema["properties"]["on_duplicate"]["default"] == "return"
+    assert set(tools["tool_search"].inputSchema["properties"]) >= {"query", "filters"}
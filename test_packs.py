@@ -0,0 +1,89 @@
+"""Tests for packfile node storage."""
+
+import json
+import os
+import subprocess
+import sys
+
+from packs import PackStore
+
+LOOSE = """
+import storage
+print(storage.add_content(content="Written as a loose file", tags=["packed-tag"]))
+"""
+
+MIGRATE = """
+import json, storage
+from search import reindex, search
+from storage import NODE_DIRS, add_content, delete_content, get_node, node_exists, read_node, node_ids, update_content
+loose = node_ids("content")[0]
+packed = add_content(content="Appended to a segment")
+result = {"packed_file": (NODE_DIRS["content"] / f"{packed}.json").exists()}
+update_content(packed, title="Packed title")
+result["title"] = get_node(packed)["title"]
+reindex("full")
+result["migrated"] = storage.repack()["migrated"]
+result["loose_file"] = (NODE_DIRS["content"] / f"{loose}.json").exists()
+result["loose_read"] = read_node("content", loose)["id"] == loose
+result["tag"] = node_exists("tag", "packed-tag")
+result["changed"] = reindex("incremental")["changed"]
+result["found"] = search("Packed title", {})["items"][0]["id"] == packed
+delete_content(packed)
+result["deleted"] = read_node("content", packed) is None
+print(json.dumps(result))
+"""
+
+UNPACK = """
+import json, storage
+from storage import NODE_DIRS, node_exists, node_ids
+loose = node_ids("content")[0]
+records = storage.repack()["records"]
+print(json.dumps({
+    "records": records,
+    "loose_file": (NODE_DIRS["content"] / f"{loose}.json").exists(),
+    "tag": node_exists("tag", "packed-tag"),
+}))
+"""
+
+
+def _run(tmp_path, store, script) -> str:
+    env = {**os.environ, "MCP_SNIPPETS_ROOT": str(tmp_path), "MCP_NODE_STORE": store}
+    proc = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    return proc.stdout.strip().splitlines()[-1]
+
+
+def test_pack_store_rolls_over_repacks_and_recovers(tmp_path):
+    store = PackStore(tmp_path, segment_bytes=64)
+    for i in range(10):
+        store.put("tag", f"t{i}", json.dumps({"id": f"t{i}", "type": "tag", "name": f"tag {i}"}).encode())
+    store.put("tag", "t0", b'{"id":"t0","type":"tag","name":"renamed"}')
+    assert store.delete("tag", "t1") and not store.delete("tag", "t1")
+    assert store.stats()["segments"] > 1 and store.stats()["garbage_bytes"] > 0
+    assert json.loads(store.get("tag", "t0"))["name"] == "renamed"
+
+    stats = store.repack()
+    assert stats["records"] == 9 and stats["garbage_bytes"] == 0
+    store.put("tag", "t2", b'{"id":"t2","type":"tag","name":"after repack"}')
+
+    (tmp_path / "index.log").unlink()  # the index is rebuilt from the segments
+    reloaded = PackStore(tmp_path, segment_bytes=64)
+    assert sorted(reloaded.ids("tag")) == sorted(f"t{i}" for i in range(10) if i != 1)
+    assert json.loads(reloaded.get("tag", "t0"))["name"] == "renamed"
+    assert json.loads(reloaded.get("tag", "t2"))["name"] == "after repack"
+
+
+def test_pack_mode_migrates_loose_nodes(tmp_path):
+    _run(tmp_path, "loose", LOOSE)
+    result = json.loads(_run(tmp_path, "pack", MIGRATE))
+    assert not result["packed_file"]
+    assert result["title"] == "Packed title"
+    assert result["migrated"] == 2  # the loose content and tag nodes
+    assert not result["loose_file"] and result["loose_read"] and result["tag"]
+    assert result["changed"] == 0  # moved, not changed
+    assert result["found"]
+    assert result["deleted"]
+
+    result = json.loads(_run(tmp_path, "loose", UNPACK))  # back to loose files
+    assert result["records"] == 0
+    assert result["loose_file"] and result["tag"]
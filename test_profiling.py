@@ -0,0 +1,65 @@
+"""Tests for slow tool call profiling (MCP_PROFILE_SLOW_MS)."""
+
+import asyncio
+
+import profiling
+
+
+def _handlers():
+    @profiling.profile_slow("slow_tool")
+    async def slow(delay=0.03):
+        await asyncio.sleep(delay)
+        return "done"
+
+    @profiling.profile_slow("fast_tool")
+    async def fast():
+        return "done"
+
+    return slow, fast
+
+
+def test_slow_calls_are_captured_and_rotated(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(profiling, "SLOW_MS", 20.0)
+    monkeypatch.setattr(profiling, "KEEP", 3)
+    slow, fast = _handlers()
+
+    assert asyncio.run(fast()) == "done"
+    assert list(tmp_path.iterdir()) == []  # below the threshold
+
+    for _ in range(5):
+        assert asyncio.run(slow()) == "done"
+    sidecars = sorted(p.stem for p in tmp_path.glob("*.json"))
+    assert len(sidecars) == 3  # only the newest KEEP
+    assert {p.stem for p in tmp_path.iterdir()} == set(sidecars)  # with their .prof and .txt files
+    assert sorted(p.suffix for p in tmp_path.glob(sidecars[0] + ".*")) == [".json", ".prof", ".txt"]
+
+    profiles = profiling.list_profiles(limit=2)
+    assert [p["name"] for p in profiles] == sidecars[::-1][:2]  # newest first
+    first = profiles[0]
+    assert first["tool"] == "slow_tool" and first["mode"] == "cprofile"
+    assert first["elapsed_ms"] >= 20 and first["threshold_ms"] == 20.0
+    assert first["args"] == {}
+    assert first["directory"] == str(tmp_path)
+    assert "cumulative" in (tmp_path / f"{first['name']}.txt").read_text()
+
+
+def test_sampler_mode_writes_collapsed_stacks(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(profiling, "SLOW_MS", 20.0)
+    monkeypatch.setattr(profiling, "MODE", "sampler")
+    monkeypatch.setattr(profiling, "SAMPLE_INTERVAL", 0.002)
+    slow, _ = _handlers()
+
+    assert asyncio.run(slow(delay=0.1)) == "done"
+    (meta,) = profiling.list_profiles()
+    assert meta["mode"] == "sampler" and meta["args"] == {"delay": "0.1"}
+    folded = (tmp_path / f"{meta['name']}.folded").read_text().splitlines()
+    assert folded and all(line.rsplit(" ", 1)[1].isdigit() for line in folded)
+    assert "samples every 2 ms" in (tmp_path / f"{meta['name']}.txt").read_text()
+
+
+def test_disabled_profiling_returns_the_handler_unchanged(monkeypatch):
+    monkeypatch.setattr(profiling, "SLOW_MS", 0.0)
+    slow, _ = _handlers()
+    assert slow.__name__ == "slow" and not hasattr(slow, "__wrapped__")
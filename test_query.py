@@ -0,0 +1,65 @@
+"""Tests for the query language and planner."""
+
+import uuid
+
+from query import Clause, parse
+from search import search
+from storage import add_content
+
+
+def test_parse_fielded_query():
+    parsed = parse('title:foo tag:ai -style:tweet author:"jane doe" "exact phrase" -draft ranked http://x.io')
+    assert parsed.text == "exact phrase ranked http://x.io"
+    assert parsed.clauses == [
+        Clause("title", ("foo",)),
+        Clause("tag", ("ai",)),
+        Clause("style", ("tweet",), True),
+        Clause("author", ("jane doe",)),
+        Clause("phrase", ("exact phrase",)),
+        Clause("term", ("draft",), True),
+    ]
+
+
+def test_planned_search_with_explain():
+    tag = f"q-{uuid.uuid4().hex[:8]}"
+    keep = add_content(content="Prompt engineering patterns that work", tags=[tag], style=["blog"])
+    add_content(content="Prompt engineering in a tweet", tags=[tag], style=["tweet"])
+    add_content(content="Engineering the prompt differently", tags=[tag], style=["blog"])
+    add_content(content="Prompt engineering, but a draft", tags=[tag], style=["blog"])
+    for i in range(4):  # the style filter matches more than the tag
+        add_content(content=f"Untagged post {i} {tag}-other", style=["blog"])
+
+    res = search(f'tag:{tag} -style:tweet "prompt engineering" -draft', {"style": ["blog", "tweet"]}, explain=True)
+    assert [n["id"] for n in res["items"]] == [keep]
+    ops = [step["op"] for step in res["plan"]]
+    assert ops.index("tag") < ops.index("phrase") and ops[0] == "tag"
+    assert res["plan"][-1]["rows_out"] == 1
+    assert all(step["rows_out"] <= step["rows_in"] for step in res["plan"][1:])
+
+
+def test_date_range_and_newest_first():
+    tag = f"d-{uuid.uuid4().hex[:8]}"
+    ids = {
+        month: add_content(content=f"Monthly note {month} {tag}", tags=[tag], date=f"2024-{month:02d}-15T09:00:00+00:00")
+        for month in (1, 3, 5, 7)
+    }
+    res = search(None, {"tag": [tag], "date_from": "2024-03", "date_to": "2024-05"}, sort="date")
+    assert [n["id"] for n in res["items"]] == [ids[5], ids[3]]
+    res = search(f"tag:{tag} date:..2024-03", {}, sort="date")
+    assert [n["id"] for n in res["items"]] == [ids[3], ids[1]]
+
+    newest = search(None, {"tag": [tag]}, sort="date", page_size=2)
+    assert newest["total"] == 4 and [n["id"] for n in newest["items"]] == [ids[7], ids[5]]
+    second = search(None, {"tag": [tag]}, sort="date", page=2, page_size=2)
+    assert [n["id"] for n in second["items"]] == [ids[3], ids[1]]
+
+
+def test_seeded_random_sort_paginates_stably():
+    tag = f"r-{uuid.uuid4().hex[:8]}"
+    ids = {add_content(content=f"Random pick {i} {tag}", tags=[tag]) for i in range(12)}
+    first = search(None, {"tag": [tag]}, sort="random", seed=7, page_size=12)["items"]
+    assert {n["id"] for n in first} == ids
+    pages = [search(None, {"tag": [tag]}, sort="random", seed=7, page=p, page_size=5)["items"] for p in (1, 2, 3)]
+    assert [n["id"] for page in pages for n in page] == [n["id"] for n in first]
+    other = search(None, {"tag": [tag]}, sort="random", seed=8, page_size=12)["items"]
+    assert [n["id"] for n in other] != [n["id"] for n in first]
@@ -0,0 +1,37 @@
+"""Tests for manifest-driven incremental reindexing."""
+
+import json
+import uuid
+
+import search
+from search import reindex
+from storage import NODE_DIRS, add_content, find_duplicate, counters
+
+
+def test_incremental_reindex_only_touches_changed_files():
+    word = f"zq{uuid.uuid4().hex[:8]}"
+    keep = add_content(content=f"Stable note {uuid.uuid4()}")
+    edit = add_content(content=f"Edited on disk {word}")
+    gone = add_content(content=f"Removed on disk {uuid.uuid4()}")
+    assert reindex("full")["mode"] == "full"
+    assert reindex("incremental")["changed"] == 0
+
+    path = NODE_DIRS["content"] / f"{edit}.json"
+    node = json.loads(path.read_text())
+    node["content"] = "Rewritten by hand with fresh wording"
+    path.write_text(json.dumps(node))
+    (NODE_DIRS["content"] / f"{gone}.json").unlink()
+    new_id = str(uuid.uuid4())
+    (NODE_DIRS["content"] / f"{new_id}.json").write_text(
+        json.dumps({"id": new_id, "type": "content", "title": "Dropped in", "content": f"Pulled from git {word}"})
+    )
+    (NODE_DIRS["content"] / f"{keep}.json").touch()
+
+    stats = reindex("incremental")
+    assert (stats["added"], stats["changed"], stats["removed"]) == (1, 1, 1)
+    inv, lens, meta = search._load_indexes()
+    assert inv[word] == {new_id: 1}
+    assert gone not in lens and gone not in meta and new_id in meta
+    assert search.search("fresh wording", {})["items"][0]["id"] == edit
+    assert find_duplicate("Rewritten by hand with fresh wording") == edit
+    assert counters()["nodes"]["content"] == len(list(NODE_DIRS["content"].glob("*.json")))
@@ -0,0 +1,64 @@
+"""Tests for read replicas following a primary's write-ahead log (MCP_REPLICA_OF)."""
+
+import json
+import os
+import subprocess
+import sys
+
+PRIMARY = """
+import json, sys, storage
+ids = [storage.add_content(content=f"Replicated note {i} {sys.argv[1]}", tags=["replicated"]) for i in range(int(sys.argv[2]))]
+if len(sys.argv) > 3:
+    storage.update_content(sys.argv[3], content=f"Rewritten {sys.argv[1]}")
+    storage.delete_content(sys.argv[4])
+    storage.checkpoint()  # the replica follows the log into the next segment
+print(json.dumps(ids))
+"""
+
+REPLICA = """
+import json, sys, replica, search, storage
+from pathlib import Path
+applied = replica.Follower(Path(storage.REPLICA_OF)).poll()
+try:
+    storage.add_tag("local")
+    refused = False
+except ValueError:
+    refused = True
+print(json.dumps({
+    "applied": applied,
+    "total": search.search(f'"{sys.argv[1]}"', {})["total"],
+    "content": storage.counters()["nodes"]["content"],
+    "tagged": storage.counters()["edges"].get("tags", 0),
+    "refused": refused,
+    "status": replica.status(),
+}))
+"""
+
+
+def _run(script, env, *args):
+    proc = subprocess.run(
+        [sys.executable, "-c", script, *args], env={**os.environ, **env}, capture_output=True, text=True, timeout=60
+    )
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def test_replica_follows_primary(tmp_path):
+    primary = {"MCP_WAL": "on", "MCP_SNIPPETS_ROOT": str(tmp_path / "primary")}
+    replica = {"MCP_REPLICA_OF": str(tmp_path / "primary"), "MCP_SNIPPETS_ROOT": str(tmp_path / "replica")}
+
+    first = _run(PRIMARY, primary, "zrone", "3")
+    result = _run(REPLICA, replica, "zrone")  # bootstraps from a copy
+    assert result["total"] == 3
+    assert result["content"] == 3
+    assert result["refused"]
+    assert result["status"]["state"] == "caught_up"
+    assert result["status"]["lag_bytes"] == 0
+
+    _run(PRIMARY, primary, "zrtwo", "2", first[0], first[1])
+    result = _run(REPLICA, replica, "zrtwo")  # resumes from the saved position
+    assert result["applied"] > 0
+    assert result["total"] == 3  # two new notes and the rewritten one
+    assert result["content"] == 4
+    assert result["tagged"] == 5
+    assert result["status"]["position"][0] == 2
@@ -0,0 +1,25 @@
+"""Tests for the slotted node types."""
+
+import pytest
+
+from schemas import ContentNode, DocMeta, NODE_TYPES
+
+
+def test_nodes_are_slotted_immutable_and_round_trip():
+    data = {"id": "c1", "type": "content", "title": "T", "date": "2025-01-01", "style": ["blog"],
+            "tags": ["a", "b"], "authors": [], "relates": [], "content": "body"}
+    node = ContentNode.from_dict({**data, "links": []})
+    assert node.to_dict() == data
+    assert node.tags == ("a", "b") and not hasattr(node, "__dict__")
+    with pytest.raises(AttributeError):
+        node.title = "changed"
+    with pytest.raises(TypeError):
+        ContentNode(title="no id")
+    assert NODE_TYPES["content"] is ContentNode
+
+
+def test_doc_meta_interns_repeated_labels():
+    a = DocMeta.from_dict({"tags": ["".join(["machine", "-learning"])], "date": "d"})
+    b = DocMeta.from_dict({"tags": ["".join(["machine-", "learning"])]})
+    assert a.tags[0] is b.tags[0]
+    assert b.date == "" and a.to_dict()["tags"] == ["machine-learning"]
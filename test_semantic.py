@@ -0,0 +1,42 @@
+"""Tests for the local semantic vector index and hybrid ranking."""
+
+import json
+
+import search as search_module
+import storage
+from semantic import embed, similarity_scores, DIM
+from search import search
+from storage import NODE_DIRS, add_content, delete_content, get_node
+
+
+def test_embed_is_normalized_and_stable():
+    vec = embed("Vectors computed locally on the CPU")
+    assert len(vec) == DIM
+    assert abs(sum(v * v for v in vec) - 1.0) < 1e-6
+    assert vec == embed("vectors   computed locally on the cpu")
+
+
+def test_hybrid_search_ranks_semantic_match():
+    a = add_content(content="Gardening tips: water tomato plants deeply in the morning.", title="Tomatoes")
+    b = add_content(content="Quarterly revenue grew thanks to enterprise customers.", title="Revenue")
+    scores = similarity_scores("watering tomato gardens")
+    assert scores[a] > scores[b]
+    res = search("watering tomato gardens", {}, semantic_weight=1.0, page_size=50)
+    ids = [item["id"] for item in res["items"]]
+    assert ids.index(a) < ids.index(b)
+
+
+
+def test_reindexed_document_is_a_semantic_hit_again():
+    search_module.rebuild_index()  # incremental reindexing needs the manifest
+    cid = add_content(content="Pruning apricot trees after the last frost keeps them fruiting.", title="Apricots")
+    node = get_node(cid)
+    delete_content(cid)
+    storage.apply_pending()  # MCP_WAL=on: index the delete before the file comes back
+    assert cid not in similarity_scores("pruning apricot trees")
+
+    (NODE_DIRS["content"] / f"{cid}.json").write_text(json.dumps(node))
+    assert search_module.reindex("incremental")["added"] == 1
+    assert search("apricot", {})["items"][0]["id"] == cid
+    scores = similarity_scores("pruning apricot trees")
+    assert max(scores, key=scores.get) == cid
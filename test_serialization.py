@@ -0,0 +1,17 @@
+"""Tests for the JSON serialization backends."""
+
+import pytest
+
+import serialization
+
+
+@pytest.mark.parametrize("backend", ["json", serialization.BACKEND])
+def test_backends_round_trip(monkeypatch, backend):
+    monkeypatch.setattr(serialization, "BACKEND", backend)
+    obj = {"title": "Café ☕", "tags": ["a"], "simhash": (1 << 64) - 1, "score": 0.5}
+    assert serialization.loads(serialization.dumps(obj)) == obj
+    assert serialization.loads(serialization.dumps(obj, pretty=True)) == obj
+    assert b"\n  " in serialization.dumps(obj, pretty=True)
+    assert serialization.dumps_line(obj).count(b"\n") == 1
+    with pytest.raises(ValueError):
+        serialization.loads(b"{not json")
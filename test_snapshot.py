@@ -0,0 +1,57 @@
+"""Tests for snapshot export and import."""
+
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+
+import snapshot
+from search import reindex
+from storage import add_content, delete_content, link_relates, update_content
+
+
+def test_snapshot_is_consistent_while_writes_continue():
+    kept = add_content(content=f"Before the snapshot {uuid.uuid4()}", tags=["snap"])
+    edited = add_content(content=f"Edited after the snapshot {uuid.uuid4()}")
+    link_relates(kept, "related_to", edited)
+    view = snapshot._View(include_index=False)
+    try:
+        update_content(edited, content="Changed after the snapshot started")
+        delete_content(kept)
+        late = add_content(content=f"Added after the snapshot {uuid.uuid4()}")
+        nodes = {node["id"]: node for node in view.nodes()}
+        relates = list(view.edge_records("relates"))
+    finally:
+        view.close()
+    assert kept in nodes and late not in nodes
+    assert nodes[edited]["content"].startswith("Edited after the snapshot")
+    assert {"src": kept, "type": "related_to", "dst": edited} in [
+        {k: r[k] for k in ("src", "type", "dst")} for r in relates
+    ]
+
+
+def _import(path, root):
+    env = {**os.environ, "MCP_SNIPPETS_ROOT": root}
+    code = "import json, snapshot, search; r = snapshot.main(['import', %r]); " % path
+    code += "print(json.dumps({**r, 'hits': search.search('lighthouse', {})['total']}))"
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, check=True)
+    return json.loads(out.stdout.decode().strip().splitlines()[-1])
+
+
+def test_snapshot_round_trip_into_empty_library(tmp_path):
+    add_content(content=f"The lighthouse keeper {uuid.uuid4()}", tags=["coast"], authors=["Ann Lee"])
+    reindex("full")
+    for fmt in snapshot.FORMATS:
+        buf = io.BytesIO()
+        counts = snapshot.export_snapshot(buf, fmt, include_index=True)
+        path = tmp_path / f"library.{fmt}"
+        path.write_bytes(buf.getvalue())
+        root = tempfile.mkdtemp(dir=tmp_path)
+        result = _import(str(path), root)
+        assert (result["nodes"], result["edges"]) == (counts["nodes"], counts["edges"])
+        assert result["index"] == "installed" and result["hits"] >= 1
+        again = _import(str(path), root)  # into a non-empty library: merged and reindexed
+        assert again["index"] == "rebuilt" and again["edges"] == 0 and again["hits"] == result["hits"]
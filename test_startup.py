@@ -0,0 +1,83 @@
+"""Tests for startup phase timings and index pre-warming (MCP_PREWARM), run in processes of their own."""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import startup
+
+SEED = """
+import storage
+storage.add_content(title="Warm start", content="Indexed before the server starts")
+"""
+
+WORKER = """
+import json, time, search, startup, server_http
+def loaded():
+    return search._index_cache["key"] is not None
+server_http.create_worker_app()
+result = {"at_return": loaded(), "phase_at_return": "prewarm" in startup.PHASES}
+deadline = time.time() + 10
+while not loaded() and time.time() < deadline and server_http.PREWARM == "background":
+    time.sleep(0.02)
+time.sleep(0.2)
+result["later"] = loaded()
+result["phases"] = startup.PHASES
+result["found"] = search.search("warm start", {})["total"]
+result["after_query"] = loaded()
+print(json.dumps(result))
+"""
+
+LISTENING = """
+import json, types, search, startup, server_http
+server = types.SimpleNamespace(started=True, should_exit=False)
+server_http._prewarm_when_listening(server)
+print(json.dumps({"loaded": search._index_cache["key"] is not None, "phases": startup.PHASES}))
+"""
+
+
+def _run(tmp_path, script, prewarm="background"):
+    env = {**os.environ, "MCP_SNIPPETS_ROOT": str(tmp_path), "MCP_PREWARM": prewarm}
+    proc = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1]) if proc.stdout.strip() else None
+
+
+def test_prewarm_modes(tmp_path):
+    _run(tmp_path, SEED)
+
+    eager = _run(tmp_path, WORKER, "eager")
+    assert eager["at_return"] and eager["phase_at_return"]  # loaded before serving
+    assert eager["phases"]["prewarm"] > 0
+
+    background = _run(tmp_path, WORKER, "background")
+    assert background["later"]  # loaded by the background thread
+    assert background["phases"]["prewarm"] > 0
+
+    off = _run(tmp_path, WORKER, "off")
+    assert not off["at_return"] and not off["later"]  # deferred...
+    assert "prewarm" not in off["phases"]
+    assert off["after_query"] and off["found"] == 1  # ...to the first query
+
+    for result in (eager, background):
+        assert result["found"] == 1
+
+
+def test_background_prewarm_waits_until_listening(tmp_path):
+    _run(tmp_path, SEED)
+    result = _run(tmp_path, LISTENING)
+    assert result["loaded"]
+    assert list(result["phases"])[:2] == ["listening", "prewarm"]
+    assert result["phases"]["listening"] > 0
+
+
+def test_phase_and_mark_record_milliseconds(monkeypatch):
+    monkeypatch.setattr(startup, "PHASES", {})
+    with startup.phase("nap"):
+        time.sleep(0.02)
+    startup.mark("since_start")
+    assert 20 <= startup.PHASES["nap"] < 1000
+    assert startup.PHASES["since_start"] >= startup.PHASES["nap"]
+    assert startup.report() == f"nap={startup.PHASES['nap']}ms, since_start={startup.PHASES['since_start']}ms"
@@ -0,0 +1,65 @@
+"""Tests for in-place content updates and deletes."""
+
+import json
+import uuid
+
+import pytest
+
+import search
+import storage
+from search import search as run_search, find_similar, index_stats
+from storage import NODE_DIRS, add_content, update_content, delete_content, find_duplicate, get_node, counters
+
+
+def test_update_reindexes_incrementally():
+    old_word, new_word = f"zq{uuid.uuid4().hex[:8]}", f"zq{uuid.uuid4().hex[:8]}"
+    cid = add_content(content=f"A typo {old_word} here", title="Typo", tags=["drafts"])
+    assert search._load_indexes()[0][old_word] == {cid: 1}
+
+    node = update_content(cid, content=f"A fix {new_word} here", tags=["drafts", "fixed"])
+    assert node["tags"] == ["drafts", "fixed"] and node["title"] == "Typo"
+    assert get_node(cid)["content"] == f"A fix {new_word} here"
+    inv = search._load_indexes()[0]
+    assert old_word not in inv and inv[new_word] == {cid: 1}
+    assert run_search(new_word, {})["items"][0]["id"] == cid
+    assert [n["id"] for n in run_search(None, {"tag": ["fixed"]})["items"]] == [cid]
+    assert find_duplicate(f"A fix {new_word} here", "Typo") == cid
+
+
+def test_delete_tombstones_document():
+    word = f"zq{uuid.uuid4().hex[:8]}"
+    body = f"Soon gone {word} " + " ".join(f"w{i}" for i in range(30))
+    cid = add_content(content=body)
+    twin = add_content(content=body + " extra", on_duplicate="allow")
+    before = counters()["nodes"]["content"]
+
+    delete_content(cid)
+    assert counters()["nodes"]["content"] == before - 1
+    assert run_search(word, {})["items"][0]["id"] == twin
+    assert cid not in {n["id"] for n in run_search(None, {}, page_size=10000)["items"]}
+    assert all(s["id"] != cid for s in find_similar(twin))
+    assert find_duplicate(body) is None
+    assert index_stats()["documents"] == len(search._load_indexes()[1])
+    with pytest.raises(FileNotFoundError):
+        delete_content(cid)
+    storage.apply_pending()  # MCP_WAL=on: index the delete before the file comes back
+
+
+def test_restored_document_survives_tombstone_purge(monkeypatch):
+    search.rebuild_index()  # incremental reindexing needs the manifest
+    word = f"zq{uuid.uuid4().hex[:8]}"
+    cid = add_content(content=f"Deleted then restored {word}")
+    others = [add_content(content=f"Bystander {uuid.uuid4()}") for _ in range(3)]
+    node = get_node(cid)
+    monkeypatch.setattr(search, "PURGE_RATIO", 1e9)  # keep the tombstone
+    delete_content(cid)
+    storage.apply_pending()  # MCP_WAL=on: index the delete before the file comes back
+
+    (NODE_DIRS["content"] / f"{cid}.json").write_text(json.dumps(node))
+    assert search.reindex("incremental")["added"] == 1
+    assert cid not in search._load_tombstones()
+
+    monkeypatch.setattr(search, "PURGE_RATIO", 0.0)  # the next delete purges
+    for other in others:
+        delete_content(other)
+    assert [n["id"] for n in run_search(f'"{word}"', {})["items"]] == [cid]
@@ -0,0 +1,61 @@
+"""Tests for the write-ahead log (MCP_WAL=on), run in processes of their own."""
+
+import json
+import os
+import subprocess
+import sys
+
+CRASH = """
+import os, sys, storage
+from wal import WriteAheadLog
+ids = [storage.add_content(content=f"Crash test note {i} {sys.argv[1]}", tags=["wal"]) for i in range(3)]
+print(",".join(ids))
+# As if the next write had logged its node, then died before writing it.
+WriteAheadLog(storage.WAL_DIR).append({"put": "tag", "node": {"id": "replayed", "type": "tag", "name": "replayed"}})
+os._exit(0)  # before the background applier indexed the notes
+"""
+
+CHECK = """
+import json, sys, search, storage
+print(json.dumps({
+    "total": search.search(f'"{sys.argv[1]}"', {})["total"],
+    "tag": storage.read_node("tag", "replayed") is not None,
+    "counters": storage.counters()["nodes"],
+}))
+"""
+
+CONCURRENT = """
+import json, os, threading, time, storage, wal
+sync = wal._sync
+wal._sync = lambda fd: (time.sleep(0.01), sync(fd))  # a slow disk
+threads = [threading.Thread(target=lambda t=t: [storage.add_tag(f"tag-{t}-{i}") for i in range(10)]) for t in range(8)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+print(json.dumps({**storage.wal_stats(), "tags": storage.counters()["nodes"]["tag"]}))
+"""
+
+
+def _run(tmp_path, script, *args) -> str:
+    env = {**os.environ, "MCP_WAL": "on", "MCP_WAL_APPLY_MS": "60000", "MCP_SNIPPETS_ROOT": str(tmp_path)}
+    proc = subprocess.run([sys.executable, "-c", script, *args], env=env, capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    return proc.stdout.strip().splitlines()[-1]
+
+
+def test_replay_after_crash(tmp_path):
+    word = "zwcrash"
+    assert len(_run(tmp_path, CRASH, word).split(",")) == 3
+    result = json.loads(_run(tmp_path, CHECK, word))
+    assert result["total"] == 3  # indexed by the replay
+    assert result["tag"]  # redone from the log
+    assert result["counters"]["content"] == 3
+    assert result["counters"]["tag"] == 2
+
+
+def test_group_commit_shares_syncs(tmp_path):
+    result = json.loads(_run(tmp_path, CONCURRENT))
+    assert result["tags"] == 80
+    assert result["commits"] == 80
+    assert result["syncs"] < result["commits"]
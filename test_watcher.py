@@ -0,0 +1,46 @@
+"""Tests for the filesystem watcher picking up external edits."""
+
+import json
+import sys
+import time
+import uuid
+
+import pytest
+
+import search
+import watcher
+from storage import EDGE_DIR, NODE_DIRS, add_content, counters, link_tag
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+def test_watcher_indexes_external_edits(monkeypatch):
+    monkeypatch.setattr(watcher, "DEBOUNCE_S", 0.05)
+    keep = add_content(content=f"Watched note {uuid.uuid4()}")
+    w = watcher.Watcher("inotify").start()
+    try:
+        assert _wait_for(lambda: w.applied >= 1)  # initial catch-up pass
+        word = f"zw{uuid.uuid4().hex[:8]}"
+        new_id = str(uuid.uuid4())
+        (NODE_DIRS["content"] / f"{new_id}.json").write_text(
+            json.dumps({"id": new_id, "type": "content", "title": "Synced", "content": f"Arrived by rsync {word}"})
+        )
+        assert _wait_for(lambda: new_id in search._load_indexes()[0].get(word, {}))
+
+        link_tag(keep, "watched")  # loads the tag edge set
+        edges = counters()["edges"]["tags"]
+        with (EDGE_DIR / "tags.jsonl").open("a") as f:
+            f.write(json.dumps({"content": keep, "type": "tagged", "tag": "hand-added"}) + "\n")
+        assert _wait_for(lambda: counters()["edges"]["tags"] == edges + 1)
+        link_tag(keep, "hand-added")  # already linked on disk: not appended again
+        assert counters()["edges"]["tags"] == edges + 1
+    finally:
+        w.stop()
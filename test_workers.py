@@ -0,0 +1,66 @@
+"""Tests for several processes sharing one library (MCP_WORKERS)."""
+
+import subprocess
+import sys
+import time
+import uuid
+
+import postings
+import search
+import storage
+from storage import add_content, counters
+
+WRITE = """
+import sys, storage
+for i in range(int(sys.argv[2])):
+    storage.add_content(title=f"Worker note {i}", content=f"Written by another process {sys.argv[1]}")
+"""
+
+
+def _write_elsewhere(word: str, count: int = 3) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-c", WRITE, word, str(count)])
+
+
+def test_other_process_writes_are_picked_up():
+    add_content(content=f"Local note {uuid.uuid4()}")
+    search.search("local", {})  # index and counters are now cached here
+    before = counters()["nodes"]["content"]
+    generation = storage.generation()
+
+    word = f"zx{uuid.uuid4().hex[:8]}"
+    assert _write_elsewhere(word).wait(timeout=60) == 0
+
+    assert storage.generation() > generation
+    inv = search._load_indexes()[0]
+    assert isinstance(inv, postings.MappedPostings)  # read-only, shared with the writer
+    assert len(inv.get(word, {})) == 3
+    assert search.search(f'"{word}"', {})["total"] == 3
+    assert counters()["nodes"]["content"] == before + 3
+    add_content(content=f"Written after the other process {word}")  # caches were refreshed first
+    assert counters()["nodes"]["content"] == before + 4
+    assert search.search(f'"{word}"', {})["total"] == 4
+
+
+def test_writes_wait_for_the_writer_lock():
+    word = f"zl{uuid.uuid4().hex[:8]}"
+    with storage.writer():
+        proc = _write_elsewhere(word, 1)
+        time.sleep(1.5)
+        assert proc.poll() is None  # blocked on the write lock
+    assert proc.wait(timeout=60) == 0
+    assert search.search(f'"{word}"', {})["total"] == 1
+
+
+def test_health_reports_other_process_writes():
+    from starlette.testclient import TestClient
+
+    from app import app
+
+    client = TestClient(app)
+    before = client.get("/health").json()
+    assert before["index_generation"] == storage.generation()
+
+    assert _write_elsewhere(f"zh{uuid.uuid4().hex[:8]}", 2).wait(timeout=60) == 0
+    after = client.get("/health").json()
+    assert after["content_items"] == before["content_items"] + 2
+    assert after["index_generation"] == storage.generation() > before["index_generation"]
@@ -0,0 +1,215 @@
+"""
+Write-ahead log of storage mutations (MCP_WAL=on, see storage.py).
+
+The log is a directory of JSON Lines segment files (00000001.log, ...) shared
+by every process writing to a library; records are appended to the newest
+segment under the library write lock, so their order is the order in which
+the writes were applied. A record is appended before the change it describes,
+and a mutation returns only once its records are on disk. The node files and
+edge logs themselves are still written inside the mutation, just not synced;
+only the search index updates are applied later, in batches.
+
+Durability uses group commit: commit() fsyncs everything appended so far, and
+callers that arrive while a sync is running wait for the next one instead of
+issuing their own, so concurrent writers share fsyncs. A checkpoint, once the
+changes are durable elsewhere, starts a new segment with rotate(); the older
+segments are kept for a while so read replicas (see replica.py) can follow the
+log with tail().
+"""
+from __future__ import annotations
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import serialization
+
+_sync = getattr(os, "fdatasync", os.fsync)
+
+# A position in the log: (segment number, byte offset in that segment).
+Position = Tuple[int, int]
+
+
+def segments(directory: Path) -> List[int]:
+    """The numbers of the segments in directory, oldest first."""
+    if not directory.exists():
+        return []
+    return sorted(int(p.stem) for p in directory.glob("*.log") if p.stem.isdigit())
+
+
+def segment_path(directory: Path, segment: int) -> Path:
+    return directory / f"{segment:08d}.log"
+
+
+def end(directory: Path) -> Position:
+    """The position after the last record of the log in directory."""
+    numbers = segments(directory)
+    if not numbers:
+        return (0, 0)
+    try:
+        return (numbers[-1], segment_path(directory, numbers[-1]).stat().st_size)
+    except FileNotFoundError:
+        return end(directory)  # rotated meanwhile
+
+
+def tail(directory: Path, position: Position, max_bytes: int = 16 << 20) -> Tuple[List[Dict[str, Any]], Position]:
+    """
+    The complete records after position in the log in directory (about
+    max_bytes of them at most) and the position after them. Raises
+    FileNotFoundError when the segment at position was already removed, i.e.
+    the reader fell too far behind.
+    """
+    segment, offset = position
+    records: List[Dict[str, Any]] = []
+    read = 0
+    final = False  # the next segment exists, so nothing is appended to this one anymore
+    while read < max_bytes:
+        try:
+            f = segment_path(directory, segment).open("rb")
+        except FileNotFoundError:
+            numbers = segments(directory)
+            if not numbers:
+                break  # no log yet
+            if segment == 0 and numbers[0] == 1:
+                segment = 1  # the log was started after position was taken
+                continue
+            raise FileNotFoundError(f"Log segment {segment} was removed") from None
+        with f:
+            f.seek(offset)
+            data = f.read(max_bytes - read)
+        data = data[: data.rfind(b"\n") + 1]
+        for line in data.splitlines():
+            try:
+                records.append(serialization.loads(line))
+            except ValueError:
+                continue
+        offset += len(data)
+        read += len(data)
+        if data:
+            continue
+        if final:
+            segment, offset, final = segment + 1, 0, False
+        elif segment_path(directory, segment + 1).exists():
+            final = True  # read once more: records appended before the rotation
+        else:
+            break
+    return records, (segment, offset)
+
+
+class WriteAheadLog:
+    """An append-only record log with group commit. All methods are thread-safe."""
+
+    def __init__(self, directory: Path, keep_segments: int = 4):
+        self.directory = directory
+        self.keep_segments = max(1, keep_segments)
+        self._segment: Optional[int] = None  # the segment appended to
+        self._fd: Optional[int] = None
+        self._lock = threading.Lock()  # appends
+        self._cond = threading.Condition()  # commits
+        self._appended = 0  # records appended by this process
+        self._synced = 0  # ...of which known to be on disk
+        self._syncing = False
+        self.commits = 0
+        self.syncs = 0
+
+    @property
+    def segment(self) -> int:
+        if self._segment is None:
+            self._segment = max(segments(self.directory), default=1)
+        return self._segment
+
+    @property
+    def path(self) -> Path:
+        return segment_path(self.directory, self.segment)
+
+    def _open(self) -> int:
+        if self._fd is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._fd
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """Append a record (not yet synced); returns its ticket for commit()."""
+        data = serialization.dumps_line(record)
+        with self._lock:
+            fd = self._open()
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view) :]
+            self._appended += 1
+            return self._appended
+
+    def ticket(self) -> int:
+        """The ticket of the last record appended by this process."""
+        return self._appended
+
+    def commit(self, ticket: int):
+        """Wait until the record with this ticket (and all before it) is on disk."""
+        with self._cond:
+            self.commits += 1
+            while self._synced < ticket:
+                if self._syncing:
+                    self._cond.wait()  # a sync is running; the next one covers us
+                    continue
+                self._syncing = True
+                target = self._appended
+                synced = False
+                self._cond.release()
+                try:
+                    with self._lock:
+                        fd = os.dup(self._open())  # close() or rotate() may run meanwhile
+                    try:
+                        _sync(fd)
+                    finally:
+                        os.close(fd)
+                    synced = True
+                finally:
+                    self._cond.acquire()
+                    self._syncing = False
+                    if synced:
+                        self._synced = max(self._synced, target)
+                        self.syncs += 1
+                    self._cond.notify_all()
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """The records in the current segment, oldest first; a torn last record is skipped."""
+        try:
+            f = self.path.open("rb")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    yield serialization.loads(line)
+                except ValueError:
+                    continue
+
+    def size(self) -> int:
+        """Size of the current segment."""
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def close(self):
+        """Forget the current segment (another process may have rotated the log)."""
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._segment = None
+
+    def rotate(self):
+        """
+        Start a new segment (the caller made the changes recorded so far
+        durable) and remove all but the newest keep_segments segments.
+        """
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._segment = max(segments(self.directory), default=0) + 1
+            self._open()
+            for old in segments(self.directory)[: -self.keep_segments]:
+                segment_path(self.directory, old).unlink(missing_ok=True)
@@ -0,0 +1,195 @@
+"""
+Background watcher keeping the indexes in sync with edits made outside the
+server: content node files created, modified or deleted by hand, by a sync
+tool or by another process, and edge logs appended to or replaced.
+
+MCP_WATCH selects the mechanism:
+- "off" (default): no watcher; run the reindex tool after external edits.
+- "auto": inotify on Linux, polling elsewhere.
+- "inotify": kernel change notifications (Linux only).
+- "poll": rescan every MCP_WATCH_POLL_S seconds, comparing the content files
+  with the index manifest (stat calls only for unchanged files).
+
+Events are debounced: changes are applied once no new event arrived for
+MCP_WATCH_DEBOUNCE_MS (and at the latest after ten times that), so a bulk copy
+is indexed in a few batches rather than file by file. Changed documents go
+through the incremental reindex and changed edge logs through
+storage.refresh_edges. The server's own writes also produce events; they are
+recognized from the manifest and cost a stat call each. Packed nodes (see
+packs.py) are only ever written by the server, so only loose files are watched.
+
+On start the watcher runs one incremental pass to catch up with edits made
+while the server was not running (a full rebuild if the index has no manifest
+yet).
+"""
+from __future__ import annotations
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+import traceback
+from typing import Optional, Set, Tuple
+import search
+import storage
+from storage import EDGE_DIR, NODE_DIRS
+
+WATCH = os.environ.get("MCP_WATCH", "off")
+DEBOUNCE_S = float(os.environ.get("MCP_WATCH_DEBOUNCE_MS", "500")) / 1000
+POLL_S = float(os.environ.get("MCP_WATCH_POLL_S", "10"))
+MODES = {"off", "auto", "inotify", "poll"}
+
+# <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+_CONTENT_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+_EDGE_MASK = IN_MODIFY | IN_MOVED_TO | IN_DELETE
+
+
+class Watcher:
+    """Collects changed doc IDs and edge log names and applies them in batches."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.applied = 0  # number of batches applied, for tests and diagnostics
+        self._docs: Set[str] = set()
+        self._edges: Set[str] = set()
+        self._rescan = False
+        self._stop = threading.Event()
+        self._fd: Optional[int] = None
+        self._content_wd = self._edges_wd = -1
+        self._thread = threading.Thread(target=self._run, name="mcp-watcher", daemon=True)
+
+    def start(self) -> "Watcher":
+        storage.ensure_dirs()
+        if self.mode == "inotify":
+            self._fd, self._content_wd, self._edges_wd = _inotify_open()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _run(self):
+        self._rescan = True
+        self._apply()
+        if self._fd is None:
+            while not self._stop.wait(POLL_S):
+                self._rescan = True
+                self._edges.update(storage.EDGE_KEYS)
+                self._apply()
+            return
+        first = None  # time of the oldest pending event
+        last = 0.0
+        while not self._stop.is_set():
+            pending = first is not None
+            timeout = DEBOUNCE_S if pending else 0.5
+            ready, _, _ = select.select([self._fd], [], [], timeout)
+            now = time.monotonic()
+            if ready and self._read_events():
+                last = now
+                first = first or now
+            if first is not None and (now - last >= DEBOUNCE_S or now - first >= 10 * DEBOUNCE_S):
+                self._apply()
+                first = None
+
+    def _read_events(self) -> bool:
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        got = False
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size : offset + _EVENT.size + length].rstrip(b"\0").decode("utf-8", "replace")
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                self._rescan = True
+                self._edges.update(storage.EDGE_KEYS)
+            elif wd == self._content_wd and name.endswith(".json"):
+                self._docs.add(name[: -len(".json")])
+            elif wd == self._edges_wd and name.endswith(".jsonl"):
+                self._edges.add(name[: -len(".jsonl")])
+            else:
+                continue  # temporary files and unrelated names
+            got = True
+        return got
+
+    def _apply(self):
+        docs, self._docs = self._docs, set()
+        edges, self._edges = self._edges, set()
+        rescan, self._rescan = self._rescan, False
+        try:
+            if rescan or docs:
+                search.reindex("incremental", doc_ids=None if rescan else docs)
+            if edges:
+                storage.refresh_edges(edges)
+        except Exception:
+            traceback.print_exc()
+        self.applied += 1
+
+
+def _inotify_open() -> Tuple[int, int, int]:
+    """An inotify descriptor watching the content directory and the edge logs, and both watch IDs."""
+    if not sys.platform.startswith("linux"):
+        raise OSError("inotify is only available on Linux")
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    wds = []
+    for path, mask in ((NODE_DIRS["content"], _CONTENT_MASK), (EDGE_DIR, _EDGE_MASK)):
+        wd = libc.inotify_add_watch(fd, os.fsencode(str(path)), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(err, f"inotify_add_watch failed for {path}")
+        wds.append(wd)
+    return fd, wds[0], wds[1]
+
+
+_watcher: Optional[Watcher] = None
+
+
+def start(mode: Optional[str] = None) -> Optional[Watcher]:
+    """Start the watcher selected by MCP_WATCH (or mode); returns None when it is off."""
+    global _watcher
+    requested = mode or WATCH
+    if requested not in MODES:
+        raise ValueError(f"Invalid MCP_WATCH mode '{requested}'. Allowed: {sorted(MODES)}")
+    if requested == "off" or _watcher is not None:
+        return _watcher
+    if requested == "auto":
+        mode = "inotify" if sys.platform.startswith("linux") else "poll"
+    else:
+        mode = requested
+    try:
+        _watcher = Watcher(mode).start()
+    except OSError as e:
+        if requested != "auto":
+            raise
+        print(f"inotify unavailable ({e}); watching by polling every {POLL_S:g}s")
+        _watcher = Watcher("poll").start()
+    return _watcher
+
+
+def stop():
+    global _watcher
+    if _watcher is not None:
+        _watcher.stop()
+        _watcher = None